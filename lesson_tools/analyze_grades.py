@@ -17,16 +17,30 @@ if hasattr(sys.stdout, "reconfigure"):
 
 import numpy as np
 import pandas as pd
-from scipy.stats import (
-    chi2_contingency,
-    fisher_exact,
-    pearsonr,
-    spearmanr,
-    mannwhitneyu,
-)
-import matplotlib
-matplotlib.use("TkAgg")
-import matplotlib.pyplot as plt
+
+
+def _has_display():
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _pyplot():
+    """matplotlib.pyplot on TkAgg, or the headless Agg backend when Tk or a
+    display is unavailable; imported on first use so `--no-plot` runs never
+    load matplotlib."""
+    import matplotlib
+    if "matplotlib.pyplot" not in sys.modules:
+        backend = "Agg"
+        if _has_display():
+            try:
+                import tkinter
+                backend = "TkAgg"
+            except ImportError:
+                pass
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    return plt
 
 DIVIDER = "=" * 72
 SUB_DIV = "-" * 72
@@ -42,6 +56,7 @@ def subsection(title):
     print(SUB_DIV)
 
 def safe_corr(x, y, method="pearson"):
+    from scipy.stats import pearsonr, spearmanr
     mask = x.notna() & y.notna()
     xc, yc = x[mask].astype(float), y[mask].astype(float)
     n = len(xc)
@@ -408,6 +423,7 @@ def enrich(st):
 
 
 def analyze_ai_vs_trouble(st):
+    from scipy.stats import chi2_contingency, fisher_exact
     section("1. AI USAGE vs. TROUBLE DEMONSTRATING KNOWLEDGE")
 
     print("""
@@ -504,6 +520,7 @@ def analyze_ai_vs_trouble(st):
 
 
 def analyze_early_ai_and_passing(st):
+    from scipy.stats import fisher_exact
     if "a1_ai" not in st.columns or "a2_ai" not in st.columns:
         return
     subsection("Early AI usage (easy assignments) and course pass rate")
@@ -590,6 +607,7 @@ def analyze_early_ai_and_passing(st):
 
 
 def analyze_ai_grade_quality(st):
+    from scipy.stats import fisher_exact
     section("2. AI GRADE QUALITY (assignments designed to resist AI)")
 
     print("""
@@ -650,6 +668,7 @@ def analyze_ai_grade_quality(st):
 
 
 def analyze_typing_speed(st):
+    from scipy.stats import mannwhitneyu
     section("3. TYPING SPEED ANALYSIS")
 
     r, p, n = safe_corr(st["pre_typing"], st["final_grade"])
@@ -698,6 +717,7 @@ def analyze_self_evaluation(st):
 
 
 def analyze_participation(st):
+    from scipy.stats import mannwhitneyu
     section("5. PARTICIPATION & FOLLOW SCORES")
 
     print("\n  Participation (BY) = how closely the student's code matched the")
@@ -791,6 +811,7 @@ def analyze_participation(st):
 
 
 def analyze_engagement(st):
+    from scipy.stats import fisher_exact
     section("6. ENGAGEMENT (answers, questions, help)")
 
     print("""
@@ -1067,6 +1088,7 @@ def analyze_correlations_summary(st):
 
 
 def analyze_artefacts(st):
+    from scipy.stats import fisher_exact, mannwhitneyu
     have = [a_num for a_num, a in ASSIGNMENTS.items()
             if _raw_flags(a) and st.get(f"a{a_num}_artefact_valid") is not None
             and st[f"a{a_num}_artefact_valid"].any()]
@@ -1224,6 +1246,7 @@ def _build_curated_moments(st_subset, COL_ID):
 
 
 def save_stats_json(st, grades_path):
+    from scipy.stats import chi2_contingency, fisher_exact, mannwhitneyu
 
     def sf(v):
         if v is None: return None
@@ -1629,8 +1652,7 @@ def save_stats_json(st, grades_path):
         "failed_pre_avg":  sf(fail_t.mean()) if len(fail_t) > 0 else None,
     }
     if len(pass_t) >= 2 and len(fail_t) >= 2:
-        from scipy.stats import mannwhitneyu as _mwu
-        _, p_mw = _mwu(pass_t, fail_t, alternative="two-sided")
+        _, p_mw = mannwhitneyu(pass_t, fail_t, alternative="two-sided")
         typing["pass_fail_mannwhitney_p"] = sf(p_mw)
     r_p, p_p, _ = safe_corr(st["pre_typing"], st["final_grade"])
     r_s, p_s, n_s = safe_corr(st["pre_typing"], st["final_grade"], method="spearman")
@@ -1837,6 +1859,7 @@ def save_stats_json(st, grades_path):
 
 
 def plot_follow_vs_grade(st):
+    plt = _pyplot()
     fig, axes = plt.subplots(2, 3, figsize=(14, 9))
 
     last_data_ax = None
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import re
 import sys
+import time
 from pathlib import Path
 
 from utils.folder_utils import PROJECT_GROUPS, resolve_course
@@ -22,14 +24,29 @@ _PROJECT_DROP_DIRS = ("students", "curated", "anon_names")
 _MEDIA_KEEP_DIRS = ("start", "reconstructed", "correct")
 _PROJECT_KEEP_FILES = {"instructions.html", "name_map.csv", "artefact_labels.csv"}
 
+MANIFEST_CACHE_NAME = ".manifest_cache.json"
+_CACHE_FORMAT = 1
+# Directories modified this recently may change again within the same mtime
+# tick, so their listing is not trusted on the next build (cf. git's racy
+# index entries).
+_RACY_NS = 2_000_000_000
+
 
 def _is_hidden(path: Path) -> bool:
-    name = path.name
+    return _is_hidden_name(path.name)
+
+
+def _is_hidden_name(name: str) -> bool:
     if name.startswith("~$"):
         return True
     return name.startswith(".") and name not in {".gitignore"}
 
 
+def _parts_key(rel: str) -> list[str]:
+    # Same order as sorting the equivalent Path objects.
+    return (rel.lower() if os.name == "nt" else rel).split("/")
+
+
 def _keep_root_file(name: str) -> bool:
     return name.lower() in _ROOT_KEEP_FILES
 
@@ -59,23 +76,105 @@ def _keep_project_file(rel: str, lesson_name: str, teacher_media=frozenset()) ->
     return lower.endswith(".xlsx") and "remarks" in lower
 
 
-def _list_files_relative(root: Path) -> list[str]:
+class _DirCache:
+    """Directory listings keyed by course-relative path and validated by the
+    directory's mtime_ns; `new` collects what this build touched.
+    """
+
+    __slots__ = ("old", "new", "_racy_after")
+
+    def __init__(self, old: dict | None = None):
+        self.old = old or {}
+        self.new: dict = {}
+        self._racy_after = time.time_ns() - _RACY_NS
+
+    def listdir(self, path: Path, key: str) -> tuple[list[str], list[str]]:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return [], []
+        hit = self.new.get(key)
+        if hit is None:
+            hit = self.old.get(key)
+            if hit is not None and hit["mtime_ns"] != mtime_ns:
+                hit = None
+        if hit is not None:
+            self.new[key] = hit
+            return hit["dirs"], hit["files"]
+        dirs: list[str] = []
+        files: list[str] = []
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    if not e.is_dir():
+                        files.append(e.name)
+                    elif not e.is_symlink():
+                        dirs.append(e.name)
+        except OSError:
+            return [], []
+        self.new[key] = {
+            "mtime_ns": mtime_ns if mtime_ns < self._racy_after else -1,
+            "dirs": dirs,
+            "files": files,
+        }
+        return dirs, files
+
+    def walk(self, root: Path, key: str, *, prune_top=()) -> list[str]:
+        """Every non-directory below `root` as a sorted relative posix path."""
+        out: list[str] = []
+        stack = [(root, key, "")]
+        while stack:
+            path, k, rel = stack.pop()
+            dirs, files = self.listdir(path, k)
+            out.extend(rel + name for name in files)
+            for name in dirs:
+                if not rel and name in prune_top:
+                    continue
+                stack.append((path / name, f"{k}/{name}", f"{rel}{name}/"))
+        out.sort(key=_parts_key)
+        return out
+
+
+def _load_dir_cache(course: Path) -> dict:
+    try:
+        data = json.loads((course / MANIFEST_CACHE_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("format") != _CACHE_FORMAT:
+        return {}
+    return data.get("dirs") or {}
+
+
+def _save_dir_cache(course: Path, dirs: dict) -> None:
+    path = course / MANIFEST_CACHE_NAME
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps({"format": _CACHE_FORMAT, "dirs": dirs}), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def _filter_listed(rels: list[str]) -> list[str]:
     out: list[str] = []
-    for p in sorted(root.rglob("*")):
-        if p.is_dir():
-            if p.name in _SKIP_DIR_NAMES:
-                continue
-            continue
-        if any(part in _SKIP_DIR_NAMES for part in p.relative_to(root).parts):
-            continue
-        if p.name in _SKIP_FILE_NAMES:
+    for rel in rels:
+        parts = rel.split("/")
+        if any(part in _SKIP_DIR_NAMES for part in parts):
             continue
-        if _is_hidden(p):
+        name = parts[-1]
+        if name in _SKIP_FILE_NAMES or _is_hidden_name(name):
             continue
-        out.append(p.relative_to(root).as_posix())
+        out.append(rel)
     return out
 
 
+def _list_files_relative(root: Path) -> list[str]:
+    return _filter_listed(_DirCache().walk(root, root.name))
+
+
 def _list_root_files(course: Path, *, exclude_pii: bool) -> list[str]:
     out: list[str] = []
     for p in sorted(course.iterdir()):
@@ -91,39 +190,39 @@ def _list_root_files(course: Path, *, exclude_pii: bool) -> list[str]:
     return out
 
 
-def _teacher_media_basenames(lesson_dir: Path) -> set:
+def _teacher_media_basenames(rels: list[str]) -> set:
     names: set = set()
-    for d in _MEDIA_KEEP_DIRS:
-        base = lesson_dir / d
-        if not base.is_dir():
-            continue
-        for p in base.rglob("*"):
-            if p.is_file() and _MEDIA_RE.search(p.name.lower()):
-                names.add(p.name.lower())
+    for rel in rels:
+        top, sep, rest = rel.partition("/")
+        if sep and top in _MEDIA_KEEP_DIRS:
+            name = rest.rsplit("/", 1)[-1].lower()
+            if _MEDIA_RE.search(name):
+                names.add(name)
     return names
 
 
-def _build_lesson_entry(lesson_dir: Path) -> dict:
-    teacher_media = _teacher_media_basenames(lesson_dir)
+def _build_lesson_entry(lesson_dir: Path, dir_cache: _DirCache | None = None,
+                        key: str | None = None) -> dict:
+    dir_cache = dir_cache or _DirCache()
+    key = key or lesson_dir.name
+    listed = dir_cache.walk(lesson_dir, key, prune_top=_PROJECT_DROP_DIRS)
+    teacher_media = _teacher_media_basenames(listed)
     files = [
-        f for f in _list_files_relative(lesson_dir)
+        f for f in _filter_listed(listed)
         if _keep_project_file(f, lesson_dir.name, teacher_media)
     ]
-    students: list[str] = []
-    anon = lesson_dir / "anon_ids"
-    if anon.is_dir():
-        students = sorted(d.name for d in anon.iterdir() if d.is_dir())
-    return {"students": students, "files": files}
+    anon_dirs, _ = dir_cache.listdir(lesson_dir / "anon_ids", f"{key}/anon_ids")
+    return {"students": sorted(anon_dirs), "files": files}
 
 
-def _build_group(group_dir: Path) -> dict:
+def _build_group(group_dir: Path, dir_cache: _DirCache | None = None) -> dict:
     if not group_dir.is_dir():
         return {}
+    dir_cache = dir_cache or _DirCache()
     out: dict = {}
-    for d in sorted(group_dir.iterdir()):
-        if not d.is_dir():
-            continue
-        out[d.name] = _build_lesson_entry(d)
+    dirs, _ = dir_cache.listdir(group_dir, group_dir.name)
+    for name in sorted(dirs, key=_parts_key):
+        out[name] = _build_lesson_entry(group_dir / name, dir_cache, f"{group_dir.name}/{name}")
     return out
 
 
@@ -149,17 +248,31 @@ def _collect_mtimes(course: Path, manifest: dict) -> dict:
     return mtimes
 
 
-def _build_manifest(course: Path, *, exclude_pii: bool) -> dict:
+def _build_manifest(course: Path, *, exclude_pii: bool, use_cache: bool = True,
+                    dirs: dict | None = None) -> dict:
+    """Build the course manifest. `dirs` is a directory cache the caller
+    keeps in memory between builds (updated in place); when it is given the
+    cache file is neither read nor written.
+    """
+    if dirs is not None:
+        dir_cache = _DirCache(dirs)
+    else:
+        dir_cache = _DirCache(_load_dir_cache(course) if use_cache else None)
     manifest = {
         "rootName": course.name,
         "rootFiles": _list_root_files(course, exclude_pii=exclude_pii),
         "groups": {},
     }
     for g in PROJECT_GROUPS:
-        entries = _build_group(course / g)
+        entries = _build_group(course / g, dir_cache)
         if entries:
             manifest["groups"][g] = entries
     manifest["mtimes"] = _collect_mtimes(course, manifest)
+    if dirs is not None:
+        dirs.clear()
+        dirs.update(dir_cache.new)
+    elif use_cache and dir_cache.new != dir_cache.old:
+        _save_dir_cache(course, dir_cache.new)
     return manifest
 
 
@@ -181,9 +294,14 @@ def main(argv=None) -> int:
         default=None,
         help="Path to write manifest.json (defaults to <course>/manifest.json)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Re-walk every directory and leave {MANIFEST_CACHE_NAME} untouched",
+    )
     args = parser.parse_args(argv if argv is not None else sys.argv[1:])
     course = resolve_course(args.course)
-    manifest = _build_manifest(course, exclude_pii=args.exclude_pii)
+    manifest = _build_manifest(course, exclude_pii=args.exclude_pii, use_cache=not args.no_cache)
     out_path = Path(args.output) if args.output else (course / "manifest.json")
     out_path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
     n_lessons = len(manifest["groups"].get("lessons", {}))
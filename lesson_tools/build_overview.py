@@ -3,9 +3,12 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import subprocess
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
@@ -14,9 +17,10 @@ from utils.folder_utils import (
     find_subdir, find_working_remarks, normalize_sid as _normalize_sid,
     pick_folder)
 
-try:
-    from openpyxl import load_workbook
-except ImportError:
+from utils.results_store import (
+    ResultsStore, Sheet, read_stats_csv, read_xlsx_sheet)
+
+if find_spec('openpyxl') is None:
     print('error: openpyxl required. pip install openpyxl', file=sys.stderr)
     sys.exit(1)
 
@@ -114,15 +118,72 @@ def _ordered_topics(lessons_root: Optional[Path],
     return known + extras
 
 
+def _load_sheet(path: Path, store: Optional[ResultsStore], project: str,
+                source: str, sheet: Optional[str] = None) -> Sheet:
+    loader = lambda p: read_xlsx_sheet(p, sheet)
+    if store is None:
+        return loader(path)
+    return store.sheet(project, source, path, loader)
+
+
+def _workbook_sources(root: Path,
+                      lessons_root: Optional[Path],
+                      assignments_root: Optional[Path],
+                      topics: set) -> List[Tuple[str, str, Path, Optional[str]]]:
+    out: List[Tuple[str, str, Path, Optional[str]]] = []
+    for group, group_root in (('lessons', lessons_root), ('assignments', assignments_root)):
+        if group_root is None:
+            continue
+        for d in sorted(d for d in group_root.iterdir() if d.is_dir()):
+            if d.name.lower() not in topics:
+                continue
+            xlsx = find_working_remarks(d)
+            if xlsx is not None:
+                out.append((f'{group}/{d.name.lower()}', 'remarks', xlsx, None))
+    extra = root / 'Extra.xlsx'
+    if extra.is_file():
+        out.append(('', 'extra', extra, 'Grades'))
+    return out
+
+
+def _prefetch_workbooks(store: ResultsStore,
+                        sources: Sequence[Tuple[str, str, Path, Optional[str]]],
+                        jobs: int) -> int:
+    """Parse the workbooks whose stored copy is out of date in a process
+    pool and upsert them, so the serial collection below only reads the
+    store. Returns the number of workbooks parsed and stored; a workbook
+    whose worker failed is left for the serial collection to re-read."""
+    todo = []
+    for project, source, path, sheet in sources:
+        stamp = store.stale(project, source, path)
+        if stamp is not None:
+            todo.append((project, source, path, sheet, stamp))
+    if len(todo) < 2 or jobs < 2:
+        return 0
+    n_parsed = 0
+    with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+        futures = [pool.submit(read_xlsx_sheet, path, sheet)
+                   for _, _, path, sheet, _ in todo]
+        for (project, source, path, _, stamp), fut in zip(todo, futures):
+            try:
+                header, rows = fut.result()
+            except Exception as e:
+                print(f'  WARNING: could not parse {path}: {e}')
+                continue
+            store.put(project, source, path, header, rows, stamp=stamp)
+            n_parsed += 1
+    return n_parsed
+
+
 def _read_grades_rows(xlsx_path: Path,
-                      wanted_headers: Tuple[str, ...]
+                      wanted_headers: Tuple[str, ...],
+                      store: Optional[ResultsStore] = None,
+                      project: str = '',
                       ) -> Tuple[Dict[str, int], list]:
-    wb = load_workbook(xlsx_path, data_only=True, read_only=True)
-    ws = wb.active
-    rows = list(ws.iter_rows(values_only=True))
-    wb.close()
-    if not rows:
+    header_row, data_rows = _load_sheet(xlsx_path, store, project, 'remarks')
+    if header_row is None:
         return {}, []
+    rows = [header_row] + data_rows
     header = [str(c).strip() if c is not None else '' for c in rows[0]]
     col_idx = {}
     for h in wanted_headers:
@@ -180,40 +241,29 @@ def _count_extra_missing(desc) -> Tuple[int, int]:
     return (plus, minus)
 
 
-def _read_lesson_stats_csv(csv_path: Path) -> Optional[Dict[str, object]]:
+def _read_lesson_stats_csv(csv_path: Path,
+                           store: Optional[ResultsStore] = None,
+                           project: str = '') -> Optional[Dict[str, object]]:
     if not csv_path.is_file():
         return None
     try:
-        text = csv_path.read_text(encoding='utf-8')
+        if store is None:
+            header, rows = read_stats_csv(csv_path)
+        else:
+            header, rows = store.sheet(project, csv_path.name, csv_path, read_stats_csv)
     except OSError:
         return None
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    if len(lines) < 2:
+    if header is None:
         return None
-    header = [c.strip() for c in lines[0].split(',')]
-    values = [c.strip() for c in lines[1].split(',')]
-    out: Dict[str, object] = {}
-    for k, v in zip(header, values):
-        if not k:
-            continue
-        if v == '':
-            out[k] = ''
-            continue
-        try:
-            if '.' in v:
-                out[k] = float(v)
-            else:
-                out[k] = int(v)
-        except ValueError:
-            out[k] = v
-    return out
+    return dict(zip(header, rows[0]))
 
 
 _LESSON_STATS_SOURCES = ('lesson_stats_py.csv', 'lesson_stats.csv')
 
 
 def _collect_lesson_stats_rows(lessons_root: Optional[Path],
-                               topics: Sequence[str]
+                               topics: Sequence[str],
+                               store: Optional[ResultsStore] = None,
                                ) -> Optional[Dict[str, list]]:
     if lessons_root is None or not lessons_root.is_dir():
         return None
@@ -231,7 +281,7 @@ def _collect_lesson_stats_rows(lessons_root: Optional[Path],
         lesson_dir = dirs_by_lower[lk]
         data = None
         for fname in _LESSON_STATS_SOURCES:
-            data = _read_lesson_stats_csv(lesson_dir / fname)
+            data = _read_lesson_stats_csv(lesson_dir / fname, store, f'lessons/{lk}')
             if data is not None:
                 break
         if data is None:
@@ -264,7 +314,9 @@ def _update_identity(student_data: Dict[str, dict], sid: str, r: dict) -> None:
 def _collect_student_data(lessons_root: Optional[Path],
                           assignments_root: Optional[Path],
                           topics: set,
-                          excluded_ids) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+                          excluded_ids,
+                          store: Optional[ResultsStore] = None,
+                          ) -> Tuple[Dict[str, dict], Dict[str, dict]]:
     student_data: Dict[str, dict] = defaultdict(dict)
     lesson_meta: Dict[str, dict] = {}
 
@@ -281,7 +333,7 @@ def _collect_student_data(lessons_root: Optional[Path],
                       'Interactions',
                       'Follow (C) Desc', 'Follow (E)',
                       'HTML (E)', 'CSS (E)', 'JS (E)', 'Obs')
-            col_idx, rows = _read_grades_rows(xlsx, wanted)
+            col_idx, rows = _read_grades_rows(xlsx, wanted, store, f'lessons/{lesson_key}')
             missing = [h for h in wanted if col_idx.get(h) is None]
             for h in ('Inc', 'Interactions', 'Follow (E)', 'Obs'):
                 if h in missing:
@@ -322,7 +374,7 @@ def _collect_student_data(lessons_root: Optional[Path],
                 print(f'  [assign/{assign_dir.name}] skipped: no remarks.xlsx or remarks_<ts>.xlsx')
                 continue
             wanted = ('ID', 'Student', 'Number', 'Category', 'Grade', 'Status', 'Obs')
-            col_idx, rows = _read_grades_rows(xlsx, wanted)
+            col_idx, rows = _read_grades_rows(xlsx, wanted, store, f'assignments/{assign_key}')
             missing = [h for h in wanted if col_idx.get(h) is None]
             for h in ('Grade', 'Status', 'Obs'):
                 if h in missing:
@@ -392,18 +444,16 @@ def _build_row_values(sid: str,
     return out
 
 
-def _read_extra_xlsx(root: Path) -> Tuple[
+def _read_extra_xlsx(root: Path, store: Optional[ResultsStore] = None) -> Tuple[
         Dict[str, dict], List[str], List[str], List[Tuple[str, str]]]:
     empty = ({}, [], [], [])
     path = root / 'Extra.xlsx'
     if not path.is_file():
         return empty
-    wb = load_workbook(path, data_only=True, read_only=True)
-    ws = wb['Grades'] if 'Grades' in wb.sheetnames else wb.active
-    rows = list(ws.iter_rows(values_only=True))
-    wb.close()
-    if not rows:
+    header_row, data_rows = _load_sheet(path, store, '', 'extra', sheet='Grades')
+    if header_row is None:
         return empty
+    rows = [header_row] + data_rows
 
     header = [_to_str(c) for c in rows[0]]
     id_idx = next((i for i, h in enumerate(header) if h.lower() == 'id'), None)
@@ -496,6 +546,9 @@ def main(argv) -> int:
     parser.add_argument('--output', default=None,
                         help='Output filename (relative to root). '
                              'Defaults to overview.json.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for parsing changed workbooks '
+                             '(default: CPU count; 1 parses serially).')
     parser.add_argument('--no-stats', action='store_true',
                         help='Skip the chained analyze_grades step '
                              '(grades_stats.json will not be refreshed).')
@@ -537,34 +590,44 @@ def main(argv) -> int:
     if excluded_ids or llm_ids:
         print()
 
-    student_data, lesson_meta = _collect_student_data(
-        lessons_root, assignments_root, topics_set, excluded_ids,
-    )
-
-    if not student_data:
-        print('\nNo student rows collected.', file=sys.stderr)
-        return 1
-
-    for sid, info in student_data.items():
-        cat = info.get('category')
-        if is_llm_category(cat):
-            llm_ids.add(sid)
-        elif (cat or '').strip().upper() == 'EXCLUDED':
-            excluded_ids.add(sid)
-    if excluded_ids:
-        print(f'Excluded total: {len(excluded_ids)} student(s) '
-              f'(students.csv + remarks sheets)')
-    if llm_ids:
-        print(f'LLM/AI total: {len(llm_ids)} row(s) '
-              f'(students.csv + remarks sheets)')
-
-    extra_by_sid, extra_before, extra_after, extra_pairs = _read_extra_xlsx(root)
+    store = ResultsStore.for_course(root)
+    try:
+        n_parsed = _prefetch_workbooks(
+            store, _workbook_sources(root, lessons_root, assignments_root, topics_set),
+            args.jobs,
+        )
+        if n_parsed:
+            print(f'Parsed {n_parsed} changed workbook(s) with {min(args.jobs, n_parsed)} worker(s)')
+        student_data, lesson_meta = _collect_student_data(
+            lessons_root, assignments_root, topics_set, excluded_ids, store,
+        )
 
-    header, rows = _build_table(
-        student_data, lesson_meta, topics, excluded_ids, llm_ids,
-        extra_by_sid, extra_before, extra_after,
-    )
-    lesson_stats = _collect_lesson_stats_rows(lessons_root, topics)
+        if not student_data:
+            print('\nNo student rows collected.', file=sys.stderr)
+            return 1
+
+        for sid, info in student_data.items():
+            cat = info.get('category')
+            if is_llm_category(cat):
+                llm_ids.add(sid)
+            elif (cat or '').strip().upper() == 'EXCLUDED':
+                excluded_ids.add(sid)
+        if excluded_ids:
+            print(f'Excluded total: {len(excluded_ids)} student(s) '
+                  f'(students.csv + remarks sheets)')
+        if llm_ids:
+            print(f'LLM/AI total: {len(llm_ids)} row(s) '
+                  f'(students.csv + remarks sheets)')
+
+        extra_by_sid, extra_before, extra_after, extra_pairs = _read_extra_xlsx(root, store)
+
+        header, rows = _build_table(
+            student_data, lesson_meta, topics, excluded_ids, llm_ids,
+            extra_by_sid, extra_before, extra_after,
+        )
+        lesson_stats = _collect_lesson_stats_rows(lessons_root, topics, store)
+    finally:
+        store.close()
 
     out_path = root / (args.output or 'overview.json')
     payload = {'header': header, 'rows': rows}
@@ -25,6 +25,10 @@ Two modes:
     looked up in PROJECT_DIR itself or PROJECT_DIR/reconstructed/. Output:
     PROJECT_DIR/methods_vs_ideal.xlsx.
 
+Both modes take --jobs=N (default: CPU count; 1 runs serially): students
+are evaluated in a process pool and merged in student order, so the
+workbooks are identical to a serial run.
+
 For each (student, method, label) where label ∈ {missing, extra, ghost_extra}:
   * mark-level TP/FP/FN/TN with precision, recall, F1, accuracy
     (universe = all non-comment tokens in the relevant source files)
@@ -64,18 +68,23 @@ Per (student, method) — outcome-based, independent of the label classification
 
 from __future__ import annotations
 
-import difflib
-import json
+import contextlib
+import os
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
+from languages import RangeIndex
+from utils.diff_marks_io import load_diff_marks
 from utils.folder_utils import TEACHER_SUBDIRS, find_subdir, pick_folder
-from utils.similarity_measures import _CHAR_TOKEN_RE, _comment_ranges
+from utils.seq_diff import diff_opcodes, edit_distance
+from utils.token_cache import tokenize
+from utils.token_log_lang_stats import _embedded_lang_index_for
 from utils.token_log_mixin import (
     _LANG_EXT_LABEL,
     _effective_ext_at,
-    _embedded_lang_ranges_for,
     _ext_of,
 )
 
@@ -100,9 +109,8 @@ METHOD_LABELS = {
 }
 
 
-def _load_json(path: Path):
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+def _load_json(path: Path, fields=None):
+    return load_diff_marks(path, fields=fields)
 
 
 def _read_text(path: Path) -> str:
@@ -113,39 +121,11 @@ def _read_text(path: Path) -> str:
 
 
 def _non_comment_token_count(text: str, ext: str | None = None) -> int:
-    starts, ends = _comment_ranges(text, ext)
-    spans = list(zip(starts, ends))
-    n = 0
-    for tm in _CHAR_TOKEN_RE.finditer(text):
-        pos = tm.start()
-        in_comment = False
-        for lo, hi in spans:
-            if lo <= pos < hi:
-                in_comment = True
-                break
-            if pos < lo:
-                break
-        if not in_comment:
-            n += 1
-    return n
+    return len(tokenize(text, ext).split()[0])
 
 
 def _non_comment_tokens(text: str, ext: str | None = None) -> list[str]:
-    starts, ends = _comment_ranges(text, ext)
-    spans = list(zip(starts, ends))
-    out: list[str] = []
-    for tm in _CHAR_TOKEN_RE.finditer(text):
-        pos = tm.start()
-        in_comment = False
-        for lo, hi in spans:
-            if lo <= pos < hi:
-                in_comment = True
-                break
-            if pos < lo:
-                break
-        if not in_comment:
-            out.append(tm.group(0))
-    return out
+    return [tok for _, tok in tokenize(text, ext).split()[0]]
 
 
 def _build_edit_list(student_marks_for_file, teacher_marks_flat, fname):
@@ -212,13 +192,7 @@ def _flatten_teacher_missings(data) -> list:
 
 
 def _token_edit_distance(a: list[str], b: list[str]) -> int:
-    sm = difflib.SequenceMatcher(a=a, b=b, autojunk=False)
-    dist = 0
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
-        if tag == "equal":
-            continue
-        dist += max(i2 - i1, j2 - j1)
-    return dist
+    return edit_distance(diff_opcodes(a, b))
 
 
 def _find_teacher_file(project_dir: Path, fname: str) -> Path | None:
@@ -458,202 +432,249 @@ _TOTALS_COLS = [
 ]
 
 
-def evaluate(
-    teacher_dir: Path, students_dir: Path | None = None,
-) -> tuple[list[dict], list[dict], dict[str, dict]]:
-    if students_dir is None:
-        students_dir = teacher_dir
-    students = _list_students(students_dir)
-    if not students:
-        raise SystemExit(f"No student subfolders with {IDEAL_FILE} in {students_dir}")
-    project_dir = teacher_dir
+# Per-process teacher/student token counts, keyed by project dir, reused by a
+# worker across the students of a lesson it is handed.
+_universe_caches: dict[str, dict] = {}
+
+
+def _evaluate_student(
+    project_dir: Path, student_dir: Path, universe_cache: dict | None = None,
+) -> dict:
+    """Score every diff_marks_<method>.json of one student against its ideal.
+
+    Runs in a worker process under `--jobs`, so console output is returned
+    in `log` and replayed by `_merge_outcomes` in student order."""
+    if universe_cache is None:
+        universe_cache = _universe_caches.setdefault(str(project_dir), {})
+    student_id = student_dir.name
+    log: list[tuple[str, bool]] = []
+    rows: list[tuple[str, str, dict]] = []
+    results: list[tuple[str, int, int, int]] = []
+    ideal_data = _load_json(student_dir / IDEAL_FILE)
+    outcome = {
+        "student_dir": student_dir,
+        "log": log,
+        "rows": rows,
+        "results": results,
+        "ideal": {k: ideal_data.get(k) for k in ("teacher_files", "student_files")},
+    }
+    ideal_marks = _collect_marks(ideal_data)
 
-    per_student: list[dict] = []
-    aggregate: dict[tuple[str, str], dict] = {}
-    methods_per_student_count: dict[tuple[str, str], int] = defaultdict(int)
-    universe_cache: dict = {}
-    result_aggregate: dict[str, dict] = {}
+    methods = _list_methods(student_dir)
+    if not methods:
+        log.append((f"  {student_id}: no diff_marks_<method>.json siblings; skipping", False))
+        return outcome
+    method_names = ", ".join(_method_display_name(m) for m, _ in methods)
+    log.append((f"  {student_id}: {len(methods)} method(s) — {method_names}", False))
 
-    for student_dir in students:
-        student_id = student_dir.name
-        ideal_path = student_dir / IDEAL_FILE
-        ideal_data = _load_json(ideal_path)
-        ideal_marks = _collect_marks(ideal_data)
-
-        methods = _list_methods(student_dir)
-        if not methods:
-            print(f"  {student_id}: no diff_marks_<method>.json siblings; skipping")
+    per_method_data = {}
+    for method, mpath in methods:
+        try:
+            per_method_data[method] = _load_json(mpath)
+        except Exception as e:
+            log.append((f"  warn: failed to load {mpath}: {e}", True))
+
+    named_data = {"ideal": ideal_data, **per_method_data}
+    teacher_src, student_src = _files_referenced_by_source(named_data)
+
+    teacher_universe = {}
+    for fname in teacher_src:
+        n = _universe_size(
+            "teacher", fname, project_dir, student_dir, universe_cache,
+        )
+        if n == 0 and not _find_teacher_file(project_dir, fname):
+            srcs = ", ".join(_method_display_name(s) for s in teacher_src[fname])
+            log.append((
+                f"  warn: skipping teacher-side {fname!r} for student "
+                f"{student_id} (referenced by {srcs}; file not found)",
+                True,
+            ))
+            continue
+        teacher_universe[fname] = n
+
+    student_universe = {}
+    for fname in student_src:
+        n = _universe_size(
+            "student", fname, project_dir, student_dir, universe_cache,
+        )
+        if n == 0 and not _find_student_file(student_dir, fname):
+            srcs = ", ".join(_method_display_name(s) for s in student_src[fname])
+            log.append((
+                f"  warn: skipping student-side {fname!r} for student "
+                f"{student_id} (referenced by {srcs}; file not found)",
+                True,
+            ))
             continue
-        method_names = ", ".join(_method_display_name(m) for m, _ in methods)
-        print(f"  {student_id}: {len(methods)} method(s) — {method_names}")
+        student_universe[fname] = n
 
-        per_method_data = {}
-        for method, mpath in methods:
-            try:
-                per_method_data[method] = _load_json(mpath)
-            except Exception as e:
-                print(f"  warn: failed to load {mpath}: {e}", file=sys.stderr)
+    def _filter_marks(marks_by_file, allowed):
+        return {f: m for f, m in marks_by_file.items() if f in allowed}
 
-        named_data = {"ideal": ideal_data, **per_method_data}
-        teacher_src, student_src = _files_referenced_by_source(named_data)
+    ideal_marks = {
+        lbl: _filter_marks(
+            ideal_marks[lbl],
+            teacher_universe if lbl == "missing" else student_universe,
+        )
+        for lbl in ideal_marks
+    }
 
-        teacher_universe = {}
-        for fname in teacher_src:
-            n = _universe_size(
-                "teacher", fname, project_dir, student_dir, universe_cache,
+    student_text_cache: dict[str, tuple[str, str]] = {}
+    for fname in student_universe:
+        spath = _find_student_file(student_dir, fname)
+        if spath:
+            student_text_cache[fname] = (
+                _read_text(spath), spath.suffix.lower(),
             )
-            if n == 0 and not _find_teacher_file(project_dir, fname):
-                srcs = ", ".join(_method_display_name(s) for s in teacher_src[fname])
-                print(
-                    f"  warn: skipping teacher-side {fname!r} for student "
-                    f"{student_id} (referenced by {srcs}; file not found)",
-                    file=sys.stderr,
-                )
-                continue
-            teacher_universe[fname] = n
 
-        student_universe = {}
-        for fname in student_src:
-            n = _universe_size(
-                "student", fname, project_dir, student_dir, universe_cache,
+    ideal_teacher_missings = _flatten_teacher_missings(ideal_data)
+    ideal_corrected_tokens: dict[str, list[str]] = {}
+    student_baseline_dist = 0
+    for fname, (text, ext) in student_text_cache.items():
+        ideal_student_marks = (ideal_data.get("student_files") or {}).get(fname, [])
+        edits = _build_edit_list(ideal_student_marks, ideal_teacher_missings, fname)
+        ideal_corrected_tokens[fname] = _non_comment_tokens(
+            _apply_edits(text, edits), ext,
+        )
+        original_tokens = _non_comment_tokens(text, ext)
+        student_baseline_dist += _token_edit_distance(
+            original_tokens, ideal_corrected_tokens[fname],
+        )
+
+    for method, mdata in per_method_data.items():
+        method_teacher_missings = _flatten_teacher_missings(mdata)
+        student_dist = 0
+        student_ideal_len = 0
+        for fname, (text, ext) in student_text_cache.items():
+            m_student_marks = (mdata.get("student_files") or {}).get(fname, [])
+            edits = _build_edit_list(
+                m_student_marks, method_teacher_missings, fname,
             )
-            if n == 0 and not _find_student_file(student_dir, fname):
-                srcs = ", ".join(_method_display_name(s) for s in student_src[fname])
-                print(
-                    f"  warn: skipping student-side {fname!r} for student "
-                    f"{student_id} (referenced by {srcs}; file not found)",
-                    file=sys.stderr,
-                )
-                continue
-            student_universe[fname] = n
-
-        def _filter_marks(marks_by_file, allowed):
-            return {f: m for f, m in marks_by_file.items() if f in allowed}
-
-        ideal_marks = {
+            method_tokens = _non_comment_tokens(_apply_edits(text, edits), ext)
+            ideal_tokens = ideal_corrected_tokens.get(fname, [])
+            student_dist += _token_edit_distance(method_tokens, ideal_tokens)
+            student_ideal_len += len(ideal_tokens)
+        results.append((method, student_dist, student_ideal_len, student_baseline_dist))
+
+        method_marks = _collect_marks(mdata)
+        method_marks = {
             lbl: _filter_marks(
-                ideal_marks[lbl],
+                method_marks[lbl],
                 teacher_universe if lbl == "missing" else student_universe,
             )
-            for lbl in ideal_marks
+            for lbl in method_marks
         }
+        is_star = _is_star_method(method)
+
+        label_specs: list[tuple[str, dict, dict, dict, bool]] = []
+        label_specs.append((
+            "missing",
+            method_marks["missing"],
+            ideal_marks["missing"],
+            teacher_universe,
+            False,
+        ))
+        if is_star:
+            label_specs.append((
+                "extra",
+                method_marks["extra"],
+                ideal_marks["extra"],
+                student_universe,
+                False,
+            ))
+            label_specs.append((
+                "ghost_extra",
+                method_marks["ghost_extra"],
+                ideal_marks["ghost_extra"],
+                student_universe,
+                False,
+            ))
+        else:
+            label_specs.append((
+                "extra (incl. ghost)",
+                _merge_marks(method_marks["extra"], method_marks["ghost_extra"]),
+                _merge_marks(ideal_marks["extra"], ideal_marks["ghost_extra"]),
+                student_universe,
+                True,
+            ))
 
-        student_text_cache: dict[str, tuple[str, str]] = {}
-        for fname in student_universe:
-            spath = _find_student_file(student_dir, fname)
-            if spath:
-                student_text_cache[fname] = (
-                    _read_text(spath), spath.suffix.lower(),
-                )
-
-        ideal_teacher_missings = _flatten_teacher_missings(ideal_data)
-        ideal_corrected_tokens: dict[str, list[str]] = {}
-        student_baseline_dist = 0
-        for fname, (text, ext) in student_text_cache.items():
-            ideal_student_marks = (ideal_data.get("student_files") or {}).get(fname, [])
-            edits = _build_edit_list(ideal_student_marks, ideal_teacher_missings, fname)
-            ideal_corrected_tokens[fname] = _non_comment_tokens(
-                _apply_edits(text, edits), ext,
-            )
-            original_tokens = _non_comment_tokens(text, ext)
-            student_baseline_dist += _token_edit_distance(
-                original_tokens, ideal_corrected_tokens[fname],
+        for label, m_marks, t_marks, universe, ignore_ghost_pairs in label_specs:
+            stats = _score_label_for_files(
+                label, m_marks, t_marks, universe,
+                ignore_ghost_pairs=ignore_ghost_pairs,
             )
+            rows.append((method, label, stats))
 
-        for method, mdata in per_method_data.items():
-            method_teacher_missings = _flatten_teacher_missings(mdata)
-            student_dist = 0
-            student_ideal_len = 0
-            for fname, (text, ext) in student_text_cache.items():
-                m_student_marks = (mdata.get("student_files") or {}).get(fname, [])
-                edits = _build_edit_list(
-                    m_student_marks, method_teacher_missings, fname,
-                )
-                method_tokens = _non_comment_tokens(_apply_edits(text, edits), ext)
-                ideal_tokens = ideal_corrected_tokens.get(fname, [])
-                student_dist += _token_edit_distance(method_tokens, ideal_tokens)
-                student_ideal_len += len(ideal_tokens)
+    return outcome
+
+
+def _submit_students(
+    project_dir: Path, students_dir: Path, pool: ProcessPoolExecutor | None,
+) -> list:
+    """One zero-argument callable per student (in `_list_students` order)
+    returning its `_evaluate_student` outcome; with a pool the students are
+    already running when this returns."""
+    students = _list_students(students_dir)
+    if not students:
+        raise SystemExit(f"No student subfolders with {IDEAL_FILE} in {students_dir}")
+    if pool is None:
+        universe_cache: dict = {}
+        return [partial(_evaluate_student, project_dir, s, universe_cache)
+                for s in students]
+    return [pool.submit(_evaluate_student, project_dir, s).result
+            for s in students]
+
+
+def _merge_outcomes(
+    outcomes: list[dict],
+) -> tuple[list[dict], list[dict], dict[str, dict]]:
+    """Fold per-student outcomes, in the order given, into the per-student
+    rows, totals rows and per-method Result aggregates."""
+    per_student: list[dict] = []
+    aggregate: dict[tuple[str, str], dict] = {}
+    methods_per_student_count: dict[tuple[str, str], int] = defaultdict(int)
+    result_aggregate: dict[str, dict] = {}
+
+    for outcome in outcomes:
+        for msg, is_err in outcome["log"]:
+            print(msg, file=sys.stderr if is_err else sys.stdout)
+        student_id = outcome["student_dir"].name
+
+        for method, student_dist, student_ideal_len, baseline_dist in outcome["results"]:
             ragg = result_aggregate.setdefault(method, {
                 "Result Dist": 0, "Result Ideal Tokens": 0,
                 "Baseline Dist": 0, "Students": 0, "Exact": 0,
             })
             ragg["Result Dist"] += student_dist
             ragg["Result Ideal Tokens"] += student_ideal_len
-            ragg["Baseline Dist"] += student_baseline_dist
+            ragg["Baseline Dist"] += baseline_dist
             ragg["Students"] += 1
             if student_ideal_len > 0 and student_dist == 0:
                 ragg["Exact"] += 1
 
-            method_marks = _collect_marks(mdata)
-            method_marks = {
-                lbl: _filter_marks(
-                    method_marks[lbl],
-                    teacher_universe if lbl == "missing" else student_universe,
-                )
-                for lbl in method_marks
+        for method, label, stats in outcome["rows"]:
+            row = {
+                "Student": student_id,
+                "Method": _method_display_name(method),
+                "_method_key": method,
+                "Label": label,
+                **stats,
             }
-            is_star = _is_star_method(method)
-
-            label_specs: list[tuple[str, dict, dict, dict, bool]] = []
-            label_specs.append((
-                "missing",
-                method_marks["missing"],
-                ideal_marks["missing"],
-                teacher_universe,
-                False,
-            ))
-            if is_star:
-                label_specs.append((
-                    "extra",
-                    method_marks["extra"],
-                    ideal_marks["extra"],
-                    student_universe,
-                    False,
-                ))
-                label_specs.append((
-                    "ghost_extra",
-                    method_marks["ghost_extra"],
-                    ideal_marks["ghost_extra"],
-                    student_universe,
-                    False,
-                ))
-            else:
-                label_specs.append((
-                    "extra (incl. ghost)",
-                    _merge_marks(method_marks["extra"], method_marks["ghost_extra"]),
-                    _merge_marks(ideal_marks["extra"], ideal_marks["ghost_extra"]),
-                    student_universe,
-                    True,
-                ))
-
-            for label, m_marks, t_marks, universe, ignore_ghost_pairs in label_specs:
-                stats = _score_label_for_files(
-                    label, m_marks, t_marks, universe,
-                    ignore_ghost_pairs=ignore_ghost_pairs,
-                )
-                row = {
-                    "Student": student_id,
-                    "Method": _method_display_name(method),
-                    "_method_key": method,
-                    "Label": label,
-                    **stats,
-                }
-                _add_metrics(row)
-                per_student.append(row)
-
-                key = (method, label)
-                agg = aggregate.setdefault(key, {
-                    "TP": 0, "FP": 0, "FN": 0, "TN": 0,
-                    "Pair TP": 0, "Pair FP": 0, "Pair FN": 0, "Pair TN": 0,
-                    "Pair Dist Sum": 0, "Pair Dist N": 0, "Pair Dist Max": 0,
-                })
-                for k in ("TP", "FP", "FN", "TN",
-                         "Pair TP", "Pair FP", "Pair FN", "Pair TN",
-                         "Pair Dist Sum", "Pair Dist N"):
-                    agg[k] += stats[k]
-                if stats["Pair Dist Max"] > agg["Pair Dist Max"]:
-                    agg["Pair Dist Max"] = stats["Pair Dist Max"]
-                methods_per_student_count[key] += 1
+            _add_metrics(row)
+            per_student.append(row)
+
+            key = (method, label)
+            agg = aggregate.setdefault(key, {
+                "TP": 0, "FP": 0, "FN": 0, "TN": 0,
+                "Pair TP": 0, "Pair FP": 0, "Pair FN": 0, "Pair TN": 0,
+                "Pair Dist Sum": 0, "Pair Dist N": 0, "Pair Dist Max": 0,
+            })
+            for k in ("TP", "FP", "FN", "TN",
+                     "Pair TP", "Pair FP", "Pair FN", "Pair TN",
+                     "Pair Dist Sum", "Pair Dist N"):
+                agg[k] += stats[k]
+            if stats["Pair Dist Max"] > agg["Pair Dist Max"]:
+                agg["Pair Dist Max"] = stats["Pair Dist Max"]
+            methods_per_student_count[key] += 1
 
     totals: list[dict] = []
     for (method, label), stats in aggregate.items():
@@ -686,6 +707,16 @@ def evaluate(
     return per_student, totals, result_aggregate
 
 
+def evaluate(
+    teacher_dir: Path, students_dir: Path | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> tuple[list[dict], list[dict], dict[str, dict]]:
+    if students_dir is None:
+        students_dir = teacher_dir
+    pending = _submit_students(teacher_dir, students_dir, pool)
+    return _merge_outcomes([get() for get in pending])
+
+
 def _autosize(ws, df):
     from openpyxl.utils import get_column_letter
     for col_idx, col in enumerate(df.columns, start=1):
@@ -753,13 +784,23 @@ def _safe_sheet_name(name: str, used: set[str]) -> str:
     return safe
 
 
-def _evaluate_lesson_languages(lesson_dir: Path) -> dict[str, dict]:
+def _evaluate_lesson_languages(
+    lesson_dir: Path, ideals: dict[Path, dict] | None = None,
+) -> dict[str, dict]:
+    """Per-language token and mark counts of the ideals; `ideals` maps a
+    student dir to its already parsed teacher_files/student_files."""
     students_dir = lesson_dir / "anon_ids"
     if not students_dir.is_dir():
         return {}
     students = _list_students(students_dir)
     if not students:
         return {}
+    ideals = dict(ideals or {})
+    for student_dir in students:
+        if student_dir not in ideals:
+            ideals[student_dir] = _load_json(
+                student_dir / IDEAL_FILE, fields=("teacher_files", "student_files"),
+            )
 
     valid_exts = {ext for ext, _ in _LANG_EXT_LABEL}
     teacher_tokens: dict[str, int] = {}
@@ -767,12 +808,12 @@ def _evaluate_lesson_languages(lesson_dir: Path) -> dict[str, dict]:
     extra_counts: dict[str, int] = {}
     ghost_counts: dict[str, int] = {}
 
-    teacher_ranges_cache: dict[str, dict] = {}
-    student_ranges_cache: dict[tuple[str, str], dict] = {}
+    teacher_ranges_cache: dict[str, RangeIndex] = {}
+    student_ranges_cache: dict[tuple[str, str], RangeIndex] = {}
 
     referenced_teacher_files: set[str] = set()
     for student_dir in students:
-        ideal_data = _load_json(student_dir / IDEAL_FILE)
+        ideal_data = ideals[student_dir]
         for fname in (ideal_data.get("teacher_files") or {}):
             referenced_teacher_files.add(fname)
 
@@ -784,32 +825,19 @@ def _evaluate_lesson_languages(lesson_dir: Path) -> dict[str, dict]:
         if not path:
             continue
         text = _read_text(path)
-        ranges = _embedded_lang_ranges_for(text, ext)
-        teacher_ranges_cache[fname] = ranges
-        starts, ends = _comment_ranges(text, ext)
-        spans = list(zip(starts, ends))
-        for tm in _CHAR_TOKEN_RE.finditer(text):
-            pos = tm.start()
-            in_comment = False
-            for lo, hi in spans:
-                if lo <= pos < hi:
-                    in_comment = True
-                    break
-                if pos < lo:
-                    break
-            if in_comment:
-                continue
-            eff_ext = _effective_ext_at(pos, ext, ranges)
+        tf = tokenize(text, ext)
+        teacher_ranges_cache[fname] = tf.lang_index()
+        for eff_ext, counts in tf.scan.tokens_by_lang().items():
             if eff_ext in valid_exts:
-                teacher_tokens[eff_ext] = teacher_tokens.get(eff_ext, 0) + 1
+                teacher_tokens[eff_ext] = teacher_tokens.get(eff_ext, 0) + sum(counts.values())
 
     for student_dir in students:
-        ideal_data = _load_json(student_dir / IDEAL_FILE)
+        ideal_data = ideals[student_dir]
         for fname, items in (ideal_data.get("teacher_files") or {}).items():
             ext = _ext_of(fname)
             if ext not in valid_exts:
                 continue
-            ranges = teacher_ranges_cache.get(fname, {})
+            ranges = teacher_ranges_cache.get(fname) or RangeIndex()
             for m in (items or []):
                 if m.get("label") != "missing":
                     continue
@@ -828,9 +856,9 @@ def _evaluate_lesson_languages(lesson_dir: Path) -> dict[str, dict]:
                 spath = _find_student_file(student_dir, fname)
                 if spath:
                     text = _read_text(spath)
-                    student_ranges_cache[cache_key] = _embedded_lang_ranges_for(text, ext)
+                    student_ranges_cache[cache_key] = _embedded_lang_index_for(text, ext)
                 else:
-                    student_ranges_cache[cache_key] = {}
+                    student_ranges_cache[cache_key] = RangeIndex()
             ranges = student_ranges_cache[cache_key]
             for m in (items or []):
                 lbl = m.get("label")
@@ -1092,16 +1120,27 @@ def _list_lesson_dirs(lessons_root: Path) -> list[Path]:
     return sorted(d for d in lessons_root.iterdir() if d.is_dir())
 
 
-def evaluate_lesson(
-    lesson_dir: Path,
-) -> tuple[list[dict], list[dict], dict[str, dict]]:
+def _submit_lesson(lesson_dir: Path, pool: ProcessPoolExecutor | None) -> list:
     students_dir = lesson_dir / "anon_ids"
     if not students_dir.is_dir():
-        return [], [], {}
-    return evaluate(teacher_dir=lesson_dir, students_dir=students_dir)
+        return []
+    return _submit_students(lesson_dir, students_dir, pool)
+
+
+def evaluate_lesson(
+    lesson_dir: Path, pool: ProcessPoolExecutor | None = None,
+) -> tuple[list[dict], list[dict], dict[str, dict]]:
+    return _merge_outcomes([get() for get in _submit_lesson(lesson_dir, pool)])
+
 
+def _student_pool(jobs: int):
+    """A process pool for `jobs` > 1, else a context yielding None (serial)."""
+    if jobs < 2:
+        return contextlib.nullcontext()
+    return ProcessPoolExecutor(max_workers=jobs)
 
-def run_multi(root: Path) -> int:
+
+def run_multi(root: Path, jobs: int = 1) -> int:
     lessons_root = find_subdir(root, 'lessons')
     if not lessons_root:
         print(f"error: no lessons/ folder found in {root}", file=sys.stderr)
@@ -1116,20 +1155,32 @@ def run_multi(root: Path) -> int:
     print(f"Lessons folder: {lessons_root}")
     results: dict[str, tuple[list[dict], list[dict], dict[str, dict]]] = {}
     lang_stats: dict[str, dict] = {}
-    for lesson_dir in lesson_dirs:
-        lesson_name = lesson_dir.name
-        print(f"\n[{lesson_name}]")
-        try:
-            per_student, totals, result_agg = evaluate_lesson(lesson_dir)
-        except SystemExit as e:
-            print(f"  skipped: {e}")
-            continue
-        if not totals:
-            print(f"  skipped: no anon_ids/ or no methods to compare")
-            continue
-        results[lesson_name] = (per_student, totals, result_agg)
-        lang_stats[lesson_name] = _evaluate_lesson_languages(lesson_dir)
-        print(f"  {len(per_student)} per-student rows · {len(totals)} totals rows")
+    with _student_pool(jobs) as pool:
+        # Every (lesson, student) is queued up front so the pool stays busy
+        # across lesson boundaries; outcomes are merged lesson by lesson, in
+        # student order, exactly as the serial run would.
+        submitted = []
+        for lesson_dir in lesson_dirs:
+            try:
+                submitted.append((lesson_dir, _submit_lesson(lesson_dir, pool)))
+            except SystemExit as e:
+                submitted.append((lesson_dir, e))
+        for lesson_dir, pending in submitted:
+            lesson_name = lesson_dir.name
+            print(f"\n[{lesson_name}]")
+            if isinstance(pending, SystemExit):
+                print(f"  skipped: {pending}")
+                continue
+            outcomes = [get() for get in pending]
+            per_student, totals, result_agg = _merge_outcomes(outcomes)
+            if not totals:
+                print(f"  skipped: no anon_ids/ or no methods to compare")
+                continue
+            results[lesson_name] = (per_student, totals, result_agg)
+            lang_stats[lesson_name] = _evaluate_lesson_languages(
+                lesson_dir, {o["student_dir"]: o["ideal"] for o in outcomes},
+            )
+            print(f"  {len(per_student)} per-student rows · {len(totals)} totals rows")
 
     if not results:
         print("\nNo lessons produced any results.", file=sys.stderr)
@@ -1143,13 +1194,26 @@ def run_multi(root: Path) -> int:
 
 
 def main(argv: list[str]) -> int:
-    if len(argv) > 1:
-        project_dir = Path(argv[1]).resolve()
+    jobs = os.cpu_count() or 1
+    args: list[str] = []
+    for arg in argv[1:]:
+        if arg.startswith("--jobs="):
+            try:
+                jobs = int(arg.split("=", 1)[1])
+            except ValueError:
+                print(f"error: bad {arg!r}", file=sys.stderr)
+                return 1
+        else:
+            args.append(arg)
+
+    if args:
+        project_dir = Path(args[0]).resolve()
         if not project_dir.is_dir():
             print(f"error: {project_dir} is not a directory", file=sys.stderr)
             return 1
         print(f"Project: {project_dir}")
-        per_student, totals, _result_agg = evaluate(project_dir)
+        with _student_pool(jobs) as pool:
+            per_student, totals, _result_agg = evaluate(project_dir, pool=pool)
         if not per_student:
             print("No methods to compare.")
             return 0
@@ -1166,7 +1230,7 @@ def main(argv: list[str]) -> int:
     if not root.is_dir():
         print(f"error: {root} is not a directory", file=sys.stderr)
         return 1
-    return run_multi(root)
+    return run_multi(root, jobs)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 import argparse
+import datetime
+import email.utils
+import gzip
+import hashlib
 import http
 import http.server
 import io
@@ -13,10 +17,13 @@ import time
 import urllib.parse
 import webbrowser
 import zipfile
+import zlib
+from collections import OrderedDict, deque
 from pathlib import Path
 
 from utils.folder_utils import resolve_course
-from build_manifest import _build_manifest, _PII_FILES
+from utils.results_store import STORE_NAME
+from build_manifest import MANIFEST_CACHE_NAME, _build_manifest, _load_dir_cache, _PII_FILES
 import json
 
 ROOT_DIR = Path(__file__).resolve().parent
@@ -65,37 +72,183 @@ def _copy_if_newer(src: Path, dst: Path) -> bool:
     return True
 
 
+_SYNC_MANIFEST = ".sync_manifest.json"
+
+
+def _read_json_file(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _file_stamp(path: Path) -> list[int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
 def _sync_tools(course: Path) -> tuple[int, int]:
+    """Copy the browser tools into the course. Source stamps (size, mtime_ns)
+    are hashed into one digest; when it matches the digest recorded by the
+    previous sync and every copy still has its recorded stamp, nothing is
+    copied. A copy that went missing or changed is restored from its source.
+    """
+    tools_dir = course / "tools"
+    pairs = [(src, tools_dir / rel_dst) for src, rel_dst in _list_tool_files()]
+    pairs += [(src, course / src.relative_to(REPO_ROOT)) for src in _list_chart_files()]
+    stamps: dict[str, list[int]] = {}
+    for src, dst in pairs:
+        st = src.stat()
+        stamps[dst.relative_to(course).as_posix()] = [st.st_size, st.st_mtime_ns]
+    digest = hashlib.blake2b(
+        json.dumps(stamps, sort_keys=True).encode("utf-8"), digest_size=16,
+    ).hexdigest()
+    manifest_path = tools_dir / _SYNC_MANIFEST
+    previous = _read_json_file(manifest_path)
+    old_stamps = previous.get("files") or {}
+    old_dests = previous.get("dests") or {}
+    dest_stamps = {key: _file_stamp(dst) for key, (_, dst) in zip(stamps, pairs)}
+    if previous.get("digest") == digest and all(
+            st is not None and old_dests.get(key) == st for key, st in dest_stamps.items()):
+        return 0, len(pairs)
     copied = 0
     skipped = 0
-    tools_dir = course / "tools"
-    for src, rel_dst in _list_tool_files():
-        dst = tools_dir / rel_dst
-        if _copy_if_newer(src, dst):
+    for src, dst in pairs:
+        key = dst.relative_to(course).as_posix()
+        dst_ok = dest_stamps[key] is not None and old_dests.get(key) == dest_stamps[key]
+        if old_stamps.get(key) == stamps[key] and not dst_ok:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
             copied += 1
-        else:
-            skipped += 1
-    for src in _list_chart_files():
-        rel = src.relative_to(REPO_ROOT)
-        dst = course / rel
-        if _copy_if_newer(src, dst):
+        elif old_stamps.get(key) != stamps[key] and _copy_if_newer(src, dst):
             copied += 1
         else:
             skipped += 1
+        dest_stamps[key] = _file_stamp(dst)
+    try:
+        tools_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(
+            {"digest": digest, "files": stamps, "dests": dest_stamps}), encoding="utf-8")
+    except OSError:
+        pass
     return copied, skipped
 
 
-def _write_manifest(course: Path, *, exclude_pii: bool) -> Path:
-    manifest = _build_manifest(course, exclude_pii=exclude_pii)
-    out_path = course / "manifest.json"
-    out_path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
-    return out_path
+def _manifest_text(manifest: dict) -> str:
+    return json.dumps(manifest, indent=2) + "\n"
 
 
-def _build_plans_zip(course: Path) -> Path | None:
+def _manifest_changes(old: dict, new: dict) -> list[str]:
+    """Keys of what differs between two manifests: `rootFiles`,
+    `groups/<group>/<lesson>` and `mtimes/<key>`.
+    """
+    out: list[str] = []
+    if old.get("rootFiles") != new.get("rootFiles"):
+        out.append("rootFiles")
+    old_groups, new_groups = old.get("groups", {}), new.get("groups", {})
+    for g in sorted(set(old_groups) | set(new_groups)):
+        a, b = old_groups.get(g, {}), new_groups.get(g, {})
+        out.extend(f"groups/{g}/{k}" for k in sorted(set(a) | set(b)) if a.get(k) != b.get(k))
+    a, b = old.get("mtimes", {}), new.get("mtimes", {})
+    out.extend(f"mtimes/{k}" for k in sorted(set(a) | set(b)) if a.get(k) != b.get(k))
+    return out
+
+
+_CHANGE_HISTORY = 64
+_LONG_POLL_MAX_S = 60.0
+
+
+class _ManifestWatcher:
+    """Keeps the course manifest current by rebuilding it on a polling
+    thread and bumps `version` whenever it changes. The directory cache is
+    read from disk once and then kept in memory across polls.
+    """
+
+    def __init__(self, course: Path, *, exclude_pii: bool, interval: float = 1.0):
+        self.course = course
+        self.exclude_pii = exclude_pii
+        self.interval = interval
+        self.version = 0
+        self.manifest: dict = {}
+        self.body = b""
+        self._gz_body: bytes | None = None
+        self._history: deque = deque(maxlen=_CHANGE_HISTORY)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._dirs: dict = _load_dir_cache(course)
+
+    def refresh(self) -> bool:
+        manifest = _build_manifest(self.course, exclude_pii=self.exclude_pii, dirs=self._dirs)
+        with self._cond:
+            if self.version and manifest == self.manifest:
+                return False
+            changes = _manifest_changes(self.manifest, manifest)
+            text = _manifest_text(manifest)
+            self.manifest = manifest
+            self.body = text.encode("utf-8")
+            self._gz_body = None
+            self.version += 1
+            self._history.append((self.version, changes))
+            self._cond.notify_all()
+        try:
+            (self.course / "manifest.json").write_text(text, encoding="utf-8")
+        except OSError:
+            pass
+        return True
+
+    def gz_body(self) -> bytes:
+        with self._cond:
+            if self._gz_body is None:
+                self._gz_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            return self._gz_body
+
+    def changes_since(self, since: int, timeout: float) -> dict:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since or self._stop.is_set(),
+                                timeout=timeout)
+            out = {"version": self.version, "changed": []}
+            if self.version <= since:
+                return out
+            if not self._history or self._history[0][0] > since + 1:
+                out["full"] = True
+                return out
+            changed: set = set()
+            for version, keys in self._history:
+                if version > since:
+                    changed.update(keys)
+            out["changed"] = sorted(changed)
+            return out
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"warn: manifest refresh failed: {e}", file=sys.stderr)
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _list_plans(course: Path) -> list[Path]:
     lessons_dir = course / "lessons"
     if not lessons_dir.is_dir():
-        return None
+        return []
     plans = []
     for lesson_dir in sorted(lessons_dir.iterdir()):
         if not lesson_dir.is_dir():
@@ -105,26 +258,184 @@ def _build_plans_zip(course: Path) -> Path | None:
             plan_file = lesson_dir / f"{lesson_dir.name}.json"
         if plan_file.is_file():
             plans.append(plan_file)
+    return plans
+
+
+def _file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _build_plans_zip(course: Path) -> Path | None:
+    """Pack every lesson plan into `plans.zip`. The archive comment stores
+    each member's (size, mtime_ns); members whose stamp (or, failing that,
+    CRC-32) still matches are left alone, new plans are appended, and the
+    archive is only rewritten when a member changed or disappeared.
+    """
+    plans = _list_plans(course)
     if not plans:
         return None
     out_path = course / "plans.zip"
-    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as zf:
+    stamps = {}
+    for plan in plans:
+        st = plan.stat()
+        stamps[plan.name] = [st.st_size, st.st_mtime_ns]
+    comment = json.dumps(stamps, sort_keys=True).encode("utf-8")
+    try:
+        with zipfile.ZipFile(out_path) as zf:
+            infos = {info.filename: info for info in zf.infolist()}
+            old_stamps = json.loads(zf.comment or b"{}")
+    except (OSError, zipfile.BadZipFile, ValueError):
+        infos = None
+    if infos is not None and len(comment) <= 0xFFFF:
+        def _unchanged(plan: Path) -> bool:
+            info = infos[plan.name]
+            if old_stamps.get(plan.name) == stamps[plan.name]:
+                return True
+            return (info.file_size == stamps[plan.name][0]
+                    and info.CRC == _file_crc32(plan))
+        if set(infos) <= set(stamps) and all(_unchanged(p) for p in plans if p.name in infos):
+            added = [p for p in plans if p.name not in infos]
+            if added or old_stamps != stamps:
+                with zipfile.ZipFile(out_path, "a", zipfile.ZIP_DEFLATED) as zf:
+                    for plan in added:
+                        zf.write(plan, arcname=plan.name)
+                    zf.comment = comment
+            return out_path
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
         for plan in plans:
             zf.write(plan, arcname=plan.name)
+        if len(comment) <= 0xFFFF:
+            zf.comment = comment
+    os.replace(tmp, out_path)
     return out_path
 
 
 _ALWAYS_BLOCK_DIRS = {"students", "curated"}
 
 
+_GZIP_EXTS = {".json", ".js", ".css", ".html", ".htm", ".log", ".txt", ".csv", ".svg", ".md"}
+_GZIP_MIN_BYTES = 1024
+_GZIP_LRU_SIZE = 32
+_GZIP_LRU_MAX_BYTES = 32 * 1024 * 1024
+
+_MAX_RANGES = 32
+
+_gzip_lru: "OrderedDict[tuple, bytes]" = OrderedDict()
+_gzip_lru_bytes = 0
+_gzip_lock = threading.Lock()
+
+
+def _etag_for(st: os.stat_result) -> str:
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _is_compressible(path: str, st: os.stat_result) -> bool:
+    return st.st_size >= _GZIP_MIN_BYTES and Path(path).suffix.lower() in _GZIP_EXTS
+
+
+def _fresh_sidecar(path: str, st: os.stat_result) -> os.stat_result | None:
+    try:
+        side = os.stat(path + ".gz")
+    except OSError:
+        return None
+    return side if side.st_mtime_ns >= st.st_mtime_ns else None
+
+
+def _gzip_body(path: str, st: os.stat_result) -> bytes:
+    global _gzip_lru_bytes
+    key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _gzip_lock:
+        hit = _gzip_lru.get(key)
+        if hit is not None:
+            _gzip_lru.move_to_end(key)
+            return hit
+    with open(path, "rb") as f:
+        body = gzip.compress(f.read(), compresslevel=6, mtime=0)
+    with _gzip_lock:
+        if key not in _gzip_lru:
+            _gzip_lru[key] = body
+            _gzip_lru_bytes += len(body)
+        while _gzip_lru and (len(_gzip_lru) > _GZIP_LRU_SIZE
+                             or _gzip_lru_bytes > _GZIP_LRU_MAX_BYTES):
+            _, dropped = _gzip_lru.popitem(last=False)
+            _gzip_lru_bytes -= len(dropped)
+    return body
+
+
+def _parse_byte_ranges(header: str, size: int) -> list[tuple[int, int]] | None:
+    """Inclusive (start, end) byte ranges of a `Range` header, sorted and
+    coalesced; [] when none is satisfiable, None when the header should be
+    ignored (bad syntax, other units, too many ranges).
+    """
+    unit, eq, spec = header.partition("=")
+    if not eq or unit.strip().lower() != "bytes":
+        return None
+    ranges: list[tuple[int, int]] = []
+    n_specs = 0
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        n_specs += 1
+        first, dash, last = (x.strip() for x in part.partition("-"))
+        if not dash or not (first or last) or not all(x.isdigit() for x in (first, last) if x):
+            return None
+        if not first:
+            start, end = max(0, size - int(last)), size - 1
+            if int(last) == 0:
+                continue
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = int(last) if last else size - 1
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if not n_specs or n_specs > _MAX_RANGES:
+        return None
+    ranges.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class _RangeReader:
+    def __init__(self, f, remaining: int):
+        self._f = f
+        self._remaining = remaining
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0 or n > self._remaining:
+            n = self._remaining
+        data = self._f.read(n)
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._f.close()
+
+
 class _QuietHandler(http.server.SimpleHTTPRequestHandler):
     exclude_pii = False
+    watcher: _ManifestWatcher | None = None
+    _etag = None
+    _vary = False
+    _accept_ranges = False
 
     def log_message(self, fmt, *args):
         pass
 
     def _is_blocked_name(self, name):
-        if name in _ALWAYS_BLOCK_DIRS:
+        if name in _ALWAYS_BLOCK_DIRS or name in (MANIFEST_CACHE_NAME, STORE_NAME):
             return True
         return self.exclude_pii and name in _PII_FILES
 
@@ -136,15 +447,184 @@ class _QuietHandler(http.server.SimpleHTTPRequestHandler):
         return any(self._is_blocked_name(s) for s in segs)
 
     def end_headers(self):
-        self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-        self.send_header("Pragma", "no-cache")
-        self.send_header("Expires", "0")
+        self.send_header("Cache-Control", "no-cache")
+        if self._etag is not None:
+            self.send_header("ETag", self._etag)
+        if self._vary:
+            self.send_header("Vary", "Accept-Encoding")
+        if self._accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
         super().end_headers()
 
+    def _etag_matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if header is None:
+            return False
+        if header.strip() == "*":
+            return True
+        candidates = (c.strip() for c in header.split(","))
+        return etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+    def _not_modified(self, st):
+        if "If-None-Match" in self.headers:
+            return self._etag_matches(self._etag)
+        header = self.headers.get("If-Modified-Since")
+        if header is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(header)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return int(st.st_mtime) <= since.timestamp()
+
+    def _range_applies(self, st):
+        header = self.headers.get("If-Range")
+        if header is None:
+            return True
+        header = header.strip()
+        if header.startswith(('"', "W/")):
+            return header == self._etag
+        try:
+            since = email.utils.parsedate_to_datetime(header)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return int(st.st_mtime) == since.timestamp()
+
+    def _send_ranges(self, path, st, ranges):
+        size = st.st_size
+        if not ranges:
+            self.send_response(http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        ctype = self.guess_type(path)
+        f = open(path, "rb")
+        self.send_response(http.HTTPStatus.PARTIAL_CONTENT)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            f.seek(start)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+            self.end_headers()
+            return _RangeReader(f, end - start + 1)
+        boundary = os.urandom(12).hex()
+        body = io.BytesIO()
+        with f:
+            for start, end in ranges:
+                f.seek(start)
+                body.write(
+                    f"--{boundary}\r\nContent-Type: {ctype}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n".encode("ascii")
+                )
+                body.write(f.read(end - start + 1))
+                body.write(b"\r\n")
+            body.write(f"--{boundary}--\r\n".encode("ascii"))
+        self.send_header("Content-Type", f"multipart/byteranges; boundary={boundary}")
+        self.send_header("Content-Length", str(body.tell()))
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        self.end_headers()
+        body.seek(0)
+        return body
+
+    def _send_not_modified(self, st):
+        self.send_response(http.HTTPStatus.NOT_MODIFIED)
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        self.end_headers()
+
+    def _accepts_gzip(self):
+        for item in self.headers.get("Accept-Encoding", "").split(","):
+            coding, _, params = item.partition(";")
+            if coding.strip().lower() not in ("gzip", "*"):
+                continue
+            q = params.strip().lower()
+            if q.startswith("q="):
+                try:
+                    return float(q[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+        return False
+
+    def _send_gzip(self, path, st):
+        side = _fresh_sidecar(path, st)
+        if side is not None:
+            try:
+                f = open(path + ".gz", "rb")
+            except OSError:
+                side = None
+        if side is None:
+            body = _gzip_body(path, st)
+            f = io.BytesIO(body)
+            length = len(body)
+        else:
+            length = side.st_size
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        self.end_headers()
+        return f
+
+    def _send_manifest(self):
+        watcher = self.watcher
+        with watcher._cond:
+            version, body = watcher.version, watcher.body
+        self._etag = f'"manifest-{version}"'
+        self._vary = True
+        use_gzip = self._accepts_gzip()
+        if use_gzip:
+            body = watcher.gz_body()
+            self._etag = f'"manifest-{version}-gz"'
+        if self._etag_matches(self._etag):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.end_headers()
+            return None
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Manifest-Version", str(version))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def _send_manifest_changes(self, query):
+        params = urllib.parse.parse_qs(query)
+        try:
+            since = int(params.get("since", ["0"])[0])
+            timeout = float(params.get("timeout", [str(_LONG_POLL_MAX_S / 2)])[0])
+        except ValueError:
+            self.send_error(http.HTTPStatus.BAD_REQUEST, "Bad since/timeout")
+            return None
+        timeout = min(max(timeout, 0.0), _LONG_POLL_MAX_S)
+        body = json.dumps(self.watcher.changes_since(since, timeout)).encode("utf-8")
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
     def send_head(self):
         if self._request_is_blocked():
             self.send_error(http.HTTPStatus.FORBIDDEN, "Blocked path")
             return None
+        self._etag = None
+        self._vary = False
+        self._accept_ranges = False
+        if self.watcher is not None:
+            parts = urllib.parse.urlsplit(self.path)
+            if parts.path == "/manifest.json":
+                return self._send_manifest()
+            if parts.path == "/manifest/changes":
+                return self._send_manifest_changes(parts.query)
         path = self.translate_path(self.path)
         if os.path.isdir(path):
             parts = urllib.parse.urlsplit(self.path)
@@ -158,6 +638,28 @@ class _QuietHandler(http.server.SimpleHTTPRequestHandler):
                 self.end_headers()
                 return None
             return self.list_directory(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return super().send_head()
+        if path.endswith("/"):
+            return super().send_head()
+        self._etag = _etag_for(st)
+        self._vary = _is_compressible(path, st)
+        range_header = self.headers.get("Range")
+        use_gzip = self._vary and range_header is None and self._accepts_gzip()
+        self._accept_ranges = not use_gzip
+        if use_gzip:
+            self._etag = self._etag[:-1] + '-gz"'
+        if self._not_modified(st):
+            self._send_not_modified(st)
+            return None
+        if use_gzip:
+            return self._send_gzip(path, st)
+        if range_header is not None and self._range_applies(st):
+            ranges = _parse_byte_ranges(range_header, st.st_size)
+            if ranges is not None:
+                return self._send_ranges(path, st, ranges)
         return super().send_head()
 
     def list_directory(self, path):
@@ -184,7 +686,8 @@ class _QuietHandler(http.server.SimpleHTTPRequestHandler):
         return io.BytesIO(body)
 
 
-def _serve(course: Path, port: int, exclude_pii: bool = False) -> socketserver.TCPServer:
+def _serve(course: Path, port: int, exclude_pii: bool = False,
+           watcher: _ManifestWatcher | None = None) -> socketserver.TCPServer:
     handler_cls = _QuietHandler
 
     class _Handler(handler_cls):
@@ -192,9 +695,11 @@ def _serve(course: Path, port: int, exclude_pii: bool = False) -> socketserver.T
             super().__init__(*args, directory=str(course), **kwargs)
 
     _Handler.exclude_pii = exclude_pii
+    _Handler.watcher = watcher
 
     socketserver.TCPServer.allow_reuse_address = True
     httpd = socketserver.ThreadingTCPServer(("127.0.0.1", port), _Handler)
+    httpd.daemon_threads = True
     thread = threading.Thread(target=httpd.serve_forever, daemon=True)
     thread.start()
     return httpd
@@ -212,13 +717,20 @@ def main(argv=None) -> int:
         action="store_true",
         help="Drop students.csv and name_map.csv from the manifest",
     )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between manifest rescans while serving (0 disables, default 1)",
+    )
     args = parser.parse_args(argv if argv is not None else sys.argv[1:])
 
     course = resolve_course(args.course)
     print(f"Course folder: {course}")
 
-    manifest_path = _write_manifest(course, exclude_pii=args.exclude_pii)
-    print(f"Wrote {manifest_path.name}")
+    watcher = _ManifestWatcher(course, exclude_pii=args.exclude_pii, interval=args.watch_interval)
+    watcher.refresh()
+    print("Wrote manifest.json")
 
     plans_zip = _build_plans_zip(course)
     if plans_zip is not None:
@@ -228,12 +740,14 @@ def main(argv=None) -> int:
     print(f"Tools: {copied} copied/updated, {skipped} already up-to-date in {course / 'tools'}")
 
     try:
-        httpd = _serve(course, args.port, exclude_pii=args.exclude_pii)
+        httpd = _serve(course, args.port, exclude_pii=args.exclude_pii, watcher=watcher)
     except OSError as e:
         print(f"Could not start server on port {args.port}: {e}")
         print("Try a different port with --port=<n>")
         return 1
 
+    watcher.start()
+
     url = f"http://127.0.0.1:{args.port}/tools/overview.html"
     print(f"\nServing at {url}")
     print("Press Ctrl+C to stop.\n")
@@ -247,6 +761,7 @@ def main(argv=None) -> int:
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nStopping server…")
+        watcher.stop()
         httpd.shutdown()
     return 0
 
@@ -1,14 +1,81 @@
+import hashlib
 import json
 import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import repeat
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple, Union
 
 _DIR = Path(__file__).parent
 _PROFILE_IDS = ("javascript", "css", "html", "plaintext", "python")
 _profiles: dict = {}
 _ext_to_id: dict = {}
-_compiled_re: dict = {}
-_compiled_open_tag_re: dict = {}
+_compiled: dict = {}
+_version: Optional[str] = None
+
+CODE_TOKEN_RE = re.compile(r"[a-zA-Z0-9]+|[^\s]")
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    id: str
+    extensions: Tuple[str, ...]
+    token_re: Pattern
+    comment_re: Optional[Pattern]
+    embedded_tags: Tuple[Tuple[str, str], ...]
+    embedded_open_re: Optional[Pattern]
+    embedded_close_res: Tuple[Tuple[str, Pattern], ...]
+    increase_after_re: Optional[Pattern]
+    decrease_on_line_re: Optional[Pattern]
+    decrease_after_re: Optional[Pattern]
+    open_tag_re: Optional[Pattern]
+    void_tags_re: Optional[Pattern]
+
+    def close_re_for(self, tag: str) -> Optional[Pattern]:
+        for t, pat in self.embedded_close_res:
+            if t == tag:
+                return pat
+        return None
+
+
+def _opt_re(pat: Optional[str], flags: int = 0) -> Optional[Pattern]:
+    return re.compile(pat, flags) if pat else None
+
+
+def _compile_profile(data: dict) -> CompiledProfile:
+    indent = data.get("indent") or {}
+    embedded = tuple(
+        (e["tag"], e.get("language", "")) for e in (data.get("embeddedTags") or [])
+    )
+    tags = [tag for tag, _ in embedded]
+    void_tags = data.get("voidTags") or []
+    return CompiledProfile(
+        id=data["id"],
+        extensions=tuple(e.lower() for e in data.get("extensions", [])),
+        token_re=CODE_TOKEN_RE,
+        comment_re=_opt_re((data.get("comments") or {}).get("detectRe")),
+        embedded_tags=embedded,
+        embedded_open_re=(
+            re.compile(rf'<\s*({"|".join(tags)})\b[^>]*>', re.IGNORECASE)
+            if tags else None
+        ),
+        embedded_close_res=tuple(
+            (tag, re.compile(
+                rf'</\s*{tag}\s*>|<\s*\\\s*/?\s*{tag}\s*>|/\s*{tag}\s*>',
+                re.IGNORECASE,
+            ))
+            for tag in tags
+        ),
+        increase_after_re=_opt_re(indent.get("increaseAfter")),
+        decrease_on_line_re=_opt_re(indent.get("decreaseOnLine")),
+        decrease_after_re=_opt_re(indent.get("decreaseAfter")),
+        open_tag_re=_opt_re(data.get("openTagRe")),
+        void_tags_re=(
+            re.compile(rf'<({"|".join(void_tags)})(?:\s[^>]*)?>$', re.IGNORECASE)
+            if void_tags else None
+        ),
+    )
 
 
 def _load() -> None:
@@ -18,6 +85,7 @@ def _load() -> None:
         with open(_DIR / f"{pid}.json", encoding="utf-8") as f:
             data = json.load(f)
         _profiles[pid] = data
+        _compiled[pid] = _compile_profile(data)
         for ext in data.get("extensions", []):
             _ext_to_id[ext.lower()] = pid
 
@@ -34,6 +102,15 @@ def get_profile(ext_or_id: str) -> Optional[dict]:
     return None
 
 
+def profiles_version() -> str:
+    global _version
+    if _version is None:
+        _load()
+        blob = json.dumps([_profiles[pid] for pid in _PROFILE_IDS], sort_keys=True)
+        _version = hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+    return _version
+
+
 def all_extensions() -> list:
     _load()
     return sorted(_ext_to_id.keys())
@@ -63,30 +140,27 @@ def lesson_file_extension(lesson_file: Optional[str]) -> Optional[str]:
     return exts[0] if exts else None
 
 
-def _detect_re(profile: dict):
-    pid = profile["id"]
-    if pid not in _compiled_re:
-        pat = (profile.get("comments") or {}).get("detectRe")
-        _compiled_re[pid] = re.compile(pat) if pat else None
-    return _compiled_re[pid]
-
-
-def _embedded_open_re(profile: dict):
-    pid = profile["id"]
-    if pid not in _compiled_open_tag_re:
-        tags = [e["tag"] for e in (profile.get("embeddedTags") or [])]
-        if tags:
-            _compiled_open_tag_re[pid] = re.compile(
-                rf'<\s*({"|".join(tags)})\b[^>]*>', re.IGNORECASE
-            )
-        else:
-            _compiled_open_tag_re[pid] = None
-    return _compiled_open_tag_re[pid]
-
-
-def _embedded_tag_ranges(text: str, profile: dict) -> dict:
-    open_re = _embedded_open_re(profile)
-    by_tag: dict = {e["tag"]: [] for e in (profile.get("embeddedTags") or [])}
+def get_compiled_profile(
+    profile: Union[str, dict, CompiledProfile, None],
+) -> Optional[CompiledProfile]:
+    if profile is None or isinstance(profile, CompiledProfile):
+        return profile
+    _load()
+    if isinstance(profile, dict):
+        pid = profile.get("id")
+        if _profiles.get(pid) is profile:
+            return _compiled[pid]
+        return _compile_profile(profile)
+    data = get_profile(profile)
+    return _compiled[data["id"]] if data is not None else None
+
+
+def _embedded_tag_ranges(text: str, profile) -> dict:
+    cp = get_compiled_profile(profile)
+    if cp is None:
+        return {}
+    by_tag: dict = {tag: [] for tag, _ in cp.embedded_tags}
+    open_re = cp.embedded_open_re
     if open_re is None:
         return by_tag
     pos = 0
@@ -96,131 +170,168 @@ def _embedded_tag_ranges(text: str, profile: dict) -> dict:
             break
         tag = om.group(1).lower()
         inner_start = om.end()
-        close_re = re.compile(
-            rf'</\s*{tag}\s*>|<\s*\\\s*/?\s*{tag}\s*>|/\s*{tag}\s*>',
-            re.IGNORECASE,
-        )
-        cm = close_re.search(text, inner_start)
+        close_re = cp.close_re_for(tag)
+        cm = close_re.search(text, inner_start) if close_re is not None else None
         inner_end = cm.start() if cm else len(text)
         by_tag.setdefault(tag, []).append((inner_start, inner_end))
         pos = cm.end() if cm else len(text)
     return by_tag
 
 
-def _in_ranges(pos: int, ranges) -> bool:
-    for lo, hi in ranges:
-        if lo <= pos < hi:
-            return True
-        if pos < lo:
-            return False
-    return False
-
-
-_compiled_indent_re: dict = {}
-_compiled_void_re: dict = {}
-
+class RangeIndex:
+    """Sorted, non-overlapping half-open ranges, optionally labelled.
 
-def _indent_re(profile: dict, key: str):
-    cache_key = (profile["id"], key)
-    if cache_key not in _compiled_indent_re:
-        pat = ((profile.get("indent") or {}).get(key) or "")
-        _compiled_indent_re[cache_key] = re.compile(pat) if pat else None
-    return _compiled_indent_re[cache_key]
+    `find` bisects (O(log n)); `sweep()` returns a cursor that answers
+    non-decreasing positions in amortised O(1).
+    """
 
+    __slots__ = ("starts", "ends", "labels")
 
-def _void_tags_re(profile: dict):
-    pid = profile["id"]
-    if pid not in _compiled_void_re:
-        tags = profile.get("voidTags") or []
-        if tags:
-            _compiled_void_re[pid] = re.compile(
-                rf'<({"|".join(tags)})(?:\s[^>]*)?>$', re.IGNORECASE
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = (), labels=None):
+        rows = sorted(
+            (lo, hi, lab) for (lo, hi), lab in zip(
+                ranges, labels if labels is not None else repeat(None)
             )
-        else:
-            _compiled_void_re[pid] = None
-    return _compiled_void_re[pid]
-
-
-def _open_tag_re(profile: dict):
-    pat = profile.get("openTagRe")
-    return re.compile(pat) if pat else None
-
-
-def should_increase_after(profile: Optional[dict], line: str) -> bool:
-    if profile is None:
+        )
+        self.starts: List[int] = [r[0] for r in rows]
+        self.ends: List[int] = [r[1] for r in rows]
+        self.labels: list = [r[2] for r in rows]
+
+    @classmethod
+    def from_starts_ends(cls, starts: List[int], ends: List[int]) -> "RangeIndex":
+        return cls(zip(starts, ends))
+
+    @classmethod
+    def from_labelled(cls, ranges_by_label: Dict[object, list]) -> "RangeIndex":
+        ranges: list = []
+        labels: list = []
+        for label, lst in (ranges_by_label or {}).items():
+            for lo, hi in lst:
+                ranges.append((lo, hi))
+                labels.append(label)
+        return cls(ranges, labels)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def find(self, pos: int) -> int:
+        i = bisect_right(self.starts, pos) - 1
+        if i >= 0 and pos < self.ends[i]:
+            return i
+        return -1
+
+    def __contains__(self, pos: int) -> bool:
+        return self.find(pos) >= 0
+
+    def label_at(self, pos: int, default=None):
+        i = self.find(pos)
+        return self.labels[i] if i >= 0 else default
+
+    def sweep(self) -> "RangeSweep":
+        return RangeSweep(self)
+
+
+class RangeSweep:
+    __slots__ = ("_index", "_i", "_last")
+
+    def __init__(self, index: RangeIndex):
+        self._index = index
+        self._i = 0
+        self._last = -1
+
+    def find(self, pos: int) -> int:
+        starts, ends = self._index.starts, self._index.ends
+        if pos < self._last:
+            self._i = bisect_right(ends, pos)
+        self._last = pos
+        i, n = self._i, len(ends)
+        while i < n and ends[i] <= pos:
+            i += 1
+        self._i = i
+        if i < n and starts[i] <= pos:
+            return i
+        return -1
+
+    def contains(self, pos: int) -> bool:
+        return self.find(pos) >= 0
+
+    def label_at(self, pos: int, default=None):
+        i = self.find(pos)
+        return self._index.labels[i] if i >= 0 else default
+
+
+def should_increase_after(profile, line: str) -> bool:
+    cp = get_compiled_profile(profile)
+    if cp is None:
         return False
-    pat = _indent_re(profile, "increaseAfter")
-    if pat and pat.search(line):
+    if cp.increase_after_re and cp.increase_after_re.search(line):
         return True
-    open_tag = _open_tag_re(profile)
-    if open_tag:
+    if cp.open_tag_re:
         stripped = line.rstrip()
-        void_re = _void_tags_re(profile)
         if (
-            open_tag.search(stripped)
+            cp.open_tag_re.search(stripped)
             and not stripped.endswith("/>")
-            and (void_re is None or not void_re.search(stripped))
+            and (cp.void_tags_re is None or not cp.void_tags_re.search(stripped))
         ):
             return True
     return False
 
 
-def should_decrease_on_line(profile: Optional[dict], line: str) -> bool:
-    if profile is None:
+def should_decrease_on_line(profile, line: str) -> bool:
+    cp = get_compiled_profile(profile)
+    if cp is None:
         return False
-    pat = _indent_re(profile, "decreaseOnLine")
-    return bool(pat and pat.search(line))
+    return bool(cp.decrease_on_line_re and cp.decrease_on_line_re.search(line))
 
 
-def should_decrease_after(profile: Optional[dict], line: str) -> bool:
-    if profile is None:
+def should_decrease_after(profile, line: str) -> bool:
+    cp = get_compiled_profile(profile)
+    if cp is None:
         return False
-    pat = _indent_re(profile, "decreaseAfter")
-    return bool(pat and pat.search(line))
+    return bool(cp.decrease_after_re and cp.decrease_after_re.search(line))
 
 
 _WS_ONLY_RE = re.compile(r"^[ \t]*$")
 _WS_LT_RE = re.compile(r"^[ \t]*<$")
 
 
-def should_auto_dedent_on_char(
-    profile: Optional[dict], ch: str, before: str
-) -> bool:
+def should_auto_dedent_on_char(profile, ch: str, before: str) -> bool:
     if ch in "})]":
         return bool(_WS_ONLY_RE.match(before))
-    if profile is not None and profile.get("openTagRe") and ch == "/":
+    cp = get_compiled_profile(profile)
+    if cp is not None and cp.open_tag_re is not None and ch == "/":
         return bool(_WS_LT_RE.match(before))
     return False
 
 
-def comment_ranges(profile: Optional[dict], text: str) -> Tuple[List[int], List[int]]:
-    if profile is None:
-        return [], []
-    pat = _detect_re(profile)
-    if pat is None:
+def comment_ranges(profile, text: str, by_tag: Optional[dict] = None) -> Tuple[List[int], List[int]]:
+    cp = get_compiled_profile(profile)
+    if cp is None or cp.comment_re is None:
         return [], []
+    pat = cp.comment_re
 
     starts: List[int] = []
     ends: List[int] = []
-    embedded = profile.get("embeddedTags") or []
-    if not embedded:
+    if not cp.embedded_tags:
         for m in pat.finditer(text):
             starts.append(m.start())
             ends.append(m.end())
         return starts, ends
 
-    by_tag = _embedded_tag_ranges(text, profile)
-    script_ranges = by_tag.get("script", [])
-    style_ranges = by_tag.get("style", [])
+    if by_tag is None:
+        by_tag = _embedded_tag_ranges(text, cp)
+    in_script = RangeIndex(by_tag.get("script", [])).sweep()
+    in_style = RangeIndex(by_tag.get("style", [])).sweep()
     for m in pat.finditer(text):
         kind = m.group()[:2]
         pos = m.start()
-        if kind == "//" and not _in_ranges(pos, script_ranges):
+        if kind == "//" and not in_script.contains(pos):
             continue
-        if kind == "/*" and not (
-            _in_ranges(pos, style_ranges) or _in_ranges(pos, script_ranges)
-        ):
+        if kind == "/*" and not (in_style.contains(pos) or in_script.contains(pos)):
             continue
         starts.append(pos)
         ends.append(m.end())
     return starts, ends
+
+
+_load()
@@ -16,6 +16,11 @@ from utils.folder_utils import select_project_folder
 
 _parser = argparse.ArgumentParser(description='Student analytics grading pipeline')
 _parser.add_argument('project', nargs='?', help='Project folder path or name under lessons/')
+_parser.add_argument(
+    '--token-cache', action='store_true',
+    help='Keep tokenised files in <project>/.token_cache so repeated runs '
+         'skip re-tokenising unchanged sources',
+)
 add_grading_flags(_parser)
 _args = _parser.parse_args()
 
@@ -62,6 +67,9 @@ def main():
             "Select project folder (must contain students/ and correct/)"
         )
 
+    if _args.token_cache:
+        os.environ['LEO_TOKEN_CACHE_DIR'] = str(project_dir / '.token_cache')
+
     print(f"\nGrading pipeline")
     print(f"  Project : {project_dir.name}")
     print(f"  Path    : {project_dir}")
@@ -308,5 +308,116 @@ class TestLessonFileLanguageDetection(unittest.TestCase):
         self.assertEqual(text, "<div>\n\thello")
 
 
+class TestCompiledProfile(unittest.TestCase):
+    """Precompiled, immutable views of the JSON profiles."""
+
+    def test_compiled_profile_is_shared_and_frozen(self):
+        from dataclasses import FrozenInstanceError
+        from languages import get_compiled_profile
+        cp = get_compiled_profile(".html")
+        self.assertIs(cp, get_compiled_profile("html"))
+        self.assertIs(cp, get_compiled_profile(get_profile(".htm")))
+        self.assertIs(cp, get_compiled_profile(cp))
+        with self.assertRaises(FrozenInstanceError):
+            cp.id = "other"
+
+    def test_helpers_accept_compiled_profile(self):
+        from languages import comment_ranges, get_compiled_profile
+        text = "<style>/* a */</style><script>// b\n</script><!-- c -->"
+        cp = get_compiled_profile(".html")
+        self.assertEqual(comment_ranges(cp, text), comment_ranges(get_profile(".html"), text))
+        self.assertEqual(_comment_ranges(text, cp), _comment_ranges(text, ".html"))
+        self.assertTrue(should_increase_after(cp, "<div>"))
+        self.assertFalse(should_increase_after(cp, "<br>"))
+        self.assertTrue(should_auto_dedent_on_char(cp, "/", "\t<"))
+
+    def test_embedded_ranges_over_many_blocks(self):
+        from languages import _embedded_tag_ranges, get_compiled_profile
+        block = "<script>x()</script><style>a{}</style>"
+        text = block * 50
+        by_tag = _embedded_tag_ranges(text, get_compiled_profile(".html"))
+        self.assertEqual(len(by_tag["script"]), 50)
+        self.assertEqual(len(by_tag["style"]), 50)
+        lo, hi = by_tag["script"][0]
+        self.assertEqual(text[lo:hi], "x()")
+
+
+class TestRangeIndex(unittest.TestCase):
+    """Shared interval lookup for comment and embedded-language ranges."""
+
+    def _linear_label(self, ranges_by_label, pos):
+        for label, ranges in ranges_by_label.items():
+            for lo, hi in ranges:
+                if lo <= pos < hi:
+                    return label
+        return None
+
+    def test_find_and_label_at_match_linear_scan(self):
+        import random
+        from languages import RangeIndex
+        rng = random.Random(7)
+        for _ in range(50):
+            cuts = sorted(rng.sample(range(200), 20))
+            pairs = list(zip(cuts[::2], cuts[1::2]))
+            by_label = {".js": pairs[::2], ".css": pairs[1::2]}
+            index = RangeIndex.from_labelled(by_label)
+            sweep = index.sweep()
+            for pos in range(-1, 205):
+                expected = self._linear_label(by_label, pos)
+                self.assertEqual(index.label_at(pos), expected, pos)
+                self.assertEqual(sweep.label_at(pos), expected, pos)
+                self.assertEqual(pos in index, expected is not None, pos)
+
+    def test_sweep_recovers_after_backwards_query(self):
+        from languages import RangeIndex
+        sweep = RangeIndex.from_starts_ends([2, 10], [5, 12]).sweep()
+        self.assertTrue(sweep.contains(11))
+        self.assertTrue(sweep.contains(3))
+        self.assertFalse(sweep.contains(6))
+        self.assertFalse(sweep.contains(12))
+
+    def test_empty_index_is_falsy(self):
+        from languages import RangeIndex
+        self.assertFalse(RangeIndex())
+        self.assertEqual(RangeIndex().label_at(0, ".html"), ".html")
+
+
+class TestScanFile(unittest.TestCase):
+    """One-pass token table and the helpers projected from it."""
+
+    _HTML = "<p>hi</p><!-- c -->\n<script>let x = 1; // n\n</script><style>a{b:c}</style>"
+
+    def test_columns_and_projections_agree(self):
+        from utils.similarity_measures import (
+            TOKEN_SYMBOL, TOKEN_WORD, blank_comments, iter_code_tokens,
+            scan_file, split_code_tokens,
+        )
+        from languages import get_compiled_profile
+        scan = scan_file(self._HTML, ".html")
+        toks = list(iter_code_tokens(self._HTML, ".html"))
+        self.assertEqual(len(scan), len(toks))
+        self.assertEqual(list(scan.iter_code_tokens()), toks)
+        self.assertEqual(scan.counters(), split_code_tokens(self._HTML, ".html"))
+        self.assertEqual(
+            split_code_tokens(self._HTML, get_compiled_profile(".html")),
+            scan.counters(),
+        )
+        self.assertEqual(scan.blanked, blank_comments(self._HTML, ".html"))
+        self.assertEqual(scan.kinds[0], TOKEN_SYMBOL)
+        self.assertEqual(scan.kinds[1], TOKEN_WORD)
+
+    def test_effective_language_and_blanking(self):
+        from utils.similarity_measures import scan_file
+        scan = scan_file(self._HTML, ".html")
+        langs = {scan.token(i): scan.lang_of(i) for i in range(len(scan))}
+        self.assertEqual(langs["hi"], ".html")
+        self.assertEqual(langs["let"], ".js")
+        self.assertEqual(langs["b"], ".css")
+        self.assertNotIn("c", scan.tokens_by_lang()[".html"])
+        self.assertEqual(len(scan.blanked), len(self._HTML))
+        self.assertNotIn("//", scan.blanked)
+        self.assertEqual(scan.blanked.count("\n"), self._HTML.count("\n"))
+
+
 if __name__ == "__main__":
     unittest.main()
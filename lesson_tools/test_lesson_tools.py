@@ -22,8 +22,10 @@ from utils.token_log import (
     _build_git_diff_marks,
     _build_lcs_token_diff_marks,
     _build_leo_diff_marks,
+    _build_occ_from_diff_marks,
     _CONTEXT_MATCH_THRESHOLD,
     _parse_teacher_tokens,
+    _write_teacher_tokens_file,
     _read_text_normalized,
     _remap_marks_to_utf16,
     _split_tokens_by_comment,
@@ -62,6 +64,109 @@ class TestStarPassHelpers(unittest.TestCase):
         self.assertGreater(score, 0.5)
         self.assertLess(score, 0.5 + _SWAP_TOKEN_SIM_WEIGHT)
 
+    def test_star_pass_index_swap_and_insert_at(self):
+        from utils.token_log_starpass import (
+            StarPassIndex,
+            _apply_insert_at_to_unpaired_missings,
+            _apply_swap_pairing_to_marks,
+        )
+        teacher = 'let a = 1 ; let total = a + 2 ; log ( total ) ; done ( ) ;'
+        student = 'let a = 1 ; let totl = a + 2 ; log ( totl ) ; ( ) ;'
+        with tempfile.TemporaryDirectory() as d:
+            (Path(d) / 't').mkdir()
+            (Path(d) / 's').mkdir()
+            tf = {'a.js': Path(d) / 't' / 'a.js'}
+            sf = {'a.js': Path(d) / 's' / 'a.js'}
+            tf['a.js'].write_text(teacher, encoding='utf-8')
+            sf['a.js'].write_text(student, encoding='utf-8')
+
+            def _marks(text, tok, label):
+                pos = text.index(f' {tok} ') + 1
+                return {'token': tok, 'label': label, 'start': pos, 'end': pos + len(tok)}
+
+            t_marks = {'a.js': [_marks(teacher, 'total', 'missing'),
+                                _marks(teacher, 'done', 'missing')]}
+            s_marks = {'a.js': [_marks(student, 'totl', 'extra')]}
+            index = StarPassIndex(tf, sf)
+            _apply_swap_pairing_to_marks(t_marks, s_marks, tf, sf, index=index)
+            _apply_insert_at_to_unpaired_missings(t_marks, s_marks, tf, sf, index=index)
+        total, done = t_marks['a.js']
+        self.assertEqual(total['paired_with']['token'], 'totl')
+        self.assertNotIn('insert_at', total)
+        self.assertEqual(done['insert_at'], {'file': 'a.js', 'pos': student.index(') ;') + 3})
+
+    def test_teacher_cache_shared_until_events_grow(self):
+        from utils.token_log_starpass import teacher_cache_for
+        events = [{'char': ch, 'timestamp': 1700000000000 + i * 100}
+                  for i, ch in enumerate('let a = 1;')]
+        cache = teacher_cache_for(events)
+        self.assertIs(teacher_cache_for(events), cache)
+        ts_map = cache.file_ordered_ts_map()
+        self.assertIs(cache.file_ordered_ts_map(), ts_map)
+        self.assertEqual(ts_map['a'], [events[4]['timestamp']])
+        events.append({'char': 'b', 'timestamp': 1700000001000})
+        self.assertIsNot(teacher_cache_for(events), cache)
+
+    def test_overlay_diff_marks_leaves_base_intact(self):
+        from utils.token_log import _overlay_diff_marks
+        base = {
+            'teacher_files': {'a.js': [{
+                'token': 'x', 'label': 'missing', 'start': 4, 'end': 5, '_tok_idx': 0,
+                '_native_insert_at': {'file': 'a.js', 'pos': 2},
+            }]},
+            'student_files': {'a.js': [{
+                'token': 'y', 'label': 'extra', 'start': 1, 'end': 2,
+                'paired_with': {'file': 'a.js', 'start': 4, 'end': 5},
+            }]},
+            'leo_assignments': {'k': 10},
+        }
+        snapshot = json.dumps(base)
+        overlay = _overlay_diff_marks(base)
+        _strip_internal_fields(overlay)
+        overlay['student_files']['a.js'][0]['paired_with']['start'] = 7
+        self.assertEqual(json.dumps(base), snapshot)
+        self.assertEqual(overlay['teacher_files']['a.js'][0]['insert_at'], {'file': 'a.js', 'pos': 2})
+        self.assertIs(overlay['leo_assignments'], base['leo_assignments'])
+
+    def test_diff_marks_io_round_trip_and_field_filter(self):
+        from utils.diff_marks_io import load_diff_marks, write_diff_marks
+        marks = {
+            'token_matching': 'leo',
+            'teacher_files': {'a.js': [{'token': 'ä\n"', 'label': 'missing', 'start': 0, 'end': 3}],
+                              'b.css': []},
+            'student_files': {},
+            'leo_assignments': {'k': [1, 2.5, None]},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'diff_marks_leo.json'
+            write_diff_marks(path, marks)
+            self.assertEqual(json.loads(path.read_text(encoding='utf-8')), marks)
+            self.assertEqual(load_diff_marks(path), marks)
+            self.assertEqual(load_diff_marks(path, fields=('teacher_files', 'absent')),
+                             {'teacher_files': marks['teacher_files']})
+            path.write_text(json.dumps(marks, indent=2), encoding='utf-8')
+            self.assertEqual(load_diff_marks(path, fields=('student_files',)), {'student_files': {}})
+
+    def test_occurrences_ordered_across_midnight(self):
+        from utils.similarity_measures import local_ts_ms, ts_to_local
+        ts = 1700000000123
+        self.assertEqual(local_ts_ms(ts_to_local(ts)) % 1000, 123)
+        entries = [
+            ('a', '23:59:58.000', False, False, ''),
+            ('b', '23:59:59.500', False, False, ''),
+            ('c', '00:00:01.250', False, False, ''),
+        ]
+        all_occ, *_ = _build_occ_from_diff_marks({}, entries)
+        self.assertEqual([tok for _, tok, _ in all_occ], ['a', 'b', 'c'])
+
+    def test_token_edit_similarity_threshold(self):
+        from utils.similarity_measures import token_edit_similarity
+        self.assertAlmostEqual(token_edit_similarity('border', 'boder'), 1 - 1 / 6)
+        self.assertAlmostEqual(token_edit_similarity('kitten', 'sitting'), 1 - 3 / 7)
+        self.assertAlmostEqual(token_edit_similarity('kitten', 'sitting', 0.5), 1 - 3 / 7)
+        self.assertEqual(token_edit_similarity('kitten', 'sitting', 0.6), 0.0)
+        self.assertEqual(token_edit_similarity('a', 'abcdef', 0.5), 0.0)
+
     def test_split_assignments_real_vs_ghost(self):
         pairs = [(0, 0), (1, 2), (2, 3)]
         sim = [
@@ -78,6 +183,55 @@ class TestStarPassHelpers(unittest.TestCase):
         self.assertEqual(real, [])
         self.assertEqual(ghost, [])
 
+    def test_sparse_locate_matches_dense_on_distinct_contexts(self):
+        import os
+        from unittest import mock
+        from utils import token_log_leo as leo
+        t_seq = [tok for i in range(300) for tok in ('let', f'v{i}', '=', str(i % 7), ';')]
+        s_seq = [tok for i in range(300) if i % 11 for tok in ('let', f'v{i}', '=', str(i % 7), ';')]
+        s_pos = [i for i, tok in enumerate(s_seq) if tok == ';']
+        t_pos = [i for i, tok in enumerate(t_seq) if tok == ';']
+        with mock.patch.dict(os.environ, {leo.SPARSE_MATCHING_ENV: '1'}):
+            sparse_pairs, sparse_sim = leo._locate_token(s_pos, t_pos, s_seq, t_seq, 10)
+        with mock.patch.dict(os.environ):
+            os.environ.pop(leo.SPARSE_MATCHING_ENV, None)
+            dense_pairs, dense_sim = leo._locate_token(s_pos, t_pos, s_seq, t_seq, 10)
+        self.assertIsInstance(sparse_sim[0], leo._SparseRow)
+        self.assertIsInstance(dense_sim[0], list)
+        self.assertEqual(sparse_pairs, dense_pairs)
+        for i, j in dense_pairs:
+            self.assertAlmostEqual(sparse_sim[i][j], dense_sim[i][j])
+
+    def test_sparse_locate_gap_on_ambiguous_contexts(self):
+        import os
+        from unittest import mock
+        from utils import token_log_leo as leo
+        rng = random.Random(3)
+        t_seq = [tok for _ in range(320) for tok in ('x', '=', rng.choice('ab'), ';')]
+        s_seq = []
+        for tok in t_seq:
+            r = rng.random()
+            if r < 0.05:
+                continue
+            s_seq.append(tok)
+            if r > 0.95:
+                s_seq.append(rng.choice('ab'))
+        s_pos = [i for i, tok in enumerate(s_seq) if tok == ';']
+        t_pos = [i for i, tok in enumerate(t_seq) if tok == ';']
+        with mock.patch.dict(os.environ, {leo.SPARSE_MATCHING_ENV: '1'}):
+            sparse_pairs, sparse_sim = leo._locate_token(s_pos, t_pos, s_seq, t_seq, 10)
+        with mock.patch.dict(os.environ):
+            os.environ.pop(leo.SPARSE_MATCHING_ENV, None)
+            dense_pairs, dense_sim = leo._locate_token(s_pos, t_pos, s_seq, t_seq, 10)
+        self.assertIsInstance(sparse_sim[0], leo._SparseRow)
+        self.assertIsInstance(dense_sim[0], list)
+        self.assertEqual(dense_pairs, leo._hungarian_max(dense_sim))
+        self.assertEqual(len(sparse_pairs), len(dense_pairs))
+        sparse_total = sum(dense_sim[i][j] for i, j in sparse_pairs)
+        dense_total = sum(dense_sim[i][j] for i, j in dense_pairs)
+        self.assertLessEqual(sparse_total, dense_total + 1e-9)
+        self.assertGreaterEqual(sparse_total, dense_total * 0.995)
+
 
 def _parse_tokens_file(path: Path):
     return _parse_teacher_tokens(path, return_headers=True)
@@ -480,6 +634,507 @@ class TestEffectiveReferenceDir(unittest.TestCase):
             self.assertEqual(self._checker(root)._effective_reference_dir().name, 'correct')
 
 
+class TestTokenCache(unittest.TestCase):
+    _JS = 'let a = 1; // note\nconst b = "\U0001F600";\n'
+
+    def setUp(self):
+        from utils import token_cache
+        self.tc = token_cache
+        token_cache.clear_cache()
+        self.addCleanup(token_cache.set_disk_cache_dir, None)
+        self.addCleanup(token_cache.clear_cache)
+
+    def test_same_content_shares_entry(self):
+        a = self.tc.tokenize(self._JS, '.js')
+        self.assertIs(self.tc.tokenize(''.join(list(self._JS)), '.JS'), a)
+        self.assertIsNot(self.tc.tokenize(self._JS, '.css'), a)
+        self.assertEqual(a.split(), _split_tokens_by_comment(self._JS, '.js'))
+        self.assertEqual(a.utf16_map()[-1], len(self._JS) + 1)
+
+    def test_utf16_map_breakpoints(self):
+        self.assertIsNone(self.tc.utf16_map('plain ascii'))
+        self.assertIsNone(self.tc.utf16_map('bmp only \u00e9\u4e2d'))
+        text = 'a\U0001F600b\U0001F600'
+        u16map = self.tc.utf16_map(text)
+        self.assertEqual(u16map.astral, [1, 3])
+        self.assertEqual([u16map[i] for i in range(len(u16map))], [0, 1, 3, 4, 6])
+        self.assertIs(self.tc.utf16_map(''.join(list(text))), u16map)
+
+    def test_disk_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.tc.set_disk_cache_dir(d)
+            first = self.tc.tokenize(self._JS, '.js')
+            self.assertEqual(len(list(Path(d).rglob('*.pkl'))), 1)
+            self.tc.clear_cache()
+            again = self.tc.tokenize(self._JS, '.js')
+            self.assertIsNot(again, first)
+            self.assertEqual(again.key, first.key)
+            self.assertEqual(list(again.scan.starts), list(first.scan.starts))
+            self.assertEqual(again.positions_by_token(), first.positions_by_token())
+
+
+class TestTeacherTokenTable(unittest.TestCase):
+    def _events(self):
+        ts = 1700000000000
+        events = []
+        for ch in '<style>a{}</style> let⌫⌫⌫for x':
+            ts += 250
+            events.append({'char': ch, 'timestamp': ts})
+        return events
+
+    def test_side_table_matches_text_file(self):
+        from utils.token_log import _load_teacher_entries
+        from utils.token_table import TeacherTokenTable, table_path_for
+        with tempfile.TemporaryDirectory() as d:
+            tokens_path = Path(d) / 'tokens.txt'
+            counts = _write_teacher_tokens_file(self._events(), tokens_path, lesson_file='l.html')
+            table = TeacherTokenTable.load(table_path_for(tokens_path), tokens_path)
+            self.assertIsNotNone(table)
+            fresh = TeacherTokenTable.from_events(self._events(), lesson_file='l.html')
+            self.assertEqual(table.files, fresh.files)
+            self.assertEqual(table.langs, fresh.langs)
+            self.assertEqual(list(table.offsets), list(fresh.offsets))
+            self.assertEqual(table.counts(), counts)
+            self.assertEqual(table.entries(), _parse_teacher_tokens(tokens_path))
+            self.assertEqual(_load_teacher_entries(tokens_path), table.entries())
+            by_tok = dict(zip(table.tokens, table.langs))
+            self.assertEqual(by_tok['a'], '.css')
+            self.assertEqual(by_tok['x'], '.html')
+            self.assertIn(-1, list(table.offsets))
+
+    def test_edited_text_file_invalidates_table(self):
+        from utils.token_log import _load_teacher_entries
+        from utils.token_table import TeacherTokenTable, table_path_for
+        with tempfile.TemporaryDirectory() as d:
+            tokens_path = Path(d) / 'tokens.txt'
+            _write_teacher_tokens_file(self._events(), tokens_path)
+            tokens_path.write_text('# Occurrences: 1\nfoo\t10:00:00.000\n', encoding='utf-8')
+            self.assertIsNone(TeacherTokenTable.load(table_path_for(tokens_path), tokens_path))
+            self.assertEqual(_load_teacher_entries(tokens_path),
+                             [('foo', '10:00:00.000', False, False, '')])
+
+
+class TestManifestDirCache(unittest.TestCase):
+    def test_rebuild_rescans_only_changed_directories(self):
+        import os
+        from unittest import mock
+        import build_manifest as bm
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            lesson = course / 'lessons' / 'L1'
+            for sub in ('start', 'anon_ids/s1', 'anon_ids/s2', 'students/Bob'):
+                (lesson / sub).mkdir(parents=True)
+            (lesson / 'start' / 'a.png').write_text('x')
+            (lesson / 'anon_ids' / 's1' / 'a.png').write_text('x')
+            (lesson / 'anon_ids' / 's1' / 'b.png').write_text('x')
+            (lesson / 'L1.log').write_text('x')
+            with mock.patch.object(bm, '_RACY_NS', -10 ** 12):
+                first = bm._build_manifest(course, exclude_pii=False)
+                self.assertEqual(first['groups']['lessons']['L1'], {
+                    'students': ['s1', 's2'], 'files': ['L1.log', 'anon_ids/s1/b.png', 'start/a.png'],
+                })
+                cache = json.loads((course / bm.MANIFEST_CACHE_NAME).read_text())['dirs']
+                self.assertNotIn('lessons/L1/students', cache)
+                (lesson / 'anon_ids' / 's2' / 'c.js').write_text('x')
+                scanned = []
+                real_scandir = os.scandir
+                def _scandir(path):
+                    scanned.append(Path(path).name)
+                    return real_scandir(path)
+                with mock.patch.object(bm.os, 'scandir', _scandir):
+                    second = bm._build_manifest(course, exclude_pii=False)
+            self.assertEqual(scanned, ['s2'])
+            self.assertIn('anon_ids/s2/c.js', second['groups']['lessons']['L1']['files'])
+
+
+class TestResultsStore(unittest.TestCase):
+    @staticmethod
+    def _backdate(*paths):
+        import os
+        import time
+        old = time.time_ns() - 10 ** 10
+        for p in paths:
+            os.utime(p, ns=(old, old))
+
+    def test_overview_sources_served_from_store_until_changed(self):
+        import os
+        from unittest import mock
+        from openpyxl import Workbook
+        import build_overview as bo
+        from utils import results_store
+        from utils.lesson_stats import write_lesson_stats_csv
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            lesson = root / 'lessons' / 'L1'
+            lesson.mkdir(parents=True)
+            wb = Workbook()
+            ws = wb.active
+            ws.append(['ID', 'Student', 'Follow (E)', 'Obs'])
+            ws.append([101, 'Ann', 87.5, None])
+            ws.append([None, None, None, None])
+            ws.append(['102', 'Bob', None, 'late'])
+            xlsx = lesson / 'remarks.xlsx'
+            wb.save(xlsx)
+            stats = write_lesson_stats_csv(
+                [{'timestamp': 0, 'char': 'a'}, {'timestamp': 1000, 'char': 'b'}], lesson)
+            with results_store.ResultsStore.for_course(root) as store:
+                # Just written: within the racy window, so not trusted yet.
+                self.assertIsNotNone(store.stale('lessons/l1', stats.name, stats))
+            self._backdate(xlsx, stats)
+            with results_store.ResultsStore.for_course(root) as store:
+                self.assertIsNotNone(store.stale('lessons/l1', stats.name, stats))
+                self.assertEqual(bo._read_lesson_stats_csv(stats, store, 'lessons/l1'),
+                                 bo._read_lesson_stats_csv(stats))
+                self.assertIsNone(store.stale('lessons/l1', stats.name, stats))
+                header, rows = store._load('lessons/l1', stats.name, stats, results_store._stamp(stats))
+            self.assertEqual(dict(zip(header, rows[0])), bo._read_lesson_stats_csv(stats))
+
+            wanted = ('ID', 'Student', 'Follow (E)', 'Obs', 'Inc')
+            with results_store.ResultsStore.for_course(root) as store:
+                fresh = bo._read_grades_rows(xlsx, wanted, store, 'lessons/l1')
+            self.assertEqual(fresh, bo._read_grades_rows(xlsx, wanted))
+            with mock.patch.object(bo, 'read_xlsx_sheet', side_effect=AssertionError):
+                with results_store.ResultsStore.for_course(root) as store:
+                    self.assertEqual(bo._read_grades_rows(xlsx, wanted, store, 'lessons/l1'), fresh)
+            ws['D2'] = 'edited'
+            wb.save(xlsx)
+            os.utime(xlsx, ns=(1, 1))
+            with results_store.ResultsStore.for_course(root) as store:
+                _, rows = bo._read_grades_rows(xlsx, wanted, store, 'lessons/l1')
+            self.assertEqual(rows[0]['Obs'], 'edited')
+
+    def test_parallel_prefetch_matches_serial_overview(self):
+        from openpyxl import Workbook
+        import build_overview as bo
+        from utils import results_store
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            for group, name, cols in (('lessons', 'L1', ['ID', 'Student', 'Follow (E)', 'Inc']),
+                                      ('lessons', 'L2', ['ID', 'Student', 'Follow (E)', 'Interactions']),
+                                      ('assignments', 'L1', ['ID', 'Student', 'Grade', 'Status'])):
+                (root / group / name).mkdir(parents=True)
+                wb = Workbook()
+                wb.active.append(cols)
+                wb.active.append([1, 'Ann', 90, 'A, Q'])
+                wb.active.append([2, 'Bob', 40, 'Pass'])
+                wb.save(root / group / name / 'remarks.xlsx')
+                self._backdate(root / group / name / 'remarks.xlsx')
+            self.assertEqual(bo.main(['x', str(root), '--no-stats', '--jobs', '1',
+                                      '--output', 'serial.json']), 0)
+            (root / results_store.STORE_NAME).unlink()
+            self.assertEqual(bo.main(['x', str(root), '--no-stats', '--jobs', '2']), 0)
+            self.assertEqual((root / 'overview.json').read_text(encoding='utf-8'),
+                             (root / 'serial.json').read_text(encoding='utf-8'))
+            with results_store.ResultsStore.for_course(root) as store:
+                sources = bo._workbook_sources(root, root / 'lessons', root / 'assignments', {'l1', 'l2'})
+                self.assertEqual(len(sources), 3)
+                self.assertEqual(bo._prefetch_workbooks(store, sources, 2), 0)
+
+    def test_prefetch_counts_only_stored_workbooks(self):
+        import contextlib
+        import io
+        from openpyxl import Workbook
+        import build_overview as bo
+        from utils import results_store
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            good, bad = root / 'good.xlsx', root / 'bad.xlsx'
+            wb = Workbook()
+            wb.active.append(['ID', 'Grade'])
+            wb.save(good)
+            bad.write_bytes(b'not a workbook')
+            self._backdate(good, bad)
+            sources = [('lessons/a', 'remarks', good, None), ('lessons/b', 'remarks', bad, None)]
+            with results_store.ResultsStore.for_course(root) as store, \
+                    contextlib.redirect_stdout(io.StringIO()) as out:
+                self.assertEqual(bo._prefetch_workbooks(store, sources, 2), 1)
+                self.assertIsNone(store.stale('lessons/a', 'remarks', good))
+                self.assertIsNotNone(store.stale('lessons/b', 'remarks', bad))
+            self.assertIn(f'could not parse {bad}', out.getvalue())
+
+
+class TestInspectDatasetStartup(unittest.TestCase):
+    def test_plans_zip_is_updated_incrementally(self):
+        import os
+        import zipfile
+        from inspect_dataset import _build_plans_zip
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            for name in ('L1', 'L2'):
+                (course / 'lessons' / name).mkdir(parents=True)
+                (course / 'lessons' / name / f'{name}.log').write_text(f'plan {name}', encoding='utf-8')
+            out = _build_plans_zip(course)
+            first = os.stat(out).st_mtime_ns
+            os.utime(out, ns=(first - 10 ** 9, first - 10 ** 9))
+            stamp = os.stat(out).st_mtime_ns
+            log1 = course / 'lessons' / 'L1' / 'L1.log'
+            os.utime(log1)
+            self.assertEqual(_build_plans_zip(course), out)
+            with zipfile.ZipFile(out) as zf:
+                self.assertEqual(sorted(zf.namelist()), ['L1.log', 'L2.log'])
+            (course / 'lessons' / 'L3').mkdir()
+            (course / 'lessons' / 'L3' / 'L3.json').write_text('{}', encoding='utf-8')
+            _build_plans_zip(course)
+            self.assertNotEqual(os.stat(out).st_mtime_ns, stamp)
+            log1.write_text('plan L1 v2', encoding='utf-8')
+            _build_plans_zip(course)
+            with zipfile.ZipFile(out) as zf:
+                self.assertEqual(sorted(zf.namelist()), ['L1.log', 'L2.log', 'L3.json'])
+                self.assertEqual(zf.read('L1.log'), b'plan L1 v2')
+            os.utime(out, ns=(stamp, stamp))
+            _build_plans_zip(course)
+            self.assertEqual(os.stat(out).st_mtime_ns, stamp)
+
+    def test_tool_sync_skips_when_digest_matches(self):
+        from inspect_dataset import _list_tool_files, _sync_tools
+        if not _list_tool_files():
+            self.skipTest('no tool files in this checkout')
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            copied, skipped = _sync_tools(course)
+            self.assertGreater(copied, 0)
+            self.assertEqual(_sync_tools(course), (0, copied + skipped))
+
+    def test_tool_sync_restores_missing_or_damaged_copy(self):
+        from inspect_dataset import _list_tool_files, _sync_tools
+        files = _list_tool_files()
+        if not files:
+            self.skipTest('no tool files in this checkout')
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            copied, skipped = _sync_tools(course)
+            src, rel = files[0]
+            dst = course / 'tools' / rel
+            dst.unlink()
+            self.assertEqual(_sync_tools(course), (1, copied + skipped - 1))
+            self.assertEqual(dst.read_bytes(), src.read_bytes())
+            dst.write_bytes(b'damaged')
+            self.assertEqual(_sync_tools(course), (1, copied + skipped - 1))
+            self.assertEqual(dst.read_bytes(), src.read_bytes())
+            self.assertEqual(_sync_tools(course), (0, copied + skipped))
+
+
+class TestInspectDatasetServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from inspect_dataset import _serve
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.course = Path(cls._tmp.name)
+        (cls.course / 'lessons').mkdir()
+        (cls.course / 'lessons' / 'diff_marks_leo.json').write_text('{"a": 1}\n', encoding='utf-8')
+        (cls.course / 'lessons' / 'big.json').write_text('[' + '1,' * 2000 + '1]', encoding='utf-8')
+        (cls.course / 'students').mkdir()
+        (cls.course / 'students' / 'x.txt').write_text('secret', encoding='utf-8')
+        cls.httpd = _serve(cls.course, 0)
+        cls.port = cls.httpd.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls._tmp.cleanup()
+
+    def _get(self, path, headers=None):
+        import http.client
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        try:
+            conn.request('GET', path, headers=headers or {})
+            resp = conn.getresponse()
+            return resp.status, dict(resp.getheaders()), resp.read()
+        finally:
+            conn.close()
+
+    def test_etag_revalidation(self):
+        status, headers, body = self._get('/lessons/diff_marks_leo.json')
+        self.assertEqual((status, body), (200, b'{"a": 1}\n'))
+        self.assertEqual(headers['Cache-Control'], 'no-cache')
+        etag = headers['ETag']
+        status, headers, body = self._get('/lessons/diff_marks_leo.json',
+                                          {'If-None-Match': f'"x", W/{etag}'})
+        self.assertEqual((status, body, headers['ETag']), (304, b'', etag))
+        status, _, _ = self._get('/lessons/diff_marks_leo.json', {'If-None-Match': '"stale"'})
+        self.assertEqual(status, 200)
+        status, _, _ = self._get('/students/x.txt', {'If-None-Match': '*'})
+        self.assertEqual(status, 403)
+
+    def test_gzip_negotiation_and_sidecar(self):
+        import gzip
+        raw = (self.course / 'lessons' / 'big.json').read_bytes()
+        status, headers, body = self._get('/lessons/big.json', {'Accept-Encoding': 'br, gzip'})
+        self.assertEqual((status, headers['Content-Encoding'], headers['Vary']),
+                         (200, 'gzip', 'Accept-Encoding'))
+        self.assertEqual(gzip.decompress(body), raw)
+        self.assertLess(len(body), len(raw))
+        status, headers, body = self._get('/lessons/big.json', {'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, raw)
+        _, headers, _ = self._get('/lessons/diff_marks_leo.json', {'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', headers)
+        sidecar = self.course / 'lessons' / 'big.json.gz'
+        sidecar.write_bytes(gzip.compress(b'[0]'))
+        self.addCleanup(sidecar.unlink)
+        _, _, body = self._get('/lessons/big.json', {'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(body), b'[0]')
+
+    def test_manifest_watcher_long_poll(self):
+        from inspect_dataset import _ManifestWatcher, _serve
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            (course / 'lessons' / 'L1').mkdir(parents=True)
+            watcher = _ManifestWatcher(course, exclude_pii=False, interval=0.05)
+            watcher.refresh()
+            httpd = _serve(course, 0, watcher=watcher)
+            self.addCleanup(httpd.server_close)
+            self.addCleanup(httpd.shutdown)
+            watcher.start()
+            self.addCleanup(watcher.stop)
+            port, self.port = self.port, httpd.server_address[1]
+            try:
+                status, headers, body = self._get('/manifest.json')
+                self.assertEqual((status, headers['X-Manifest-Version']), (200, '1'))
+                self.assertEqual(json.loads(body)['groups']['lessons']['L1']['files'], [])
+                status, _, body = self._get('/manifest/changes?since=1&timeout=0')
+                self.assertEqual(json.loads(body), {'version': 1, 'changed': []})
+                (course / 'lessons' / 'L1' / 'L1.log').write_text('x', encoding='utf-8')
+                _, _, body = self._get('/manifest/changes?since=1&timeout=10')
+                self.assertEqual(json.loads(body), {'version': 2, 'changed': ['groups/lessons/L1']})
+                _, headers, body = self._get('/manifest.json')
+                self.assertEqual(headers['X-Manifest-Version'], '2')
+                self.assertEqual(json.loads(body)['groups']['lessons']['L1']['files'], ['L1.log'])
+                self.assertEqual((course / 'manifest.json').read_bytes(), body)
+            finally:
+                self.port = port
+
+    def test_manifest_watcher_keeps_dir_cache_in_memory(self):
+        from unittest import mock
+        from build_manifest import MANIFEST_CACHE_NAME
+        from inspect_dataset import _ManifestWatcher
+        with tempfile.TemporaryDirectory() as d:
+            course = Path(d)
+            (course / 'lessons' / 'L1').mkdir(parents=True)
+            watcher = _ManifestWatcher(course, exclude_pii=False)
+            with mock.patch('build_manifest._load_dir_cache', side_effect=AssertionError), \
+                    mock.patch('build_manifest._save_dir_cache', side_effect=AssertionError):
+                self.assertTrue(watcher.refresh())
+                self.assertFalse(watcher.refresh())
+                (course / 'lessons' / 'L1' / 'L1.log').write_text('x', encoding='utf-8')
+                self.assertTrue(watcher.refresh())
+            self.assertEqual(watcher.manifest['groups']['lessons']['L1']['files'], ['L1.log'])
+            self.assertFalse((course / MANIFEST_CACHE_NAME).exists())
+
+    def test_byte_ranges(self):
+        from inspect_dataset import _parse_byte_ranges
+        self.assertEqual(_parse_byte_ranges('bytes=0-1, 1-3, -2, 9-', 8), [(0, 3), (6, 7)])
+        self.assertEqual(_parse_byte_ranges('bytes=20-', 8), [])
+        self.assertIsNone(_parse_byte_ranges('bytes=3-1', 8))
+        self.assertIsNone(_parse_byte_ranges('items=0-1', 8))
+        raw = (self.course / 'lessons' / 'big.json').read_bytes()
+        status, headers, body = self._get('/lessons/big.json',
+                                          {'Range': 'bytes=10-19', 'Accept-Encoding': 'gzip'})
+        self.assertEqual((status, body), (206, raw[10:20]))
+        self.assertEqual(headers['Content-Range'], f'bytes 10-19/{len(raw)}')
+        self.assertEqual(headers['Accept-Ranges'], 'bytes')
+        status, headers, body = self._get('/lessons/big.json', {'Range': 'bytes=0-1,-3'})
+        self.assertEqual(status, 206)
+        boundary = headers['Content-Type'].split('boundary=')[1]
+        parts = body.split(f'--{boundary}'.encode())
+        self.assertEqual(len(parts), 4)
+        self.assertTrue(parts[1].endswith(b'\r\n\r\n' + raw[:2] + b'\r\n'))
+        self.assertTrue(parts[2].endswith(b'\r\n\r\n' + raw[-3:] + b'\r\n'))
+        status, headers, _ = self._get('/lessons/big.json', {'Range': f'bytes={len(raw)}-'})
+        self.assertEqual((status, headers['Content-Range']), (416, f'bytes */{len(raw)}'))
+        status, _, body = self._get('/lessons/big.json',
+                                    {'Range': 'bytes=0-1', 'If-Range': '"other"'})
+        self.assertEqual((status, body), (200, raw))
+
+
+class TestCliStartup(unittest.TestCase):
+    # Every pipeline step is a fresh interpreter, so `--help` must not pull in
+    # the GUI, plotting or numeric stacks.  The module check is the gate; the
+    # time budget (~25x the current cost) only catches gross regressions and
+    # can be skipped on slow machines with LEO_SKIP_TIMING_TESTS=1.
+    IMPORT_BUDGET_US = 2_000_000
+    HEAVY = ('tkinter', 'matplotlib', 'scipy', 'numpy', 'pandas', 'openpyxl',
+             'fitz', 'docx')
+
+    def test_sim_check_help_import_budget(self):
+        import os
+        import subprocess
+        import sys
+        res = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'utils.sim_check', '--help'],
+            cwd=_ROOT, capture_output=True, text=True,
+        )
+        self.assertEqual(res.returncode, 0, res.stderr[-2000:])
+        self.assertIn('Usage: sim_check.py', res.stdout)
+        self_us = {}
+        for line in res.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            own, _, name = line[len('import time:'):].split('|')
+            if own.strip().isdigit():
+                self_us[name.strip()] = int(own)
+        heavy = sorted(n for n in self_us if n.split('.')[0] in self.HEAVY)
+        self.assertEqual(heavy, [])
+        if os.environ.get('LEO_SKIP_TIMING_TESTS'):
+            return
+        self.assertLess(sum(self_us.values()), self.IMPORT_BUDGET_US)
+
+
+class TestCompareMethodsParallel(unittest.TestCase):
+    def _make_lesson(self, lesson: Path, n_students: int) -> None:
+        teacher = 'let a = 1;\nlet b = 2;\nconsole.log(a + b);\n'
+        (lesson / 'anon_ids').mkdir(parents=True)
+        (lesson / 'main.js').write_text(teacher, encoding='utf-8')
+        for i in range(n_students):
+            sdir = lesson / 'anon_ids' / f's{i}'
+            sdir.mkdir()
+            student = teacher.replace('2', str(i + 3)) + 'x' * i + '\n'
+            (sdir / 'main.js').write_text(student, encoding='utf-8')
+            start = student.index(str(i + 3))
+            extra = {'label': 'extra', 'start': start, 'end': start + 1, 'token': str(i + 3)}
+            missing = {'label': 'missing', 'start': 19, 'end': 20, 'token': '2',
+                       'paired_with': {'file': 'main.js', 'start': start, 'end': start + 1}}
+            marks = {
+                'ideal': {'teacher_files': {'main.js': [missing]},
+                          'student_files': {'main.js': [extra]}},
+                'lcs': {'teacher_files': {'main.js': [dict(missing, paired_with=None)]},
+                        'student_files': {'main.js': [extra] if i % 2 else []}},
+                'leo_star': {'teacher_files': {'main.js': [missing]},
+                             'student_files': {'main.js': [extra]}},
+            }
+            for method, data in marks.items():
+                (sdir / f'diff_marks_{method}.json').write_text(json.dumps(data), encoding='utf-8')
+
+    def test_pool_matches_serial(self):
+        import contextlib
+        import io
+        from concurrent.futures import ProcessPoolExecutor
+        import compare_methods_to_ideal as cm
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            self._make_lesson(root / 'lessons' / 'L1', 4)
+            self._make_lesson(root / 'lessons' / 'L2', 3)
+            (root / 'lessons' / 'L3').mkdir()
+            with contextlib.redirect_stdout(io.StringIO()) as serial_out:
+                serial = [cm.evaluate_lesson(root / 'lessons' / n) for n in ('L1', 'L2')]
+            with ProcessPoolExecutor(max_workers=2) as pool, \
+                    contextlib.redirect_stdout(io.StringIO()) as pool_out:
+                pooled = [cm.evaluate_lesson(root / 'lessons' / n, pool) for n in ('L1', 'L2')]
+            self.assertEqual(pooled, serial)
+            self.assertEqual(pool_out.getvalue(), serial_out.getvalue())
+            self.assertEqual([len(p[0]) for p in pooled], [20, 15])
+            self.assertEqual(list(pooled[0][2]), ['lcs', 'leo_star'])
+            lesson = root / 'lessons' / 'L1'
+            outcomes = [get() for get in cm._submit_lesson(lesson, None)]
+            self.assertEqual(
+                cm._evaluate_lesson_languages(lesson, {o['student_dir']: o['ideal'] for o in outcomes}),
+                cm._evaluate_lesson_languages(lesson))
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(cm.run_multi(root, jobs=2), 0)
+            self.assertTrue((root / 'Method_Evaluation.xlsx').is_file())
+
+
 class TestAssignmentCommentColumn(unittest.TestCase):
     def _checker(self):
         from utils.sim_check import CodeSimilarityChecker
@@ -1461,5 +2116,130 @@ def _attach_replay_parity_tests() -> None:
 _attach_replay_parity_tests()
 
 
+
+class TestMyersDiffParity(unittest.TestCase):
+    """Default diff opcodes equal difflib's; opt-in Myers keeps the LCS."""
+
+    def test_random_sequences_keep_lcs(self):
+        import difflib
+        from utils.seq_diff import check_edit_script, myers_opcodes
+        rnd = random.Random(7)
+        for _ in range(300):
+            a = [rnd.choice('abcd') for _ in range(rnd.randrange(30))]
+            b = [rnd.choice('abcd') for _ in range(rnd.randrange(30))]
+            ours = check_edit_script(a, b, myers_opcodes(a, b))
+            theirs = sum(size for _, _, size in difflib.SequenceMatcher(
+                None, a, b, autojunk=False).get_matching_blocks())
+            self.assertGreaterEqual(ours, theirs)
+
+    def test_myers_is_opt_in(self):
+        import os
+        from unittest import mock
+        from utils import seq_diff
+        a = list('abcabba')
+        b = list('cbabac')
+        with mock.patch.dict(os.environ, {seq_diff.MYERS_DIFF_ENV: ''}):
+            self.assertEqual(seq_diff.check_against_difflib(a, b),
+                             seq_diff.diff_opcodes(a, b))
+        with mock.patch.dict(os.environ, {seq_diff.MYERS_DIFF_ENV: '1'}):
+            self.assertEqual(seq_diff.diff_opcodes(a, b), seq_diff.myers_opcodes(a, b))
+
+    def test_opcode_shape_matches_difflib_on_simple_edit(self):
+        import difflib
+        from utils.seq_diff import myers_opcodes
+        a = ['let', 'x', '=', '1', ';']
+        b = ['let', 'y', '=', '1', ';', 'x']
+        self.assertEqual(
+            myers_opcodes(a, b),
+            difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes(),
+        )
+
+    def _check_project(self, project_dir: Path) -> None:
+        from utils.seq_diff import check_against_difflib
+        teacher_files = _project_code_files(project_dir)
+        for student_dir in _sampled_student_dirs(project_dir):
+            student_files = _project_code_files(student_dir)
+            for t_name, t_path in teacher_files.items():
+                s_path = _pair_student_file(t_path, t_name, student_files)
+                if s_path is None:
+                    continue
+                ext = t_path.suffix.lower()
+                t_seq = [tok for _, tok in _split_tokens_by_comment(
+                    _read_text_normalized(t_path), ext)[0]]
+                s_seq = [tok for _, tok in _split_tokens_by_comment(
+                    _read_text_normalized(s_path), ext)[0]]
+                with self.subTest(student=student_dir.name, file=t_name):
+                    check_against_difflib(t_seq, s_seq)
+
+
+def _attach_myers_parity_tests() -> None:
+    for project_dir in sorted(_TEST.iterdir()):
+        if not project_dir.is_dir():
+            continue
+
+        def make(p=project_dir):
+            def test(self):
+                self._check_project(p)
+            return test
+
+        setattr(TestMyersDiffParity, f'test_parity_{project_dir.name}', make())
+
+
+_attach_myers_parity_tests()
+
+
+class TestGitLineDiffConformance(unittest.TestCase):
+    """In-process line diff vs `git diff --no-index -U0 -w` hunk headers."""
+
+    def setUp(self):
+        import shutil
+        if shutil.which('git') is None:
+            self.skipTest('git not available')
+
+    def _assert_same(self, t_text: str, s_text: str, ext: str = '.txt') -> None:
+        from utils.git_line_diff import git_diff_hunks
+        from utils.token_log import _git_diff_hunks_subprocess
+        self.assertEqual(git_diff_hunks(t_text, s_text),
+                         _git_diff_hunks_subprocess(t_text, s_text, ext))
+
+    def test_random_edits(self):
+        rnd = random.Random(11)
+        pool = ['}', '{', '', '  }', 'x = 1;', 'return;', 'if (a) {',
+                '  foo();', '\tbar();', '<div>', '</div>', '   ']
+        for _ in range(40):
+            t = '\n'.join(rnd.choice(pool) for _ in range(rnd.randrange(40)))
+            s = '\n'.join(rnd.choice(pool) for _ in range(rnd.randrange(40)))
+            with self.subTest(t=t, s=s):
+                self._assert_same(t + '\n', s)
+
+    def _check_project(self, project_dir: Path) -> None:
+        teacher_files = _project_code_files(project_dir)
+        for student_dir in _sampled_student_dirs(project_dir):
+            student_files = _project_code_files(student_dir)
+            for t_name, t_path in teacher_files.items():
+                s_path = _pair_student_file(t_path, t_name, student_files)
+                if s_path is None:
+                    continue
+                with self.subTest(student=student_dir.name, file=t_name):
+                    self._assert_same(_read_text_normalized(t_path),
+                                      _read_text_normalized(s_path),
+                                      t_path.suffix.lower())
+
+
+def _attach_git_conformance_tests() -> None:
+    for project_dir in sorted(_TEST.iterdir()):
+        if not project_dir.is_dir():
+            continue
+
+        def make(p=project_dir):
+            def test(self):
+                self._check_project(p)
+            return test
+
+        setattr(TestGitLineDiffConformance, f'test_git_{project_dir.name}', make())
+
+
+_attach_git_conformance_tests()
+
 if __name__ == '__main__':
     unittest.main()
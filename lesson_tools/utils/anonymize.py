@@ -5,22 +5,15 @@ import re
 import shutil
 import zipfile
 import tempfile
+from importlib.util import find_spec
 
 from .folder_utils import CODE_EXTS
 from .similarity_measures import open_csv_encoded
 
-try:
-    from docx import Document
-    from docx.oxml.ns import qn
-    HAS_DOCX = True
-except ImportError:
-    HAS_DOCX = False
-
-try:
-    import fitz
-    HAS_PDF = True
-except ImportError:
-    HAS_PDF = False
+# python-docx and PyMuPDF are imported where a document is opened, so the
+# pipeline steps that never touch .docx/.pdf files do not pay for them.
+HAS_DOCX = find_spec("docx") is not None
+HAS_PDF = find_spec("fitz") is not None
 
 _INVALID_FS_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
 
@@ -222,6 +215,7 @@ _WORD_DOC_CT = (
 
 
 def _open_word_document(src_path):
+    from docx import Document
     try:
         return Document(src_path), None
     except ValueError:
@@ -244,6 +238,7 @@ def _open_word_document(src_path):
 
 
 def _run_has_image(run):
+    from docx.oxml.ns import qn
     el = run._element
     for tag in ("w:drawing", "w:pict", "w:object"):
         if el.find(qn(tag)) is not None:
@@ -252,6 +247,7 @@ def _run_has_image(run):
 
 
 def _anonymize_runs(runs, student_data, all_student_numbers, remarks):
+    from docx.oxml.ns import qn
     for run in runs:
         if _run_has_image(run):
             for t in run._element.findall(qn("w:t")):
@@ -338,6 +334,7 @@ def process_pdf_file(src_path, dst_path, student_data, all_student_numbers):
         )
         return remarks
 
+    import fitz
     try:
         doc = fitz.open(src_path)
         number = student_data["number"]
@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+from typing import Iterable, Optional
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+# Files are standard JSON (the browser tools `JSON.parse` them) laid out with
+# one top-level key per line, so `load_diff_marks(fields=...)` can skip the
+# lines it does not need.  Files in any other layout load the slow way.
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_FILE_MAPS = ('teacher_files', 'student_files')
+
+
+def _dumps(obj) -> str:
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    return _ENCODER.encode(obj)
+
+
+def _loads(data):
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+def write_diff_marks(path: Path, marks: dict) -> None:
+    """Write `marks` compactly, one top-level key per line; the per-file mark
+    lists of `teacher_files`/`student_files` are encoded one file at a time.
+    """
+    with open(path, 'w', encoding='utf-8', newline='\n') as fh:
+        fh.write('{')
+        sep = '\n'
+        for key, value in marks.items():
+            fh.write(f'{sep}{_dumps(str(key))}:')
+            sep = ',\n'
+            if key in _FILE_MAPS and isinstance(value, dict):
+                fh.write('{')
+                inner = ''
+                for fname, items in value.items():
+                    fh.write(f'{inner}{_dumps(str(fname))}:{_dumps(items)}')
+                    inner = ','
+                fh.write('}')
+            else:
+                fh.write(_dumps(value))
+        fh.write('\n}\n')
+
+
+def _load_fields(lines: list, wanted: set) -> Optional[dict]:
+    if len(lines) < 2 or lines[0] != b'{' or lines[-1] != b'}':
+        return None
+    out = {}
+    for line in lines[1:-1]:
+        if not line.startswith(b'"'):
+            return None
+        key_end = line.find(b'":')
+        if key_end < 0:
+            return None
+        key = _loads(line[:key_end + 1])
+        if key in wanted:
+            out[key] = _loads(line[key_end + 2:].rstrip(b','))
+    return out
+
+
+def load_diff_marks(path: Path, fields: Optional[Iterable[str]] = None) -> dict:
+    """Load a diff_marks file; with `fields`, only those top-level keys are
+    decoded (files not written by `write_diff_marks` are parsed in full and
+    then filtered).
+    """
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if fields is not None:
+        wanted = set(fields)
+        try:
+            out = _load_fields(data.rstrip().split(b'\n'), wanted)
+        except ValueError:
+            out = None
+        if out is not None:
+            return out
+        return {k: v for k, v in _loads(data).items() if k in wanted}
+    return _loads(data)
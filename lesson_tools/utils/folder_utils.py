@@ -1,8 +1,6 @@
 import json
 import re
 import sys
-import tkinter as tk
-from tkinter import filedialog
 from pathlib import Path
 
 _ROOT             = Path(__file__).resolve().parent.parent
@@ -88,6 +86,8 @@ def save_last_folder(path: Path) -> None:
 
 
 def pick_folder(title: str, *, initialdir: str | None = None) -> str:
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw()
     root.attributes("-topmost", True)
@@ -99,6 +99,8 @@ def pick_folder(title: str, *, initialdir: str | None = None) -> str:
 
 def pick_file(title: str, *, filetypes=None,
               initialdir: str | None = None) -> str:
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw()
     root.attributes("-topmost", True)
@@ -0,0 +1,503 @@
+"""In-process equivalent of `git diff --no-index --unified=0 -w`.
+
+A port of git's xdiff pipeline for the default (Myers) algorithm: record
+classification with all whitespace ignored, trimming of common ends,
+discarding of unmatched / over-matched lines, `xdl_split` with its cost
+heuristics, change compaction with the indent heuristic and, finally, the
+hunk header numbers `_parse_git_hunks` would read from git's output.
+"""
+import re
+from typing import Dict, List, Tuple
+
+_WS_RE = re.compile(r'[ \t\n\v\f\r]+')
+
+_MAX_EQLIMIT = 1024
+_SIMSCAN_WINDOW = 100
+_KPDIS_RUN = 4
+_MAX_COST_MIN = 256
+_HEUR_MIN_COST = 256
+_SNAKE_CNT = 20
+_K_HEUR = 4
+_LINE_MAX = 1 << 62
+
+_MAX_INDENT = 200
+_MAX_BLANKS = 20
+_START_OF_FILE_PENALTY = 1
+_END_OF_FILE_PENALTY = 21
+_TOTAL_BLANK_WEIGHT = -30
+_POST_BLANK_WEIGHT = 6
+_RELATIVE_INDENT_PENALTY = -4
+_RELATIVE_INDENT_WITH_BLANK_PENALTY = 10
+_RELATIVE_OUTDENT_PENALTY = 24
+_RELATIVE_OUTDENT_WITH_BLANK_PENALTY = 17
+_RELATIVE_DEDENT_PENALTY = 23
+_RELATIVE_DEDENT_WITH_BLANK_PENALTY = 17
+_INDENT_WEIGHT = 60
+_INDENT_HEURISTIC_MAX_SLIDING = 100
+
+
+def _split_records(text: str) -> List[str]:
+    if not text:
+        return []
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return lines
+
+
+def _bogosqrt(n: int) -> int:
+    i = 1
+    while n > 0:
+        i <<= 1
+        n >>= 2
+    return i
+
+
+def _clean_mmatch(dis: List[int], i: int, s: int, e: int) -> bool:
+    if i - s > _SIMSCAN_WINDOW:
+        s = i - _SIMSCAN_WINDOW
+    if e - i > _SIMSCAN_WINDOW:
+        e = i + _SIMSCAN_WINDOW
+    rdis0, rpdis0 = 0, 1
+    r = 1
+    while i - r >= s:
+        if not dis[i - r]:
+            rdis0 += 1
+        elif dis[i - r] == 2:
+            rpdis0 += 1
+        else:
+            break
+        r += 1
+    if rdis0 == 0:
+        return False
+    rdis1, rpdis1 = 0, 1
+    r = 1
+    while i + r <= e:
+        if not dis[i + r]:
+            rdis1 += 1
+        elif dis[i + r] == 2:
+            rpdis1 += 1
+        else:
+            break
+        r += 1
+    if rdis1 == 0:
+        return False
+    rdis1 += rdis0
+    rpdis1 += rpdis0
+    return rpdis1 * _KPDIS_RUN < rpdis1 + rdis1
+
+
+def _split(ha1, off1, lim1, ha2, off2, lim2, need_min) -> Tuple[int, int, bool, bool]:
+    """`xdl_split`: returns (i1, i2, min_lo, min_hi)."""
+    kvdf: Dict[int, int] = {}
+    kvdb: Dict[int, int] = {}
+    dmin, dmax = off1 - lim2, lim1 - off2
+    fmid, bmid = off1 - off2, lim1 - lim2
+    odd = (fmid - bmid) & 1
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    kvdf[fmid] = off1
+    kvdb[bmid] = lim1
+    mxcost = max(_bogosqrt(len(ha1) + len(ha2) + 3), _MAX_COST_MIN)
+
+    ec = 0
+    while True:
+        ec += 1
+        got_snake = False
+        if fmin > dmin:
+            fmin -= 1
+            kvdf[fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            kvdf[fmax + 1] = -1
+        else:
+            fmax -= 1
+        for d in range(fmax, fmin - 1, -2):
+            if kvdf[d - 1] >= kvdf[d + 1]:
+                i1 = kvdf[d - 1] + 1
+            else:
+                i1 = kvdf[d + 1]
+            prev1 = i1
+            i2 = i1 - d
+            while i1 < lim1 and i2 < lim2 and ha1[i1] == ha2[i2]:
+                i1 += 1
+                i2 += 1
+            if i1 - prev1 > _SNAKE_CNT:
+                got_snake = True
+            kvdf[d] = i1
+            if odd and bmin <= d <= bmax and kvdb[d] <= i1:
+                return i1, i2, True, True
+
+        if bmin > dmin:
+            bmin -= 1
+            kvdb[bmin - 1] = _LINE_MAX
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            kvdb[bmax + 1] = _LINE_MAX
+        else:
+            bmax -= 1
+        for d in range(bmax, bmin - 1, -2):
+            if kvdb[d - 1] < kvdb[d + 1]:
+                i1 = kvdb[d - 1]
+            else:
+                i1 = kvdb[d + 1] - 1
+            prev1 = i1
+            i2 = i1 - d
+            while i1 > off1 and i2 > off2 and ha1[i1 - 1] == ha2[i2 - 1]:
+                i1 -= 1
+                i2 -= 1
+            if prev1 - i1 > _SNAKE_CNT:
+                got_snake = True
+            kvdb[d] = i1
+            if not odd and fmin <= d <= fmax and i1 <= kvdf[d]:
+                return i1, i2, True, True
+
+        if need_min:
+            continue
+
+        if got_snake and ec > _HEUR_MIN_COST:
+            best = 0
+            for d in range(fmax, fmin - 1, -2):
+                dd = d - fmid if d > fmid else fmid - d
+                i1 = kvdf[d]
+                i2 = i1 - d
+                v = (i1 - off1) + (i2 - off2) - dd
+                if (v > _K_HEUR * ec and v > best
+                        and off1 + _SNAKE_CNT <= i1 < lim1
+                        and off2 + _SNAKE_CNT <= i2 < lim2):
+                    k = 1
+                    while ha1[i1 - k] == ha2[i2 - k]:
+                        if k == _SNAKE_CNT:
+                            best = v
+                            spl = (i1, i2)
+                            break
+                        k += 1
+            if best > 0:
+                return spl[0], spl[1], True, False
+
+            best = 0
+            for d in range(bmax, bmin - 1, -2):
+                dd = d - bmid if d > bmid else bmid - d
+                i1 = kvdb[d]
+                i2 = i1 - d
+                v = (lim1 - i1) + (lim2 - i2) - dd
+                if (v > _K_HEUR * ec and v > best
+                        and off1 < i1 <= lim1 - _SNAKE_CNT
+                        and off2 < i2 <= lim2 - _SNAKE_CNT):
+                    k = 0
+                    while ha1[i1 + k] == ha2[i2 + k]:
+                        if k == _SNAKE_CNT - 1:
+                            best = v
+                            spl = (i1, i2)
+                            break
+                        k += 1
+            if best > 0:
+                return spl[0], spl[1], False, True
+
+        if ec >= mxcost:
+            fbest = fbest1 = -1
+            for d in range(fmax, fmin - 1, -2):
+                i1 = min(kvdf[d], lim1)
+                i2 = i1 - d
+                if lim2 < i2:
+                    i1 = lim2 + d
+                    i2 = lim2
+                if fbest < i1 + i2:
+                    fbest = i1 + i2
+                    fbest1 = i1
+            bbest = bbest1 = _LINE_MAX
+            for d in range(bmax, bmin - 1, -2):
+                i1 = max(off1, kvdb[d])
+                i2 = i1 - d
+                if i2 < off2:
+                    i1 = off2 + d
+                    i2 = off2
+                if i1 + i2 < bbest:
+                    bbest = i1 + i2
+                    bbest1 = i1
+            if (lim1 + lim2) - bbest < fbest - (off1 + off2):
+                return fbest1, fbest - fbest1, True, False
+            return bbest1, bbest - bbest1, False, True
+
+
+def _recs_cmp(ha1, rindex1, rchg1, ha2, rindex2, rchg2) -> None:
+    stack = [(0, len(ha1), 0, len(ha2), False)]
+    while stack:
+        off1, lim1, off2, lim2, need_min = stack.pop()
+        while off1 < lim1 and off2 < lim2 and ha1[off1] == ha2[off2]:
+            off1 += 1
+            off2 += 1
+        while off1 < lim1 and off2 < lim2 and ha1[lim1 - 1] == ha2[lim2 - 1]:
+            lim1 -= 1
+            lim2 -= 1
+        if off1 == lim1:
+            for i in range(off2, lim2):
+                rchg2[rindex2[i]] = 1
+        elif off2 == lim2:
+            for i in range(off1, lim1):
+                rchg1[rindex1[i]] = 1
+        else:
+            i1, i2, min_lo, min_hi = _split(ha1, off1, lim1, ha2, off2, lim2, need_min)
+            stack.append((i1, lim1, i2, lim2, min_hi))
+            stack.append((off1, i1, off2, i2, min_lo))
+
+
+def _get_indent(line: str) -> int:
+    ret = 0
+    for c in line:
+        if c not in ' \t\n\v\f\r':
+            return ret
+        if c == ' ':
+            ret += 1
+        elif c == '\t':
+            ret += 8 - ret % 8
+        if ret >= _MAX_INDENT:
+            return _MAX_INDENT
+    return -1
+
+
+def _measure_split(lines: List[str], split: int) -> tuple:
+    n = len(lines)
+    if split >= n:
+        end_of_file, indent = True, -1
+    else:
+        end_of_file, indent = False, _get_indent(lines[split])
+    pre_blank, pre_indent = 0, -1
+    for i in range(split - 1, -1, -1):
+        pre_indent = _get_indent(lines[i])
+        if pre_indent != -1:
+            break
+        pre_blank += 1
+        if pre_blank == _MAX_BLANKS:
+            pre_indent = 0
+            break
+    post_blank, post_indent = 0, -1
+    for i in range(split + 1, n):
+        post_indent = _get_indent(lines[i])
+        if post_indent != -1:
+            break
+        post_blank += 1
+        if post_blank == _MAX_BLANKS:
+            post_indent = 0
+            break
+    return end_of_file, indent, pre_blank, pre_indent, post_blank, post_indent
+
+
+def _score_add_split(m: tuple, score: List[int]) -> None:
+    end_of_file, indent, pre_blank, pre_indent, m_post_blank, post_indent = m
+    if pre_indent == -1 and pre_blank == 0:
+        score[1] += _START_OF_FILE_PENALTY
+    if end_of_file:
+        score[1] += _END_OF_FILE_PENALTY
+    post_blank = 1 + m_post_blank if indent == -1 else 0
+    total_blank = pre_blank + post_blank
+    score[1] += _TOTAL_BLANK_WEIGHT * total_blank
+    score[1] += _POST_BLANK_WEIGHT * post_blank
+    if indent == -1:
+        indent = post_indent
+    any_blanks = total_blank != 0
+    score[0] += indent
+    if indent == -1 or pre_indent == -1 or indent == pre_indent:
+        return
+    if indent > pre_indent:
+        score[1] += (_RELATIVE_INDENT_WITH_BLANK_PENALTY if any_blanks
+                     else _RELATIVE_INDENT_PENALTY)
+    elif post_indent != -1 and post_indent > indent:
+        score[1] += (_RELATIVE_OUTDENT_WITH_BLANK_PENALTY if any_blanks
+                     else _RELATIVE_OUTDENT_PENALTY)
+    else:
+        score[1] += (_RELATIVE_DEDENT_WITH_BLANK_PENALTY if any_blanks
+                     else _RELATIVE_DEDENT_PENALTY)
+
+
+def _score_cmp(s1: List[int], s2: List[int]) -> int:
+    cmp_indents = (s1[0] > s2[0]) - (s1[0] < s2[0])
+    return _INDENT_WEIGHT * cmp_indents + (s1[1] - s2[1])
+
+
+class _Side:
+    """One file during compaction; `rchg` carries a 0 sentinel at both ends."""
+
+    __slots__ = ('lines', 'ha', 'rchg', 'nrec', 'start', 'end')
+
+    def __init__(self, lines: List[str], ha: List[int], rchg: List[int]):
+        self.lines = lines
+        self.ha = ha
+        self.rchg = [0] + rchg + [0]
+        self.nrec = len(lines)
+        self.start = self.end = 0
+
+    def chg(self, i: int) -> int:
+        return self.rchg[i + 1] if i >= -1 else 0
+
+    def set_chg(self, i: int, v: int) -> None:
+        self.rchg[i + 1] = v
+
+    def next_group(self) -> bool:
+        if self.end == self.nrec:
+            return False
+        self.start = self.end + 1
+        self.end = self.start
+        while self.chg(self.end):
+            self.end += 1
+        return True
+
+    def previous_group(self) -> bool:
+        if self.start == 0:
+            return False
+        self.end = self.start - 1
+        self.start = self.end
+        while self.chg(self.start - 1):
+            self.start -= 1
+        return True
+
+    def slide_down(self) -> bool:
+        if self.end < self.nrec and self.ha[self.start] == self.ha[self.end]:
+            self.set_chg(self.start, 0)
+            self.start += 1
+            self.set_chg(self.end, 1)
+            self.end += 1
+            while self.chg(self.end):
+                self.end += 1
+            return True
+        return False
+
+    def slide_up(self) -> bool:
+        if self.start > 0 and self.ha[self.start - 1] == self.ha[self.end - 1]:
+            self.start -= 1
+            self.set_chg(self.start, 1)
+            self.end -= 1
+            self.set_chg(self.end, 0)
+            while self.chg(self.start - 1):
+                self.start -= 1
+            return True
+        return False
+
+
+def _change_compact(g: _Side, go: _Side) -> None:
+    g.start = g.end = 0
+    while g.chg(g.end):
+        g.end += 1
+    go.start = go.end = 0
+    while go.chg(go.end):
+        go.end += 1
+
+    while True:
+        if g.end != g.start:
+            while True:
+                groupsize = g.end - g.start
+                end_matching_other = -1
+                while g.slide_up():
+                    go.previous_group()
+                earliest_end = g.end
+                if go.end > go.start:
+                    end_matching_other = g.end
+                while g.slide_down():
+                    go.next_group()
+                    if go.end > go.start:
+                        end_matching_other = g.end
+                if groupsize == g.end - g.start:
+                    break
+
+            if g.end == earliest_end:
+                pass
+            elif end_matching_other != -1:
+                while go.end == go.start:
+                    g.slide_up()
+                    go.previous_group()
+            else:
+                shift = max(earliest_end, g.end - groupsize - 1,
+                            g.end - _INDENT_HEURISTIC_MAX_SLIDING)
+                best_shift = -1
+                best_score = None
+                while shift <= g.end:
+                    score = [0, 0]
+                    _score_add_split(_measure_split(g.lines, shift), score)
+                    _score_add_split(_measure_split(g.lines, shift - groupsize), score)
+                    if best_shift == -1 or _score_cmp(score, best_score) <= 0:
+                        best_score = score
+                        best_shift = shift
+                    shift += 1
+                while g.end > best_shift:
+                    g.slide_up()
+                    go.previous_group()
+
+        if not g.next_group():
+            break
+        go.next_group()
+
+
+def git_diff_hunks(t_text: str, s_text: str) -> List[Tuple[int, int, int, int]]:
+    """Hunks as (old_start, old_count, new_start, new_count) header numbers."""
+    if '\0' in t_text[:8000] or '\0' in s_text[:8000]:
+        return []
+    lines1 = _split_records(t_text)
+    lines2 = _split_records(s_text)
+
+    classes: Dict[str, int] = {}
+    ha1 = [classes.setdefault(_WS_RE.sub('', ln), len(classes)) for ln in lines1]
+    ha2 = [classes.setdefault(_WS_RE.sub('', ln), len(classes)) for ln in lines2]
+    len1 = [0] * len(classes)
+    len2 = [0] * len(classes)
+    for h in ha1:
+        len1[h] += 1
+    for h in ha2:
+        len2[h] += 1
+
+    n1, n2 = len(ha1), len(ha2)
+    lim = min(n1, n2)
+    dstart = 0
+    while dstart < lim and ha1[dstart] == ha2[dstart]:
+        dstart += 1
+    tail = 0
+    while tail < lim - dstart and ha1[n1 - 1 - tail] == ha2[n2 - 1 - tail]:
+        tail += 1
+    dend1, dend2 = n1 - tail - 1, n2 - tail - 1
+
+    rchg1 = [0] * n1
+    rchg2 = [0] * n2
+
+    def _cleanup(ha, counts_other, n, dend, rchg):
+        mlim = min(_bogosqrt(n), _MAX_EQLIMIT)
+        dis = [0] * (n + 1)
+        for i in range(dstart, dend + 1):
+            nm = counts_other[ha[i]]
+            dis[i] = 0 if nm == 0 else (2 if nm >= mlim else 1)
+        kept_ha: List[int] = []
+        rindex: List[int] = []
+        for i in range(dstart, dend + 1):
+            if dis[i] == 1 or (dis[i] == 2 and not _clean_mmatch(dis, i, dstart, dend)):
+                rindex.append(i)
+                kept_ha.append(ha[i])
+            else:
+                rchg[i] = 1
+        return kept_ha, rindex
+
+    kept1, rindex1 = _cleanup(ha1, len2, n1, dend1, rchg1)
+    kept2, rindex2 = _cleanup(ha2, len1, n2, dend2, rchg2)
+    _recs_cmp(kept1, rindex1, rchg1, kept2, rindex2, rchg2)
+
+    side1 = _Side(lines1, ha1, rchg1)
+    side2 = _Side(lines2, ha2, rchg2)
+    _change_compact(side1, side2)
+    _change_compact(side2, side1)
+
+    hunks: List[Tuple[int, int, int, int]] = []
+    i1, i2 = n1, n2
+    while i1 >= 0 or i2 >= 0:
+        if side1.chg(i1 - 1) or side2.chg(i2 - 1):
+            l1, l2 = i1, i2
+            while side1.chg(i1 - 1):
+                i1 -= 1
+            while side2.chg(i2 - 1):
+                i2 -= 1
+            c1, c2 = l1 - i1, l2 - i2
+            hunks.append((i1 + 1 if c1 else i1, c1, i2 + 1 if c2 else i2, c2))
+        i1 -= 1
+        i2 -= 1
+    hunks.reverse()
+    return hunks
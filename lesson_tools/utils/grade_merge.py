@@ -1,11 +1,10 @@
 from pathlib import Path
 
-from openpyxl import load_workbook
-
 from .similarity_measures import save_xlsx
 
 
 def merge_manual_columns(src_path: Path, dst_path: Path) -> None:
+    from openpyxl import load_workbook
     try:
         src_wb = load_workbook(src_path)
         dst_wb = load_workbook(dst_path)
@@ -1,13 +1,11 @@
 from __future__ import annotations
 
-from bisect import bisect_right
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 from .folder_utils import TEACHER_SUBDIRS
 from .lv_constants import BACKSPACE_CHARS, DELETE_FWRD_CHARS, DELETE_LINE_CHAR
-from .similarity_measures import _CHAR_TOKEN_RE, _comment_ranges
-from .token_log_mixin import _embedded_lang_ranges_for
+from .similarity_measures import _CHAR_TOKEN_RE, scan_file
 
 
 BURST_GAP_S = 30
@@ -138,43 +136,17 @@ def _count_tokens(text: str, file_ext: str) -> Dict[str, int]:
     default = _LANG_EXT_TO_BUCKET.get(file_ext.lower())
     if default is None:
         return out
-    c_starts, c_ends = _comment_ranges(text, file_ext.lower())
-
-    def _in_comment(pos: int) -> bool:
-        if not c_starts:
-            return False
-        i = bisect_right(c_starts, pos) - 1
-        return i >= 0 and pos < c_ends[i]
-
-    if default == "html":
-        ranges_by_ext = _embedded_lang_ranges_for(text, file_ext.lower())
-        flat: List[Tuple[str, int, int]] = []
-        for ext, ranges in (ranges_by_ext or {}).items():
-            bucket = _EMBEDDED_EXT_TO_BUCKET.get(ext)
-            if bucket is None:
-                continue
-            for lo, hi in ranges:
-                flat.append((bucket, lo, hi))
-        for m in _CHAR_TOKEN_RE.finditer(text):
-            pos = m.start()
-            out["total"] += 1
-            if _in_comment(pos):
-                out["comment"] += 1
-                continue
-            bucket = "html"
-            for b, lo, hi in flat:
-                if lo <= pos < hi:
-                    bucket = b
-                    break
-            out[bucket] += 1
-    else:
-        for m in _CHAR_TOKEN_RE.finditer(text):
-            pos = m.start()
-            out["total"] += 1
-            if _in_comment(pos):
-                out["comment"] += 1
-            else:
-                out[default] += 1
+    scan = scan_file(text, file_ext.lower())
+    buckets = [
+        _EMBEDDED_EXT_TO_BUCKET.get(ext, default) if default == "html" else default
+        for ext in scan.langs
+    ]
+    out["total"] = len(scan)
+    for is_comment, li in zip(scan.comment, scan.lang):
+        if is_comment:
+            out["comment"] += 1
+        else:
+            out[buckets[li]] += 1
     return out
 
 
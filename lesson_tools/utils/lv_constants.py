@@ -1,19 +1,4 @@
 import re
-try:
-    import tkinter as tk
-    from tkinter import filedialog, ttk, font as tkfont
-    _HAS_TK = True
-except ImportError:
-    _HAS_TK = False
-    class _TkMock:
-        NORMAL = DISABLED = ACTIVE = END = INSERT = W = X = Y = BOTH = \
-        TOP = BOTTOM = LEFT = RIGHT = HORIZONTAL = VERTICAL = WORD = NONE = \
-        FLAT = SOLID = "mock"
-        def __getattr__(self, _): return type("_M", (), {"__getattr__": lambda s, n: None})()
-    class _TkMockMod:
-        def __getattr__(self, _): return None
-    tk = _TkMock()
-    filedialog = ttk = tkfont = _TkMockMod()
 from datetime import datetime
 
 try:
@@ -96,4 +81,4 @@ def split_code_with_anchors(code: str) -> list:
         last = m.end()
     if last < len(code):
         result.append(("text", code[last:]))
-    return result
\ No newline at end of file
+    return result
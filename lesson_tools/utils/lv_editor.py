@@ -6,7 +6,7 @@ from .lv_constants import (
     CODE_INSERT_MS_PER_CHAR,
 )
 from languages import (
-    get_profile,
+    get_compiled_profile,
     lesson_file_extension,
     should_auto_dedent_on_char,
     should_decrease_after,
@@ -40,7 +40,7 @@ class HeadlessEditor:
         self._deleted_chars: list = []
         self._idx_to_anchor: dict = {}
         self._auto_dedent_idxs: set = set()
-        self._profile = get_profile(file_ext) if file_ext else None
+        self._profile = get_compiled_profile(file_ext) if file_ext else None
 
     def get_text(self) -> str:
         return "".join(self._chars)
@@ -9,9 +9,10 @@ from openpyxl.formatting.rule import ColorScaleRule
 from .similarity_measures import (
     normalize_code,
     calculate_ide_diff_sim, calculate_char_histogram_similarity,
-    split_code_tokens, calculate_containment,
+    calculate_containment,
     save_xlsx,
 )
+from .token_cache import tokenize
 from .lesson_log import load_lesson_log
 from .lv_editor import reconstruct_all_with_ghosts
 from .folder_utils import LANG_EXTS
@@ -96,15 +97,16 @@ class PeerSimilarityChecker:
                 src_raw = self._read_file(self.teacher_dir, ext)
 
             if src_raw is not None:
-                self.baseline_outside[ext], self.baseline_inside[ext] = \
-                    split_code_tokens(src_raw)
+                src_out, src_ins = tokenize(src_raw).counters()
+                self.baseline_outside[ext] = Counter(src_out)
+                self.baseline_inside[ext]  = Counter(src_ins)
             else:
                 self.baseline_outside[ext] = Counter()
                 self.baseline_inside[ext]  = Counter()
 
             t_raw = self._read_file(self.teacher_dir, ext)
             if t_raw is not None:
-                t_out, t_ins = split_code_tokens(t_raw)
+                t_out, t_ins = tokenize(t_raw).counters()
                 for tok, cnt in t_out.items():
                     if cnt > self.baseline_outside[ext].get(tok, 0):
                         self.baseline_outside[ext][tok] = cnt
@@ -128,7 +130,7 @@ class PeerSimilarityChecker:
                 gtext = g.get('text', '') if isinstance(g, dict) else ''
                 if not gtext.strip():
                     continue
-                g_out, g_ins = split_code_tokens(gtext)
+                g_out, g_ins = tokenize(gtext).counters()
                 for ext in self.extensions:
                     for tok, cnt in g_out.items():
                         if cnt > self.baseline_outside[ext].get(tok, 0):
@@ -157,7 +159,7 @@ class PeerSimilarityChecker:
                     raw = self._read_file(s_dir, ext)
                     self.student_data[name][ext] = normalize_code(raw) if raw else None
                     if raw:
-                        out, _ = split_code_tokens(raw)
+                        out, _ = tokenize(raw).counters()
                         full_outside += out
                 self.student_outside_full[name] = full_outside
                 continue
@@ -172,7 +174,7 @@ class PeerSimilarityChecker:
                     continue
                 try:
                     self.student_data[name][ext] = normalize_code(raw)
-                    out, ins = split_code_tokens(raw)
+                    out, ins = tokenize(raw).counters()
                     self.student_extra_outside[name][ext] = out - self.baseline_outside[ext]
                     self.student_extra_inside[name][ext] = ins - self.baseline_inside[ext]
                     full_outside += out
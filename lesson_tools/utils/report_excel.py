@@ -3,24 +3,19 @@ from collections import Counter
 from pathlib import Path
 from typing import Dict, List, NamedTuple, Tuple
 
-from openpyxl import Workbook
-from openpyxl.comments import Comment
-from openpyxl.formatting.rule import ColorScaleRule
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from languages import RangeIndex
 
 from .folder_utils import LANG_EXTS
 from .similarity_measures import (
     calculate_containment,
-    iter_code_tokens,
     save_xlsx,
     token_edit_similarity,
 )
-from .token_log import _split_tokens_by_comment
+from .token_cache import tokenize
+from .token_log_lang_stats import _embedded_lang_index_for
 from .token_log_mixin import (
     _LANG_EXT_LABEL,
     _effective_ext_at,
-    _embedded_lang_ranges_for,
     _ext_of,
 )
 
@@ -54,7 +49,7 @@ def _build_synth_ts(files: Dict[str, Path]) -> Dict[Tuple[str, int], str]:
         except Exception:
             continue
         file_ext = _ext_of(fpath.name)
-        for pos, _tok, _is_comment in iter_code_tokens(text, file_ext):
+        for pos in tokenize(text, file_ext).scan.starts:
             out[(fpath.name, pos)] = _ts_str(counter)
             counter += 1
     return out
@@ -67,14 +62,19 @@ class _Col(NamedTuple):
     cf: str = ''
 
 
+def _color_scale(**kw):
+    from openpyxl.formatting.rule import ColorScaleRule
+    return ColorScaleRule(**kw)
+
+
 _CF_RULES = {
-    'extra': lambda: ColorScaleRule(
+    'extra': lambda: _color_scale(
         start_type='num', start_value=0, start_color='FFFFFF',
         end_type='max', end_color='F8696B'),
-    'inc': lambda: ColorScaleRule(
+    'inc': lambda: _color_scale(
         start_type='num', start_value=0, start_color='F8696B',
         end_type='num', end_value=100, end_color='FFFFFF'),
-    'redlow': lambda: ColorScaleRule(
+    'redlow': lambda: _color_scale(
         start_type='min', start_color='F8696B',
         end_type='max', end_color='FFFFFF'),
 }
@@ -90,6 +90,7 @@ class ExcelReportMixin:
         token_stats: 'Dict[str, dict] | None' = None,
         basis_marks_by_sid: 'Dict[str, dict] | None' = None,
     ) -> None:
+        from openpyxl import Workbook
         wb = Workbook()
         wb.remove(wb.active)
         prev_stats = None
@@ -107,7 +108,9 @@ class ExcelReportMixin:
                 self._student_token_stats = prev_stats
             self._basis_marks_by_sid = prev_basis
 
-    def _add_remarks_sheet(self, wb: Workbook, anonymize: bool = False) -> None:
+    def _add_remarks_sheet(self, wb: 'Workbook', anonymize: bool = False) -> None:
+        from openpyxl.comments import Comment
+        from openpyxl.styles import Font
         sheet = wb.create_sheet(title='Remarks')
         is_assignment = not bool(self._lesson_keypresses)
 
@@ -404,6 +407,8 @@ class ExcelReportMixin:
 
     def _apply_remarks_formatting(self, sheet, cols: 'List[_Col]',
                                   idx: Dict[str, int]) -> None:
+        from openpyxl.styles import PatternFill
+        from openpyxl.utils import get_column_letter
         for c in cols:
             if c.hidden:
                 sheet.column_dimensions[get_column_letter(idx[c.key])].hidden = True
@@ -545,23 +550,23 @@ class ExcelReportMixin:
         teacher_by_lang = self._teacher_tokens_by_lang()
         teacher_files = self.get_code_files(self._effective_reference_dir())
         teacher_texts: Dict[str, str] = {}
-        teacher_ranges: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        teacher_ranges: Dict[str, RangeIndex] = {}
         for ext, fpath in (teacher_files or {}).items():
             try:
                 text = fpath.read_text(encoding='utf-8', errors='ignore')
             except Exception:
                 continue
             teacher_texts[fpath.name] = text
-            teacher_ranges[fpath.name] = _embedded_lang_ranges_for(text, ext)
+            teacher_ranges[fpath.name] = _embedded_lang_index_for(text, ext)
         student_dir = getattr(self, 'student_dir_by_sid', {}).get(sid)
         student_files = self.get_code_files(student_dir) if student_dir else {}
-        student_ranges: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        student_ranges: Dict[str, RangeIndex] = {}
         for ext, fpath in (student_files or {}).items():
             try:
                 text = fpath.read_text(encoding='utf-8', errors='ignore')
             except Exception:
                 continue
-            student_ranges[fpath.name] = _embedded_lang_ranges_for(text, ext)
+            student_ranges[fpath.name] = _embedded_lang_index_for(text, ext)
 
 
         miss_by_lang: Dict[str, List[Tuple[str, int, str]]] = {}
@@ -646,11 +651,8 @@ class ExcelReportMixin:
                 text = file_path.read_text(encoding='utf-8', errors='ignore')
             except Exception:
                 continue
-            ranges = _embedded_lang_ranges_for(text, ext)
-            nc, _cm = _split_tokens_by_comment(text, ext)
-            for pos, tok in nc:
-                eff = _effective_ext_at(pos, ext, ranges) if ranges else ext
-                by_lang.setdefault(eff, Counter())[tok] += 1
+            for eff, counts in tokenize(text, ext).scan.tokens_by_lang().items():
+                by_lang.setdefault(eff, Counter()).update(counts)
         return by_lang
 
     def _teacher_tokens_by_lang(self) -> Dict[str, Counter]:
@@ -758,6 +760,7 @@ class ExcelReportMixin:
         if not (self.required_items or self.not_expected_items) \
                 or not has_submission or code_not_found:
             return '', '', [], None
+        from openpyxl.styles import PatternFill
 
         raw_text       = self.student_raw_texts.get(sid, '').lower()
         raw_no_space   = raw_text.replace(' ', '')
@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+STORE_NAME = 'results.sqlite'
+_SCHEMA_VERSION = 2
+# Files modified this recently may change again within the same mtime tick,
+# so their stored copy is not trusted on the next read (cf. git's racy index
+# entries and `build_manifest._RACY_NS`).
+_RACY_NS = 2_000_000_000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    project  TEXT    NOT NULL,
+    source   TEXT    NOT NULL,
+    path     TEXT    NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    header   TEXT    NOT NULL,
+    n_rows   INTEGER NOT NULL,
+    width    INTEGER NOT NULL,
+    PRIMARY KEY (project, source)
+);
+CREATE TABLE IF NOT EXISTS results (
+    project TEXT    NOT NULL,
+    source  TEXT    NOT NULL,
+    row     INTEGER NOT NULL,
+    col     INTEGER NOT NULL,
+    value   TEXT    NOT NULL,
+    PRIMARY KEY (project, source, row, col)
+) WITHOUT ROWID;
+'''
+
+# (header, data rows) of a sheet-like source; header is None for an empty one.
+Sheet = Tuple[Optional[list], List[list]]
+
+
+def read_xlsx_sheet(path: Path, sheet: Optional[str] = None) -> Sheet:
+    from openpyxl import load_workbook
+    wb = load_workbook(path, data_only=True, read_only=True)
+    ws = wb[sheet] if sheet and sheet in wb.sheetnames else wb.active
+    rows = list(ws.iter_rows(values_only=True))
+    wb.close()
+    if not rows:
+        return None, []
+    return list(rows[0]), [list(r) for r in rows[1:]]
+
+
+def parse_stats_csv(text: str) -> Optional[Dict[str, object]]:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if len(lines) < 2:
+        return None
+    header = [c.strip() for c in lines[0].split(',')]
+    values = [c.strip() for c in lines[1].split(',')]
+    out: Dict[str, object] = {}
+    for k, v in zip(header, values):
+        if not k:
+            continue
+        if v == '':
+            out[k] = ''
+            continue
+        try:
+            if '.' in v:
+                out[k] = float(v)
+            else:
+                out[k] = int(v)
+        except ValueError:
+            out[k] = v
+    return out
+
+
+def read_stats_csv(path: Path) -> Sheet:
+    stats = parse_stats_csv(Path(path).read_text(encoding='utf-8'))
+    if stats is None:
+        return None, []
+    return list(stats), [list(stats.values())]
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ResultsStore:
+    """Per-course SQLite parse cache of the sheets `build_overview` reads
+    (remarks workbooks, Extra.xlsx, lesson stats), one row per non-empty
+    cell keyed by (project, source, row, col). Callers get the sheet back
+    as (header, rows) and keep joining it themselves; it is filled on read,
+    not by the steps that write those files.
+
+    A source is re-read when its path, size or mtime_ns changed, or when it
+    was stored within `_RACY_NS` of its last modification.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != _SCHEMA_VERSION:
+            self._conn.executescript(
+                'DROP TABLE IF EXISTS results; DROP TABLE IF EXISTS sources;')
+            self._conn.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def for_course(cls, root: Path) -> 'ResultsStore':
+        return cls(Path(root) / STORE_NAME)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def sheet(self, project: str, source: str, path: Path,
+              loader: Callable[[Path], Sheet]) -> Sheet:
+        """Rows of `path`, from the store when it is up to date, otherwise
+        via `loader` (and then upserted)."""
+        stamp = _stamp(path)
+        if stamp is not None:
+            cached = self._load(project, source, path, stamp)
+            if cached is not None:
+                return cached
+        header, rows = loader(path)
+        if stamp is not None:
+            self.put(project, source, path, header, rows, stamp=stamp)
+        return header, rows
+
+    def stale(self, project: str, source: str, path: Path) -> Optional[Tuple[int, int]]:
+        """Current stamp of `path` when the stored copy is missing or out of
+        date, else None."""
+        stamp = _stamp(path)
+        if stamp is None:
+            return None
+        meta = self._conn.execute(
+            'SELECT path, size, mtime_ns FROM sources WHERE project = ? AND source = ?',
+            (project, source)).fetchone()
+        if meta is not None and meta[0] == str(Path(path).resolve()) and tuple(meta[1:]) == stamp:
+            return None
+        return stamp
+
+    def put(self, project: str, source: str, path: Path,
+            header: Optional[list], rows: List[list],
+            *, stamp: Optional[Tuple[int, int]] = None) -> None:
+        stamp = stamp or _stamp(path)
+        if stamp is None:
+            return
+        size, mtime_ns = stamp
+        if mtime_ns >= time.time_ns() - _RACY_NS:
+            mtime_ns = -1
+        width = max([len(header or [])] + [len(r) for r in rows])
+        cells = [
+            (project, source, i, j, json.dumps(v, ensure_ascii=False, default=str))
+            for i, r in enumerate(rows)
+            for j, v in enumerate(r)
+            if v is not None
+        ]
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM results WHERE project = ? AND source = ?', (project, source))
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (project, source, str(Path(path).resolve()), size, mtime_ns,
+                 json.dumps(header, ensure_ascii=False, default=str), len(rows), width))
+            self._conn.executemany(
+                'INSERT INTO results VALUES (?, ?, ?, ?, ?)', cells)
+
+    def _load(self, project: str, source: str, path: Path,
+              stamp: Tuple[int, int]) -> Optional[Sheet]:
+        meta = self._conn.execute(
+            'SELECT path, size, mtime_ns, header, n_rows, width FROM sources '
+            'WHERE project = ? AND source = ?', (project, source)).fetchone()
+        if meta is None or meta[0] != str(Path(path).resolve()) or tuple(meta[1:3]) != stamp:
+            return None
+        header = json.loads(meta[3])
+        rows = [[None] * meta[5] for _ in range(meta[4])]
+        for i, j, value in self._conn.execute(
+                'SELECT row, col, value FROM results WHERE project = ? AND source = ?',
+                (project, source)):
+            rows[i][j] = json.loads(value)
+        return header, rows
+
@@ -0,0 +1,200 @@
+import difflib
+import os
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+Opcode = Tuple[str, int, int, int, int]
+
+# Myers keeps an optimal LCS but can align ties differently from
+# SequenceMatcher, which moves diff marks and edit distances; opt in with
+# LEO_MYERS_DIFF=1 until the two agree opcode for opcode.
+MYERS_DIFF_ENV = 'LEO_MYERS_DIFF'
+
+# Past this many edit steps in one middle-snake search the O(ND) cost
+# overtakes SequenceMatcher, so that range is handed to difflib instead.
+_MAX_BISECT_D = 512
+
+
+def intern_tokens(a: Sequence[Hashable], b: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    ids: Dict[Hashable, int] = {}
+    ia = [ids.setdefault(x, len(ids)) for x in a]
+    ib = [ids.setdefault(x, len(ids)) for x in b]
+    return ia, ib
+
+
+def _bisect(a: List[int], alo: int, ahi: int,
+            b: List[int], blo: int, bhi: int) -> Optional[Tuple[int, int]]:
+    """Middle snake of a[alo:ahi] vs b[blo:bhi] (Myers 1986, section 4b).
+
+    Returns the absolute split point (x, y) of an optimal edit path,
+    (-1, -1) when the two ranges share no element, or None when the search
+    exceeds `_MAX_BISECT_D`.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    vf = [-1] * size
+    vb = [-1] * size
+    vf[offset + 1] = 0
+    vb[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    kf_start = kf_end = kb_start = kb_end = 0
+    for d in range(max_d):
+        if d > _MAX_BISECT_D:
+            return None
+        for k in range(-d + kf_start, d + 1 - kf_end, 2):
+            ko = offset + k
+            if k == -d or (k != d and vf[ko - 1] < vf[ko + 1]):
+                x = vf[ko + 1]
+            else:
+                x = vf[ko - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[ko] = x
+            if x > n:
+                kf_end += 2
+            elif y > m:
+                kf_start += 2
+            elif front:
+                kbo = offset + delta - k
+                if 0 <= kbo < size and vb[kbo] != -1 and x >= n - vb[kbo]:
+                    return alo + x, blo + y
+        for k in range(-d + kb_start, d + 1 - kb_end, 2):
+            ko = offset + k
+            if k == -d or (k != d and vb[ko - 1] < vb[ko + 1]):
+                x = vb[ko + 1]
+            else:
+                x = vb[ko - 1] + 1
+            y = x - k
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[ko] = x
+            if x > n:
+                kb_end += 2
+            elif y > m:
+                kb_start += 2
+            elif not front:
+                kfo = offset + delta - k
+                if 0 <= kfo < size and vf[kfo] != -1:
+                    xf = vf[kfo]
+                    if xf >= n - x:
+                        return alo + xf, blo + xf - (kfo - offset)
+    return -1, -1
+
+
+def myers_matching_blocks(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+    """Matching blocks of a shortest edit script, in `SequenceMatcher` format
+    (adjacent blocks merged, terminated by the `(len(a), len(b), 0)` sentinel).
+    """
+    ia, ib = intern_tokens(a, b)
+    raw: List[Tuple[int, int, int]] = []
+    stack: list = [(0, len(ia), 0, len(ib))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            raw.append(item)
+            continue
+        alo, ahi, blo, bhi = item
+        start = alo
+        while alo < ahi and blo < bhi and ia[alo] == ib[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            raw.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while ahi > alo and bhi > blo and ia[ahi - 1] == ib[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if end > ahi:
+            stack.append((ahi, bhi, end - ahi))
+        if alo == ahi or blo == bhi:
+            continue
+        split = _bisect(ia, alo, ahi, ib, blo, bhi)
+        if split is None:
+            matcher = difflib.SequenceMatcher(None, ia[alo:ahi], ib[blo:bhi], autojunk=False)
+            stack.extend(
+                (alo + i, blo + j, k)
+                for i, j, k in reversed(matcher.get_matching_blocks()) if k
+            )
+            continue
+        x, y = split
+        if x < 0:
+            continue
+        stack.append((x, ahi, y, bhi))
+        stack.append((alo, x, blo, y))
+
+    blocks: List[Tuple[int, int, int]] = []
+    for i, j, k in raw:
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            pi, pj, pk = blocks[-1]
+            blocks[-1] = (pi, pj, pk + k)
+        else:
+            blocks.append((i, j, k))
+    blocks.append((len(ia), len(ib), 0))
+    return blocks
+
+
+def _blocks_to_opcodes(blocks: List[Tuple[int, int, int]]) -> List[Opcode]:
+    i = j = 0
+    answer: List[Opcode] = []
+    for ai, bj, size in blocks:
+        if i < ai and j < bj:
+            answer.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            answer.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            answer.append(('insert', i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            answer.append(('equal', ai, i, bj, j))
+    return answer
+
+
+def myers_opcodes(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Opcode]:
+    return _blocks_to_opcodes(myers_matching_blocks(a, b))
+
+
+def edit_distance(opcodes: List[Opcode]) -> int:
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+
+
+def diff_opcodes(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Opcode]:
+    """Token opcodes for the diff consumers: `SequenceMatcher` with autojunk
+    off, or `myers_opcodes` when `MYERS_DIFF_ENV` is set to 1."""
+    if os.environ.get(MYERS_DIFF_ENV) == '1':
+        return myers_opcodes(a, b)
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+
+def check_edit_script(a: Sequence[Hashable], b: Sequence[Hashable],
+                      ops: List[Opcode]) -> int:
+    """Raise unless `ops` is a valid edit script from `a` to `b`; returns
+    the number of tokens it keeps."""
+    rebuilt: list = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in ops:
+        if (i1, j1) != (i, j):
+            raise AssertionError(f'opcodes not contiguous at {(tag, i1, i2, j1, j2)}')
+        if tag == 'equal' and list(a[i1:i2]) != list(b[j1:j2]):
+            raise AssertionError(f'equal opcode over differing tokens at {i1}/{j1}')
+        rebuilt.extend(b[j1:j2])
+        i, j = i2, j2
+    if (i, j) != (len(a), len(b)) or rebuilt != list(b):
+        raise AssertionError('opcodes do not cover both sequences')
+    return sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == 'equal')
+
+
+def check_against_difflib(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Opcode]:
+    """Parity check: `diff_opcodes` must equal `SequenceMatcher(autojunk=False)`
+    opcodes exactly. Returns the opcodes."""
+    ops = diff_opcodes(a, b)
+    check_edit_script(a, b, ops)
+    expected = difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    if ops != expected:
+        raise AssertionError(f'opcodes differ from difflib: {ops} != {expected}')
+    return ops
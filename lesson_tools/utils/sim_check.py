@@ -1,5 +1,4 @@
 import csv
-import json
 import os
 import shutil
 import sys
@@ -9,6 +8,7 @@ from pathlib import Path
 from typing import Dict, List, Set
 
 from .anonymize import classify_student_row
+from .diff_marks_io import load_diff_marks
 from .folder_utils import LANG_EXTS, code_files, find_working_remarks
 from .similarity_measures import (
     calculate_containment,
@@ -321,20 +321,26 @@ def _resolve_follow_basis(requested: str, generated: List[str]) -> str:
     return generated[0] if generated else ''
 
 
+_USAGE = 'Usage: sim_check.py <project_dir> [--follow-basis=<basis>]'
+
+
 def main() -> None:
     if len(sys.argv) < 2:
-        print('Usage: sim_check.py <project_dir> [--follow-basis=<basis>]')
+        print(_USAGE)
         sys.exit(1)
 
     follow_basis = 'auto'
     positional: List[str] = []
     for arg in sys.argv[1:]:
+        if arg in ('-h', '--help'):
+            print(_USAGE)
+            return
         if arg.startswith('--follow-basis='):
             follow_basis = arg.split('=', 1)[1].strip() or 'auto'
         else:
             positional.append(arg)
     if not positional:
-        print('Usage: sim_check.py <project_dir> [--follow-basis=<basis>]')
+        print(_USAGE)
         sys.exit(1)
 
     current_dir    = Path(positional[0]).resolve()
@@ -456,8 +462,7 @@ def main() -> None:
                 if not marks_path.is_file():
                     continue
                 try:
-                    with open(marks_path, encoding='utf-8') as fh:
-                        basis_marks_by_sid[sid] = json.load(fh)
+                    basis_marks_by_sid[sid] = load_diff_marks(marks_path)
                 except Exception:
                     continue
             if not basis_marks_by_sid:
@@ -1,5 +1,5 @@
 import csv
-from bisect import bisect_right
+from array import array
 import difflib
 import io
 import re
@@ -7,13 +7,20 @@ import zipfile
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 from .lv_constants import FINLAND_TZ
 from .lv_editor import replay_with_timestamps_all
-from languages import get_profile, comment_ranges as _profile_comment_ranges
+from languages import (
+    CODE_TOKEN_RE,
+    RangeIndex,
+    _embedded_tag_ranges,
+    get_compiled_profile,
+    comment_ranges as _profile_comment_ranges,
+)
 
-_CHAR_TOKEN_RE = re.compile(r'[a-zA-Z0-9]+|[^\s]')
+_CHAR_TOKEN_RE = CODE_TOKEN_RE
 
 def normalize_code(code: str) -> List[str]:
     return [line.strip() for line in code.split('\n') if line.strip()]
@@ -35,30 +42,66 @@ def calculate_char_histogram_similarity(lines1: List[str], lines2: List[str]) ->
     return 1.0 - total_diff / (total1 + total2)
 
 
-def token_edit_similarity(a: str, b: str) -> float:
+@lru_cache(maxsize=65536)
+def _edit_distance(a: str, b: str, limit: Optional[int] = None) -> Optional[int]:
+    """Levenshtein distance via Hyyrö's bit-parallel recurrence.
+
+    With `limit`, returns None as soon as the distance must exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(b):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, dist = full, 0, m
+    remaining = len(a)
+    for c in a:
+        eq = peq.get(c, 0)
+        x = eq | vn
+        d0 = (((x & vp) + vp) ^ vp) | x
+        hp = (vn | ~(d0 | vp)) & full
+        hn = d0 & vp
+        if hp & last:
+            dist += 1
+        elif hn & last:
+            dist -= 1
+        remaining -= 1
+        if limit is not None and dist - remaining > limit:
+            return None
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = (hn | ~(d0 | hp)) & full
+        vn = hp & d0
+    return dist
+
+
+def token_edit_similarity(a: str, b: str, min_similarity: float = 0.0) -> float:
+    """1 - Levenshtein / longer length; 0.0 for pairs below `min_similarity`."""
     a = a or ''
     b = b or ''
     if a == b:
         return 1.0
     if not a or not b:
         return 0.0
-    prev = list(range(len(b) + 1))
-    for i, ca in enumerate(a, 1):
-        cur = [i]
-        for j, cb in enumerate(b, 1):
-            cur.append(min(
-                prev[j] + 1,
-                cur[j - 1] + 1,
-                prev[j - 1] + (ca != cb),
-            ))
-        prev = cur
-    return 1.0 - prev[len(b)] / max(len(a), len(b))
+    longest = max(len(a), len(b))
+    limit = None
+    if min_similarity > 0.0:
+        limit = int((1.0 - min_similarity) * longest + 1e-9)
+        if abs(len(a) - len(b)) > limit:
+            return 0.0
+    dist = _edit_distance(a, b, limit)
+    if dist is None:
+        return 0.0
+    return 1.0 - dist / longest
 
 _FALLBACK_DETECT_RE = re.compile(r'/\*[\s\S]*?\*/|<!--[\s\S]*?-->|(?<!:)//[^\n]*')
 
 
-def _comment_ranges(text: str, ext=None) -> Tuple[List[int], List[int]]:
-    profile = get_profile(ext) if ext else None
+def _comment_ranges(text: str, ext=None, by_tag=None) -> Tuple[List[int], List[int]]:
+    profile = get_compiled_profile(ext) if ext else None
     if profile is None:
         starts: List[int] = []
         ends: List[int] = []
@@ -66,42 +109,154 @@ def _comment_ranges(text: str, ext=None) -> Tuple[List[int], List[int]]:
             starts.append(m.start())
             ends.append(m.end())
         return starts, ends
-    return _profile_comment_ranges(profile, text)
+    return _profile_comment_ranges(profile, text, by_tag=by_tag)
+
+
+_NON_NEWLINE_RE = re.compile(r'[^\n]')
+
+TOKEN_WORD = 0
+TOKEN_SYMBOL = 1
+_WORD_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+
+
+class ScannedFile:
+    """Token table for one source text.
+
+    Parallel columns `starts`, `ends`, `kinds`, `comment` (0/1) and `lang`
+    (index into `langs`, the effective file extension at each token).
+    """
+
+    __slots__ = (
+        'text', 'ext', 'starts', 'ends', 'kinds', 'comment', 'lang', 'langs',
+        'lang_ranges', 'comment_starts', 'comment_ends', '_blanked',
+    )
+
+    def __init__(self, text: str, ext, starts, ends, kinds, comment, lang,
+                 langs, lang_ranges, comment_starts, comment_ends):
+        self.text = text
+        self.ext = ext
+        self.starts = starts
+        self.ends = ends
+        self.kinds = kinds
+        self.comment = comment
+        self.lang = lang
+        self.langs = langs
+        self.lang_ranges = lang_ranges
+        self.comment_starts = comment_starts
+        self.comment_ends = comment_ends
+        self._blanked = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def token(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def lang_of(self, i: int):
+        return self.langs[self.lang[i]]
+
+    def lang_index(self) -> RangeIndex:
+        return RangeIndex.from_labelled({
+            self.langs[li]: ranges for li, ranges in self.lang_ranges.items()
+        })
+
+    def iter_code_tokens(self):
+        text = self.text
+        for s, e, c in zip(self.starts, self.ends, self.comment):
+            yield s, text[s:e], bool(c)
+
+    def split(self) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+        text = self.text
+        nc: List[Tuple[int, str]] = []
+        cm: List[Tuple[int, str]] = []
+        for s, e, c in zip(self.starts, self.ends, self.comment):
+            (cm if c else nc).append((s, text[s:e]))
+        return nc, cm
+
+    def counters(self) -> Tuple[Counter, Counter]:
+        nc, cm = self.split()
+        return Counter(tok for _, tok in nc), Counter(tok for _, tok in cm)
+
+    def tokens_by_lang(self) -> Dict[str, Counter]:
+        text = self.text
+        by_lang: Dict[str, Counter] = {}
+        for s, e, c, li in zip(self.starts, self.ends, self.comment, self.lang):
+            if not c:
+                by_lang.setdefault(self.langs[li], Counter())[text[s:e]] += 1
+        return by_lang
+
+    @property
+    def blanked(self) -> str:
+        if self._blanked is None:
+            if not self.comment_starts:
+                self._blanked = self.text
+            else:
+                text = self.text
+                parts: List[str] = []
+                prev = 0
+                for cs, ce in zip(self.comment_starts, self.comment_ends):
+                    parts.append(text[prev:cs])
+                    parts.append(_NON_NEWLINE_RE.sub(' ', text[cs:ce]))
+                    prev = ce
+                parts.append(text[prev:])
+                self._blanked = ''.join(parts)
+        return self._blanked
+
+
+
+def scan_file(text: str, ext=None) -> ScannedFile:
+    profile = get_compiled_profile(ext) if ext else None
+    file_ext = ext if isinstance(ext, str) or ext is None else ext.extensions[0]
+    by_tag = (
+        _embedded_tag_ranges(text, profile)
+        if profile is not None and profile.embedded_tags else {}
+    )
+    c_starts, c_ends = _comment_ranges(text, profile or ext, by_tag=by_tag)
+
+    langs: List = [file_ext]
+    lang_ranges: Dict[int, list] = {}
+    for tag, language in (profile.embedded_tags if profile is not None else ()):
+        lang_profile = get_compiled_profile(language)
+        if lang_profile is None or not lang_profile.extensions:
+            continue
+        lang_ext = lang_profile.extensions[0]
+        if lang_ext not in langs:
+            langs.append(lang_ext)
+        lang_ranges.setdefault(langs.index(lang_ext), []).extend(by_tag.get(tag, []))
+
+    in_comment = RangeIndex.from_starts_ends(c_starts, c_ends).sweep()
+    lang_at = RangeIndex.from_labelled(lang_ranges).sweep()
+    token_re = profile.token_re if profile is not None else _CHAR_TOKEN_RE
+    starts = array('l')
+    ends = array('l')
+    kinds = bytearray()
+    comment = bytearray()
+    lang = bytearray()
+    for m in token_re.finditer(text):
+        pos, end = m.span()
+        starts.append(pos)
+        ends.append(end)
+        kinds.append(TOKEN_WORD if text[pos] in _WORD_START else TOKEN_SYMBOL)
+        comment.append(in_comment.contains(pos))
+        lang.append(lang_at.label_at(pos, 0))
+    return ScannedFile(text, file_ext, starts, ends, kinds, comment, lang,
+                       tuple(langs), lang_ranges, c_starts, c_ends)
 
 
 def blank_comments(text: str, ext=None) -> str:
-    starts, ends = _comment_ranges(text, ext)
-    if not starts:
-        return text
-    chars = list(text)
-    for cs, ce in zip(starts, ends):
-        for i in range(cs, ce):
-            if chars[i] != '\n':
-                chars[i] = ' '
-    return ''.join(chars)
+    return scan_file(text, ext).blanked
 
 
-def _pos_in_comment(pos: int, starts: List[int], ends: List[int]) -> bool:
-    idx = bisect_right(starts, pos) - 1
-    return idx >= 0 and ends[idx] > pos
+def comment_index(text: str, ext=None) -> RangeIndex:
+    return RangeIndex.from_starts_ends(*_comment_ranges(text, ext))
 
 
 def iter_code_tokens(text: str, ext=None):
-    starts, ends = _comment_ranges(text, ext)
-    for match in _CHAR_TOKEN_RE.finditer(text):
-        pos = match.start()
-        yield pos, match.group(), _pos_in_comment(pos, starts, ends)
+    yield from scan_file(text, ext).iter_code_tokens()
 
 
 def split_code_tokens(text: str, ext=None) -> Tuple[Counter, Counter]:
-    outside: Counter = Counter()
-    inside: Counter = Counter()
-    for _, tok, is_comment in iter_code_tokens(text, ext):
-        if is_comment:
-            inside[tok] += 1
-        else:
-            outside[tok] += 1
-    return outside, inside
+    return scan_file(text, ext).counters()
 
 
 def reconstruct_tokens_from_keylog_full(
@@ -114,9 +269,20 @@ def reconstruct_tokens_from_keylog_full(
     Dict[str, str],
     Dict[str, List[Tuple[int, str]]],
 ]:
+    return reconstruct_token_inventory(events, lesson_file)[:5]
+
+
+def reconstruct_token_inventory(
+    events: List[dict],
+    lesson_file: str | None = None,
+) -> tuple:
+    """`reconstruct_tokens_from_keylog_full` plus the surviving text and,
+    per token, the start offsets of its surviving occurrences (aligned with
+    `kw_ts[tok]`).
+    """
     surviving, deleted = replay_with_timestamps_all(events)
     if not surviving and not deleted:
-        return {}, {}, {}, {}, {}
+        return {}, {}, {}, {}, {}, '', {}
 
     final_text = ''.join(c for c, _ in surviving)
     char_ts_final: List[int] = [e[1] for e in surviving]
@@ -138,6 +304,7 @@ def reconstruct_tokens_from_keylog_full(
     kw_ts_comment: Dict[str, List[int]] = {}
     upper_to_display: Dict[str, str] = {}
     occ_with_display: Dict[str, List[Tuple[int, str]]] = {}
+    offsets_by_tok: Dict[str, List[int]] = {}
 
     for m in _CHAR_TOKEN_RE.finditer(final_text):
         tok = m.group()
@@ -145,6 +312,7 @@ def reconstruct_tokens_from_keylog_full(
         ts = char_ts_final[f_end]
         is_comment = bool(comment_mask_final[f_end])
         kw_ts.setdefault(tok, []).append(ts)
+        offsets_by_tok.setdefault(tok, []).append(m.start())
         if tok not in upper_to_display:
             upper_to_display[tok] = tok
         occ_with_display.setdefault(tok, []).append((ts, tok))
@@ -185,7 +353,8 @@ def reconstruct_tokens_from_keylog_full(
         if upper not in upper_to_display:
             upper_to_display[upper] = display
 
-    return kw_ts, kw_ts_comment, removed_kw_ts, upper_to_display, occ_with_display
+    return (kw_ts, kw_ts_comment, removed_kw_ts, upper_to_display, occ_with_display,
+            final_text, offsets_by_tok)
 
 
 def calculate_containment(a: Counter, b: Counter) -> float:
@@ -193,9 +362,64 @@ def calculate_containment(a: Counter, b: Counter) -> float:
         return 0.0
     return round(sum((a & b).values()) / sum(a.values()) * 100, 1)
 
+_DAY_MS = 24 * 3600 * 1000
+# Every real-world UTC offset change falls on a quarter-hour boundary, so
+# the offset is constant within each block and one tz lookup covers it.
+_TZ_BLOCK_MS = 15 * 60 * 1000
+UNTIMED_TS = '00:00:00'
+_UNPARSED_CLOCK_MS = 4 * _DAY_MS
+
+
+@lru_cache(maxsize=None)
+def _utc_offset_ms(block: int) -> int:
+    dt = datetime.fromtimestamp(block * _TZ_BLOCK_MS / 1000, tz=FINLAND_TZ)
+    if dt.tzinfo is None:
+        dt = dt.astimezone()
+    return int(dt.utcoffset().total_seconds() * 1000)
+
+
+def local_day_ms(ts_ms: int) -> int:
+    """Epoch milliseconds -> milliseconds since local (Helsinki) midnight."""
+    ts_ms = int(ts_ms)
+    return (ts_ms + _utc_offset_ms(ts_ms // _TZ_BLOCK_MS)) % _DAY_MS
+
+
+def format_day_ms(day_ms: int) -> str:
+    secs, ms = divmod(day_ms % _DAY_MS, 1000)
+    return f'{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}.{ms:03d}'
+
+
+@lru_cache(maxsize=1 << 16)
 def ts_to_local(ts_ms: int) -> str:
-    dt = datetime.fromtimestamp(ts_ms / 1000, tz=FINLAND_TZ)
-    return dt.strftime('%H:%M:%S') + f'.{dt.microsecond // 1000:03d}'
+    return format_day_ms(local_day_ms(ts_ms))
+
+
+@lru_cache(maxsize=1 << 16)
+def local_ts_ms(ts_str: str) -> Optional[int]:
+    """Inverse of `ts_to_local` for `HH:MM:SS[.mmm]`; None if unparseable."""
+    try:
+        hh, mm, rest = ts_str.split(':')
+        ss, _, ms_str = rest.partition('.')
+        return ((int(hh) * 60 + int(mm)) * 60 + int(ss)) * 1000 + (int(ms_str) if ms_str else 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+def clock_sort_key(ts_str: str, origin_ms: Optional[int] = None) -> int:
+    """Sort key for a local time string within one lesson.
+
+    Times earlier than `origin_ms` (the lesson's first timestamp) are taken
+    to be past midnight. The `UNTIMED_TS` placeholder sorts first and
+    unparseable strings last.
+    """
+    if ts_str == UNTIMED_TS:
+        return 0
+    ms = local_ts_ms(ts_str)
+    if ms is None:
+        return _UNPARSED_CLOCK_MS
+    if origin_ms is not None and ms < origin_ms:
+        ms += _DAY_MS
+    return ms
 
 
 _SIZEWITHCELLS_RE = re.compile(r'<[^>]*:SizeWithCells\s*/>|<SizeWithCells\s*/>')
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import pickle
+import re
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys as _sys
+_sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from languages import RangeIndex, profiles_version
+
+from .similarity_measures import ScannedFile, scan_file
+
+
+DISK_CACHE_ENV = 'LEO_TOKEN_CACHE_DIR'
+_LRU_SIZE = 256
+_DISK_FORMAT = 1
+
+_ASTRAL_RE = re.compile('[\U00010000-\U0010FFFF]')
+
+_lru: 'OrderedDict[tuple, TokenizedFile]' = OrderedDict()
+_utf16_lru: 'OrderedDict[str, Utf16Map]' = OrderedDict()
+_disk_dir: Optional[Path] = None
+_disk_dir_set = False
+
+
+class TokenizedFile:
+    """Cached lexical view of one source text; derived tables are built lazily.
+
+    Instances are shared between callers, so the returned lists and dicts
+    must be treated as read-only.
+    """
+
+    __slots__ = ('key', 'scan', '_split', '_positions', '_counters',
+                 '_lang_index', '_utf16')
+
+    def __init__(self, key: tuple, scan: ScannedFile):
+        self.key = key
+        self.scan = scan
+        self._split = None
+        self._positions = None
+        self._counters = None
+        self._lang_index = None
+        self._utf16 = False
+
+    def __len__(self) -> int:
+        return len(self.scan)
+
+    @property
+    def text(self) -> str:
+        return self.scan.text
+
+    @property
+    def ext(self):
+        return self.scan.ext
+
+    def split(self) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+        if self._split is None:
+            self._split = self.scan.split()
+        return self._split
+
+    def counters(self) -> Tuple[Counter, Counter]:
+        if self._counters is None:
+            nc, cm = self.split()
+            self._counters = (Counter(tok for _, tok in nc),
+                              Counter(tok for _, tok in cm))
+        return self._counters
+
+    def positions_by_token(self) -> Dict[str, List[Tuple[int, bool]]]:
+        if self._positions is None:
+            positions: Dict[str, List[Tuple[int, bool]]] = {}
+            for pos, tok, is_comment in self.scan.iter_code_tokens():
+                positions.setdefault(tok, []).append((pos, is_comment))
+            self._positions = positions
+        return self._positions
+
+    def lang_index(self) -> RangeIndex:
+        if self._lang_index is None:
+            self._lang_index = self.scan.lang_index()
+        return self._lang_index
+
+    def utf16_map(self) -> Optional['Utf16Map']:
+        """Code point -> UTF-16 offset map, or None when the text is all BMP."""
+        if self._utf16 is False:
+            self._utf16 = utf16_map(self.text)
+        return self._utf16
+
+
+class Utf16Map:
+    """Code point -> UTF-16 offset map stored as the sorted positions of
+    astral characters; offset(i) = i + number of astral characters before i.
+
+    Indexes like the dense list it replaces (length is code points + 1).
+    """
+
+    __slots__ = ('astral', '_n')
+
+    def __init__(self, astral: List[int], n_code_points: int):
+        self.astral = astral
+        self._n = n_code_points + 1
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, pos: int) -> int:
+        if pos < 0:
+            pos += self._n
+        if not 0 <= pos < self._n:
+            raise IndexError('Utf16Map index out of range')
+        return pos + bisect_left(self.astral, pos)
+
+
+def _build_utf16_map(text: str) -> Utf16Map:
+    return Utf16Map([m.start() for m in _ASTRAL_RE.finditer(text)], len(text))
+
+
+def utf16_map(text: str) -> Optional[Utf16Map]:
+    """UTF-16 offset map for `text`, or None when it has no astral characters.
+
+    ASCII text short-circuits; other maps are cached by content hash without
+    tokenising the text.
+    """
+    if text.isascii() or not _ASTRAL_RE.search(text):
+        return None
+    key = _content_hash(text)
+    hit = _utf16_lru.get(key)
+    if hit is not None:
+        _utf16_lru.move_to_end(key)
+        return hit
+    u16map = _build_utf16_map(text)
+    _utf16_lru[key] = u16map
+    if len(_utf16_lru) > _LRU_SIZE:
+        _utf16_lru.popitem(last=False)
+    return u16map
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.blake2b(
+        text.encode('utf-8', 'surrogatepass'), digest_size=16,
+    ).hexdigest()
+
+
+def set_disk_cache_dir(directory) -> None:
+    global _disk_dir, _disk_dir_set
+    _disk_dir = Path(directory) if directory else None
+    _disk_dir_set = True
+
+
+def _get_disk_dir() -> Optional[Path]:
+    if not _disk_dir_set:
+        set_disk_cache_dir(os.environ.get(DISK_CACHE_ENV) or None)
+    return _disk_dir
+
+
+def _disk_path(key: tuple) -> Optional[Path]:
+    root = _get_disk_dir()
+    if root is None:
+        return None
+    digest, ext, version = key
+    ext_part = (ext or 'none').lstrip('.') or 'none'
+    return root / digest[:2] / f'{digest}-{ext_part}-{version}.pkl'
+
+
+def _disk_load(key: tuple, text: str) -> Optional[ScannedFile]:
+    path = _disk_path(key)
+    if path is None or not path.is_file():
+        return None
+    try:
+        with open(path, 'rb') as f:
+            fmt, scan = pickle.load(f)
+    except Exception:
+        return None
+    if fmt != _DISK_FORMAT or not isinstance(scan, ScannedFile) or scan.text != text:
+        return None
+    return scan
+
+
+def _disk_store(key: tuple, scan: ScannedFile) -> None:
+    path = _disk_path(key)
+    if path is None:
+        return
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump((_DISK_FORMAT, scan), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def tokenize(text: str, ext: Optional[str] = None) -> TokenizedFile:
+    ext_key = ext.lower() if ext else None
+    key = (_content_hash(text), ext_key, profiles_version())
+    hit = _lru.get(key)
+    if hit is not None:
+        _lru.move_to_end(key)
+        return hit
+    scan = _disk_load(key, text)
+    if scan is None:
+        scan = scan_file(text, ext_key)
+        _disk_store(key, scan)
+    entry = TokenizedFile(key, scan)
+    _lru[key] = entry
+    if len(_lru) > _LRU_SIZE:
+        _lru.popitem(last=False)
+    return entry
+
+
+def clear_cache() -> None:
+    _lru.clear()
+    _utf16_lru.clear()
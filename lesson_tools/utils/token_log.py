@@ -14,13 +14,16 @@ from .similarity_measures import (
     ts_to_local,
 )
 
+from .git_line_diff import git_diff_hunks
+from .seq_diff import diff_opcodes
+from .token_cache import Utf16Map, tokenize, utf16_map
+
 from .token_log_leo import (
     _CONTEXT_K,
     _CONTEXT_MATCH_THRESHOLD,
     _SWAP_TOKEN_SIM_WEIGHT,
     _build_stripped_view,
     _build_teacher_seq_aug,
-    _build_utf16_map,
     _collect_occurrences,
     _collect_teacher_ghosts,
     _colors_to_position_marks,
@@ -51,6 +54,7 @@ from .token_log_marks import (
     _make_line_mark,
     _match_files_by_name_then_ext,
     _missing_mark,
+    _overlay_diff_marks,
     _read_text_normalized,
     _split_tokens_by_comment,
     _strip_internal_fields,
@@ -65,7 +69,6 @@ from .token_log_curated import (
 
 from .token_log_starpass import (
     _apply_star_post_pass,
-    _add_seconds_to_hms,
     _apply_ghost_extra_promotion,
     _apply_insert_at_to_unpaired_missings,
     _apply_swap_pairing_to_marks,
@@ -77,9 +80,17 @@ from .token_log_starpass import (
     _refresh_missing_timestamps,
     _ttt_pos_index,
     _upgrade_secprefix,
+    StarPassTeacherCache,
+    teacher_cache_for,
 )
 
 from .folder_utils import CODE_EXTS
+from .token_table import (
+    TeacherTokenTable,
+    _build_file_timeline,
+    _file_at_ts,
+    table_path_for,
+)
 
 
 def _remap_marks_to_utf16(
@@ -87,23 +98,23 @@ def _remap_marks_to_utf16(
     teacher_files: Dict[str, Path],
     student_files: Dict[str, Path],
 ) -> dict:
-    _maps: Dict[Tuple[int, str], Optional[List[int]]] = {}
+    _maps: Dict[Tuple[int, str], Optional[Utf16Map]] = {}
 
-    def _map_for(files: Dict[str, Path], fname: Optional[str]) -> Optional[List[int]]:
+    def _map_for(files: Dict[str, Path], fname: Optional[str]) -> Optional[Utf16Map]:
         if fname is None:
             return None
         cache_key = (id(files), fname)
         if cache_key in _maps:
             return _maps[cache_key]
-        u16map: Optional[List[int]] = None
+        u16map: Optional[Utf16Map] = None
         path = (files or {}).get(fname)
         if path is not None:
             try:
                 text = _read_text_normalized(path)
             except Exception:
                 text = ''
-            if text and any(ord(c) > 0xFFFF for c in text):
-                u16map = _build_utf16_map(text)
+            if text:
+                u16map = utf16_map(text)
         _maps[cache_key] = u16map
         return u16map
 
@@ -145,32 +156,6 @@ def _remap_marks_to_utf16(
     return diff_marks
 
 
-def _build_file_timeline(events: list) -> list:
-    timeline = [(0, "MAIN")]
-    for event in events:
-        ts = event.get("timestamp", 0)
-        if "move_to" in event:
-            target = event["move_to"]
-            if target in ("DEV", "dev"):
-                pass
-            elif target in ("MAIN", "main"):
-                timeline.append((ts, "MAIN"))
-            elif any(target.lower().endswith(ext) for ext in CODE_EXTS):
-                timeline.append((ts, target))
-        elif "switch_editor" in event and event["switch_editor"] not in ("dev", "DEV"):
-            timeline.append((ts, "MAIN"))
-    return sorted(timeline)
-
-
-def _file_at_ts(ts: int, timeline: list) -> str:
-    idx = bisect.bisect_right(timeline, (ts, "\xff")) - 1
-    return timeline[max(0, idx)][1]
-
-
-
-
-
-
 _TOKEN_FILE_HEADER_KEYS = ('Occurrences', 'Removed', 'Unique')
 
 
@@ -178,46 +163,27 @@ def _write_teacher_tokens_file(
     events: list,
     out_path: Path,
     lesson_file: str | None = None,
+    side_table: bool = True,
 ) -> Tuple[int, int, int]:
-    kw_ts, kw_ts_comment, removed_kw_ts, upper_to_display, occ_with_display = (
-        reconstruct_tokens_from_keylog_full(events, lesson_file=lesson_file)
-    )
+    table = TeacherTokenTable.from_events(events, lesson_file=lesson_file)
+    table.write_text(out_path)
+    if side_table:
+        table.save(table_path_for(out_path), source=out_path)
+    return table.counts()
+
+
+def _load_teacher_table(tokens_path: Path) -> Optional[TeacherTokenTable]:
+    return TeacherTokenTable.load(table_path_for(tokens_path), source=tokens_path)
 
-    all_occ: List[Tuple[int, int, str, bool, bool]] = []
-    for tok in kw_ts:
-        occ_sorted = sorted(occ_with_display.get(tok, []))
-        comment_ts_set = set(kw_ts_comment.get(tok, []))
-        for ts, disp in occ_sorted:
-            all_occ.append((ts, 0, disp, ts in comment_ts_set, False))
-    for tok, ts_list in removed_kw_ts.items():
-        disp = upper_to_display.get(tok, tok)
-        for ins_ts, del_ts in ts_list:
-            all_occ.append((ins_ts, del_ts, disp, False, True))
-    all_occ.sort(key=lambda x: x[0])
-
-    n_typed   = sum(1 for *_, is_removed in all_occ if not is_removed)
-    n_removed = sum(1 for *_, is_removed in all_occ if is_removed)
-    n_unique  = len(kw_ts)
-
-    file_timeline   = _build_file_timeline(events)
-    has_multi_files = bool({f for _, f in file_timeline} - {"MAIN"})
-
-    with open(out_path, 'w', encoding='utf-8') as fh:
-        fh.write(f'# Occurrences: {n_typed}\n')
-        fh.write(f'# Removed    : {n_removed}\n')
-        fh.write(f'# Unique     : {n_unique}\n')
-        for ins_ts, del_ts, token, is_comment, is_removed in all_occ:
-            flags: List[str] = []
-            if is_comment:
-                flags.append('COMMENT')
-            if is_removed:
-                flags.append('REMOVED')
-            file_col    = f'\t{_file_at_ts(ins_ts, file_timeline)}' if has_multi_files else ''
-            removal_col = f'\t{ts_to_local(del_ts)}' if is_removed else ''
-            flag_col    = ('\t' + '\t'.join(flags)) if flags else ''
-            fh.write(f'{token}\t{ts_to_local(ins_ts)}{file_col}{flag_col}{removal_col}\n')
 
-    return n_typed, n_removed, n_unique
+def _load_teacher_entries(tokens_path: Path) -> list:
+    """Teacher entries from the binary side table when it is current for
+    `tokens_path`, otherwise parsed from the text file.
+    """
+    table = _load_teacher_table(tokens_path)
+    if table is not None:
+        return table.entries()
+    return _parse_teacher_tokens(tokens_path)
 
 
 def _parse_teacher_tokens(
@@ -264,7 +230,7 @@ def _build_leo_diff_marks(
     context_k: int = _CONTEXT_K,
     events: Optional[list] = None,
 ) -> Tuple[dict, dict, Optional[float], dict, dict, int, dict]:
-    teacher_ghosts = _collect_teacher_ghosts(events) if events else None
+    teacher_ghosts = teacher_cache_for(events).teacher_ghosts() if events else None
     teacher_colors, student_colors, n_total, n_missing, assignments = (
         _compute_per_token_matching(
             teacher_files, student_files, context_k,
@@ -523,7 +489,7 @@ def _finalize_per_file_diff(per_file_results, n_total
 
 
 def _lcs_opcodes(a: List[str], b: List[str]):
-    return difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    return diff_opcodes(a, b)
 
 
 def _build_token_seq_diff_marks(
@@ -696,8 +662,18 @@ def _parse_git_hunks(stdout: str) -> List[Tuple[int, int, int, int]]:
     return hunks
 
 
+_GIT_SUBPROCESS_ENV = 'LEO_GIT_DIFF_SUBPROCESS'
+
+
 def _git_diff_hunks_text(t_text: str, s_text: str,
                           ext: Optional[str] = None) -> List[Tuple[int, int, int, int]]:
+    if _os.environ.get(_GIT_SUBPROCESS_ENV) == '1':
+        return _git_diff_hunks_subprocess(t_text, s_text, ext)
+    return git_diff_hunks(t_text, s_text)
+
+
+def _git_diff_hunks_subprocess(t_text: str, s_text: str,
+                               ext: Optional[str] = None) -> List[Tuple[int, int, int, int]]:
     suffix = ext or ''
     t_fd, t_path_str = _tempfile.mkstemp(suffix=suffix, prefix='git_diff_t_')
     s_fd, s_path_str = _tempfile.mkstemp(suffix=suffix, prefix='git_diff_s_')
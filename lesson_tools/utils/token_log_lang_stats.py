@@ -4,12 +4,16 @@ from typing import Dict, List, Optional, Tuple
 import sys as _sys
 _sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from .token_log import _read_text_normalized, _split_tokens_by_comment, _ttt_pos_index
-from .similarity_measures import token_edit_similarity
+from languages import RangeIndex
+
+from .token_log import _read_text_normalized, _ttt_pos_index
+from .similarity_measures import UNTIMED_TS, clock_sort_key, local_ts_ms, token_edit_similarity
+from .token_cache import tokenize
 
 
 _LANG_EXT_LABEL = (('.html', 'HTML'), ('.css', 'CSS'), ('.js', 'JS'), ('.py', 'Py'))
 _EMBEDDED_LANG_TO_EXT = {'javascript': '.js', 'css': '.css'}
+_NO_RANGES = RangeIndex()
 
 
 def _ext_of(fname: str) -> Optional[str]:
@@ -23,29 +27,33 @@ def _ext_of(fname: str) -> Optional[str]:
 def _embedded_lang_ranges_for(text: str, file_ext: Optional[str]) -> Dict[str, List[Tuple[int, int]]]:
     if not file_ext or file_ext.lower() not in ('.html', '.htm'):
         return {}
-    from languages import get_profile
+    from languages import get_compiled_profile
     from languages import _embedded_tag_ranges
-    profile = get_profile(file_ext)
-    if profile is None or not profile.get('embeddedTags'):
+    profile = get_compiled_profile(file_ext)
+    if profile is None or not profile.embedded_tags:
         return {}
     by_tag = _embedded_tag_ranges(text, profile)
     out: Dict[str, List[Tuple[int, int]]] = {}
-    for entry in profile.get('embeddedTags', []) or []:
-        ext = _EMBEDDED_LANG_TO_EXT.get(entry.get('language', ''))
+    for tag, language in profile.embedded_tags:
+        ext = _EMBEDDED_LANG_TO_EXT.get(language)
         if ext is None:
             continue
-        ranges = by_tag.get(entry['tag'], [])
+        ranges = by_tag.get(tag, [])
         if ranges:
             out.setdefault(ext, []).extend(ranges)
     return out
 
 
-def _effective_ext_at(pos: int, file_ext: str, ranges_by_ext: Dict[str, List[Tuple[int, int]]]) -> str:
-    for ext, ranges in (ranges_by_ext or {}).items():
-        for lo, hi in ranges:
-            if lo <= pos < hi:
-                return ext
-    return file_ext
+def _embedded_lang_index_for(text: str, file_ext: Optional[str]) -> RangeIndex:
+    if not file_ext or file_ext.lower() not in ('.html', '.htm'):
+        return _NO_RANGES
+    return tokenize(text, file_ext).lang_index()
+
+
+def _effective_ext_at(pos: int, file_ext: str, ranges) -> str:
+    if not isinstance(ranges, RangeIndex):
+        ranges = RangeIndex.from_labelled(ranges or {})
+    return ranges.label_at(pos, file_ext)
 
 
 def _per_language_follow_stats(
@@ -86,6 +94,10 @@ def _per_language_follow_stats(
                 return (fname, bp)
         return None
 
+    origin_ms = (
+        local_ts_ms(teacher_entries[0][1])
+        if teacher_entries and len(teacher_entries[0]) > 1 else None
+    )
     missing_ts_pool: Dict[str, List[str]] = {}
     for entry in teacher_entries or []:
         tok = entry[0] if len(entry) > 0 else ''
@@ -112,7 +124,7 @@ def _per_language_follow_stats(
         pool = missing_ts_pool.get(tok)
         if pool:
             return pool.pop(0)
-        return '00:00:00'
+        return UNTIMED_TS
 
     removal_pool: Dict[str, List[str]] = {
         tok: list(lst) for tok, lst in (removal_ts_by_token or {}).items()
@@ -132,34 +144,39 @@ def _per_language_follow_stats(
         pool = removal_pool.get(tok)
         if pool:
             return pool.pop(0)
-        return '00:00:00'
+        return UNTIMED_TS
 
-    def _load(files: Dict[str, Path]):
+    def _load_texts(files: Dict[str, Path]) -> Dict[str, str]:
         texts: Dict[str, str] = {}
-        ranges: Dict[str, dict] = {}
         for fname, p in (files or {}).items():
             if _ext_of(fname) is None:
                 continue
             try:
-                text = _read_text_normalized(p)
+                texts[fname] = _read_text_normalized(p)
             except Exception:
                 continue
-            texts[fname] = text
-            ranges[fname] = _embedded_lang_ranges_for(text, _ext_of(fname))
-        return texts, ranges
+        return texts
 
-    teacher_texts, teacher_ranges = _load(teacher_files)
-    student_texts, student_ranges = _load(student_files)
+    teacher_tokenized = {
+        fname: tokenize(text, _ext_of(fname))
+        for fname, text in _load_texts(teacher_files).items()
+    }
+    teacher_ranges: Dict[str, RangeIndex] = {
+        fname: tf.lang_index() for fname, tf in teacher_tokenized.items()
+    }
+    student_ranges: Dict[str, RangeIndex] = {
+        fname: _embedded_lang_index_for(text, _ext_of(fname))
+        for fname, text in _load_texts(student_files).items()
+    }
 
     totals: Dict[str, int] = {ext: 0 for ext, _ in _LANG_EXT_LABEL}
     per_file_nc: Dict[str, list] = {}
-    for fname, text in teacher_texts.items():
-        file_ext = _ext_of(fname)
-        ranges = teacher_ranges.get(fname, {})
-        nc, _cm = _split_tokens_by_comment(text, file_ext)
-        per_file_nc[fname] = list(nc)
-        for pos, _tok in nc:
-            totals[_effective_ext_at(pos, file_ext, ranges)] += 1
+    for fname, tf in teacher_tokenized.items():
+        per_file_nc[fname] = tf.split()[0]
+        scan = tf.scan
+        for is_comment, li in zip(scan.comment, scan.lang):
+            if not is_comment:
+                totals[scan.langs[li]] += 1
 
     missing_files = set(diff_marks.get('missing_files') or [])
     n_missing: Dict[str, int] = {ext: 0 for ext, _ in _LANG_EXT_LABEL}
@@ -170,9 +187,9 @@ def _per_language_follow_stats(
 
     def _add_whole_file_missing(fname: str, file_ext: str) -> None:
         nc = per_file_nc.get(fname) or []
-        ranges = teacher_ranges.get(fname, {})
+        lang_at = teacher_ranges.get(fname, _NO_RANGES).sweep()
         for pos, _tok in nc:
-            n_missing[_effective_ext_at(pos, file_ext, ranges)] += 1
+            n_missing[lang_at.label_at(pos, file_ext)] += 1
         if nc:
             items_by_ext[file_ext].append(
                 ('99:99:99', f'(whole file missing: {fname} — {len(nc)} tokens)', '')
@@ -188,7 +205,7 @@ def _per_language_follow_stats(
             _add_whole_file_missing(fname, file_ext)
             counted_missing_for.add(fname)
         else:
-            ranges = teacher_ranges.get(fname, {})
+            ranges = teacher_ranges.get(fname, _NO_RANGES)
             for m in missing_marks:
                 pos = m.get('start', 0)
                 eff_ext = _effective_ext_at(pos, file_ext, ranges)
@@ -212,7 +229,7 @@ def _per_language_follow_stats(
         file_ext = _ext_of(fname)
         if file_ext is None:
             continue
-        ranges = student_ranges.get(fname, {})
+        ranges = student_ranges.get(fname, _NO_RANGES)
         for m in marks or []:
             pos = m.get('start', 0)
             eff_ext = _effective_ext_at(pos, file_ext, ranges)
@@ -224,7 +241,7 @@ def _per_language_follow_stats(
                     t_fname, t_pos = ghost_final
                     t_file_ext = _ext_of(t_fname)
                     if t_file_ext:
-                        t_ranges = teacher_ranges.get(t_fname, {})
+                        t_ranges = teacher_ranges.get(t_fname, _NO_RANGES)
                         ge_ext = _effective_ext_at(t_pos, t_file_ext, t_ranges)
                 if ge_ext is None:
                     ge_ext = eff_ext
@@ -246,7 +263,10 @@ def _per_language_follow_stats(
             continue
         deduction = n_missing[ext] + n_ghost_extra[ext] + n_extra_unpaired[ext]
         score = round(max(0.0, (total - deduction) / total * 100), 1)
-        sorted_items = sorted(items_by_ext[ext], key=lambda x: (x[0], x[1]))
+        sorted_items = sorted(
+            items_by_ext[ext],
+            key=lambda x: (clock_sort_key(x[0], origin_ms), x[0], x[1]),
+        )
         items_text = [
             (s if ts == '99:99:99' else f'{s} ({ts})') + suffix
             for ts, s, suffix in sorted_items
@@ -1,14 +1,12 @@
 import contextlib
 import math
+import os
 from collections import Counter
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-import numpy as np
-from scipy.optimize import linear_sum_assignment
-
-from . import similarity_measures as _sm
 from .lv_editor import reconstruct_all_with_ghosts
+from .token_cache import Utf16Map, tokenize, utf16_map
 from .token_log_marks import iter_ghost_tokens
 
 
@@ -21,6 +19,15 @@ _LEO_PLUS_TAU = 0.65
 _DECAY = 1.0
 _REAL_MATCH_TAU = None
 
+# The sparse path is approximate (total score within a fraction of a percent
+# of the dense assignment), so the exact dense Hungarian stays the default;
+# set this to 1 to use sparse top-k matching for large tokens.
+SPARSE_MATCHING_ENV = 'LEO_SPARSE_MATCHING'
+_SPARSE_MIN_CELLS = 256 * 256
+_SPARSE_TOP_K = 32
+_SPARSE_BAND = 8
+_SPARSE_BLOCK_ROWS = 512
+
 
 @contextlib.contextmanager
 def leo_plus_config():
@@ -34,10 +41,7 @@ def leo_plus_config():
 
 
 def _scan_file_tokens(text: str, ext=None) -> Dict[str, List[Tuple[int, bool]]]:
-    result: Dict[str, List[Tuple[int, bool]]] = {}
-    for pos, tok, is_comment in _sm.iter_code_tokens(text, ext):
-        result.setdefault(tok, []).append((pos, is_comment))
-    return result
+    return tokenize(text, ext).positions_by_token()
 
 
 def _build_stripped_view(
@@ -153,10 +157,134 @@ def _hungarian_max(weights: List[List[float]]) -> List[Tuple[int, int]]:
     if m == 1:
         i = max(range(n), key=lambda r: weights[r][0])
         return [(i, 0)]
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
     rows, cols = linear_sum_assignment(-np.array(weights))
     return list(zip(rows.tolist(), cols.tolist()))
 
 
+class _SparseRow:
+    __slots__ = ('scores', 'n')
+
+    def __init__(self, scores: Dict[int, float], n: int):
+        self.scores = scores
+        self.n = n
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, j: int) -> float:
+        return self.scores.get(j, 0.0)
+
+
+def _packs_to_unit_rows(packs: List[Optional[tuple]], vocab: Dict[str, int]):
+    lefts, rights = ([], [], []), ([], [], [])
+    for r, pack in enumerate(packs):
+        if pack is None:
+            continue
+        left, right, n_l, n_r = pack
+        for vec, norm, (rows, cols, vals) in ((left, n_l, lefts), (right, n_r, rights)):
+            if not norm:
+                continue
+            for tok, w in vec.items():
+                rows.append(r)
+                cols.append(vocab.setdefault(tok, len(vocab)))
+                vals.append(w / norm)
+    return lefts, rights
+
+
+def _approx_scores(s_packs, t_packs, t_alt_packs) -> 'np.ndarray':
+    """Vectorised context scores; only used to pick sparse candidates."""
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    vocab: Dict[str, int] = {}
+    s_rows = _packs_to_unit_rows(s_packs, vocab)
+    t_rows = _packs_to_unit_rows(t_packs, vocab)
+    alt_rows = _packs_to_unit_rows(t_alt_packs, vocab) if t_alt_packs else None
+    shape_s = (len(s_packs), max(len(vocab), 1))
+    shape_t = (len(t_packs), max(len(vocab), 1))
+
+    def _mat(triple, shape):
+        rows, cols, vals = triple
+        return csr_matrix((vals, (rows, cols)), shape=shape)
+
+    def _combined(s_pair, t_pair):
+        cos_l = (_mat(s_pair[0], shape_s) @ _mat(t_pair[0], shape_t).T).toarray()
+        cos_r = (_mat(s_pair[1], shape_s) @ _mat(t_pair[1], shape_t).T).toarray()
+        return 0.3 * np.minimum(cos_l, cos_r) + 0.7 * np.maximum(cos_l, cos_r)
+
+    scores = _combined(s_rows, t_rows)
+    if alt_rows is not None:
+        np.maximum(scores, _combined(s_rows, alt_rows), out=scores)
+    return scores
+
+
+def _sparse_candidates(s_packs, t_packs, t_alt_packs) -> List[set]:
+    import numpy as np
+    n_s, n_t = len(s_packs), len(t_packs)
+    cand: List[set] = [set() for _ in range(n_s)]
+    top_k = min(_SPARSE_TOP_K, n_t)
+    col_best: List[List[Tuple[float, int]]] = [[] for _ in range(n_t)]
+    for lo in range(0, n_s, _SPARSE_BLOCK_ROWS):
+        hi = min(n_s, lo + _SPARSE_BLOCK_ROWS)
+        block = _approx_scores(s_packs[lo:hi], t_packs, t_alt_packs)
+        top = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+        for r, cols in enumerate(top.tolist()):
+            cand[lo + r].update(cols)
+        k_rows = min(_SPARSE_TOP_K, hi - lo)
+        col_top = np.argpartition(-block, k_rows - 1, axis=0)[:k_rows, :]
+        for j in range(n_t):
+            for r in col_top[:, j].tolist():
+                col_best[j].append((block[r, j], lo + r))
+    for j, best in enumerate(col_best):
+        best.sort(key=lambda x: (-x[0], x[1]))
+        for _score, i in best[:_SPARSE_TOP_K]:
+            cand[i].add(j)
+    n_lo, n_hi = min(n_s, n_t), max(n_s, n_t)
+    for a in range(n_lo):
+        b = a * n_hi // n_lo
+        for d in range(-_SPARSE_BAND, _SPARSE_BAND + 1):
+            if 0 <= b + d < n_hi:
+                i, j = (a, b + d) if n_s <= n_t else (b + d, a)
+                cand[i].add(j)
+    return cand
+
+
+def _locate_token_sparse(
+    s_packs: List[tuple],
+    t_packs: List[tuple],
+    t_alt_packs: Optional[List[Optional[tuple]]],
+) -> Optional[Tuple[List[Tuple[int, int]], List[_SparseRow]]]:
+    n_s, n_t = len(s_packs), len(t_packs)
+    rows: List[int] = []
+    cols: List[int] = []
+    weights: List[float] = []
+    sim: List[_SparseRow] = []
+    for i, js in enumerate(_sparse_candidates(s_packs, t_packs, t_alt_packs)):
+        scores: Dict[int, float] = {}
+        for j in sorted(js):
+            score = _combined_context_score(s_packs[i], t_packs[j])
+            if t_alt_packs is not None and t_alt_packs[j] is not None:
+                score = max(score, _combined_context_score(s_packs[i], t_alt_packs[j]))
+            scores[j] = score
+            rows.append(i)
+            cols.append(j)
+            weights.append(2.0 - score)
+        sim.append(_SparseRow(scores, n_t))
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+    biadj = csr_matrix((weights, (rows, cols)), shape=(n_s, n_t))
+    try:
+        if n_s <= n_t:
+            r_idx, c_idx = min_weight_full_bipartite_matching(biadj)
+        else:
+            c_idx, r_idx = min_weight_full_bipartite_matching(biadj.T.tocsr())
+    except ValueError:
+        return None
+    pairs = sorted(zip(r_idx.tolist(), c_idx.tolist()))
+    return pairs, sim
+
+
 def _collect_teacher_ghosts(events: list) -> Dict[str, list]:
     if not events:
         return {}
@@ -181,9 +309,11 @@ def _pairwise_context_sim(
     """Return the |s|×|t| matrix of combined-context cosine scores.
 
     Single source of truth for "build context packs from positions and
-    score every pair." Used by `_locate_token` (LEO base Hungarian),
-    `_apply_ghost_extra_promotion` (post-pass Hungarian), and
-    `_apply_swap_pairing_to_marks` (greedy swap matcher).
+    score every pair." Used by `_locate_token` (LEO base Hungarian) when
+    the dense path applies — with `SPARSE_MATCHING_ENV` set and above
+    `_SPARSE_MIN_CELLS` it scores only the sparse candidates instead — and by `_apply_ghost_extra_promotion`
+    (post-pass Hungarian). The swap matcher scores its own candidates
+    from `_shared_context_candidates`.
 
     `t_alt_packs[j]` (optional, len = |t|) is a second pack for teacher
     column j; when present and non-None the per-cell score is the max
@@ -221,7 +351,17 @@ def _locate_token(
     k: int,
     *,
     t_alt_packs: Optional[List[Optional[tuple]]] = None,
-) -> Tuple[List[Tuple[int, int]], List[List[float]]]:
+) -> Tuple[List[Tuple[int, int]], list]:
+    if (os.environ.get(SPARSE_MATCHING_ENV) == '1'
+            and len(s_positions) * len(t_positions) >= _SPARSE_MIN_CELLS
+            and min(len(s_positions), len(t_positions)) > 1):
+        located = _locate_token_sparse(
+            [_context_vector_pack(s_seq, p, k) for p in s_positions],
+            [_context_vector_pack(t_seq, p, k) for p in t_positions],
+            t_alt_packs,
+        )
+        if located is not None:
+            return located
     sim = _pairwise_context_sim(s_seq, s_positions, t_seq, t_positions, k,
                                 t_alt_packs=t_alt_packs)
     if not sim:
@@ -552,16 +692,6 @@ def _build_teacher_seq_aug(
     return aug_seq, seq_idx_to_aug, ghost_instances
 
 
-def _build_utf16_map(text: str) -> List[int]:
-    u16map = []
-    u16 = 0
-    for ch in text:
-        u16map.append(u16)
-        u16 += 2 if ord(ch) > 0xFFFF else 1
-    u16map.append(u16)
-    return u16map
-
-
 def _colors_to_position_marks(
     files_by_ext: dict,
     colors_map: dict,
@@ -573,14 +703,15 @@ def _colors_to_position_marks(
         return {}
     occs, _counts = _collect_occurrences(files_by_ext, token_keys)
 
-    file_u16maps: Dict[str, List[int]] = {}
+    file_u16maps: Dict[str, Utf16Map] = {}
     for _name, path in files_by_ext.items():
         try:
             text = path.read_text(encoding='utf-8', errors='ignore')
         except Exception:
             continue
-        if any(ord(c) > 0xFFFF for c in text):
-            file_u16maps[path.name] = _build_utf16_map(text)
+        u16map = utf16_map(text)
+        if u16map:
+            file_u16maps[path.name] = u16map
 
     result: Dict[str, List[dict]] = {}
     global_tok_idx: Counter = Counter()
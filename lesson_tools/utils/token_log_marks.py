@@ -4,7 +4,8 @@ from pathlib import Path
 from typing import Dict, Iterator, List, Optional, Tuple
 
 from . import similarity_measures as _sm
-from .similarity_measures import ts_to_local
+from .similarity_measures import UNTIMED_TS, clock_sort_key, local_ts_ms, ts_to_local
+from .token_cache import tokenize
 
 
 def iter_ghost_tokens(
@@ -136,22 +137,17 @@ def _split_tokens_by_comment(
 ) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
     if not text:
         return [], []
-    nc: List[Tuple[int, str]] = []
-    cm: List[Tuple[int, str]] = []
-    for pos, tok, is_comment in _sm.iter_code_tokens(text, ext):
-        (cm if is_comment else nc).append((pos, tok))
-    return nc, cm
+    return tokenize(text, ext).split()
 
 
 def _build_token_position_index(
     text: str, ext=None,
 ) -> Tuple[Dict[str, List[int]], int]:
+    scan = tokenize(text, ext).scan
     positions: Dict[str, List[int]] = {}
-    n = 0
-    for pos, tok, _ in _sm.iter_code_tokens(text, ext):
-        positions.setdefault(tok, []).append(pos)
-        n += 1
-    return positions, n
+    for pos, end in zip(scan.starts, scan.ends):
+        positions.setdefault(text[pos:end], []).append(pos)
+    return positions, len(scan)
 
 
 def _strip_internal_fields(diff_marks: dict) -> None:
@@ -169,6 +165,43 @@ def _strip_internal_fields(diff_marks: dict) -> None:
                 mark.pop('_native_insert_at', None)
 
 
+_MARK_POSITION_FIELDS = ('paired_with', 'insert_at', 'move_to', '_native_insert_at')
+
+
+def _overlay_mark(mark: dict) -> dict:
+    out = dict(mark)
+    for field in _MARK_POSITION_FIELDS:
+        nested = out.get(field)
+        if isinstance(nested, dict):
+            out[field] = dict(nested)
+    return out
+
+
+def _overlay_diff_marks(diff_marks: dict) -> dict:
+    """Copy of `diff_marks` that `_strip_internal_fields` and
+    `_remap_marks_to_utf16` may edit without touching the original.
+
+    Only the mark dicts (and their nested position dicts) are copied;
+    alignments, assignments, ghosts and other payloads stay shared, so the
+    overlay must be serialised before the original is mutated further.
+    """
+    out = dict(diff_marks)
+    for side in ('teacher_files', 'student_files'):
+        if side in diff_marks:
+            out[side] = {
+                fname: [_overlay_mark(m) for m in marks]
+                for fname, marks in diff_marks[side].items()
+            }
+    line_marks = diff_marks.get('line_marks')
+    if line_marks:
+        out['line_marks'] = {
+            side: {fname: [dict(m) for m in marks] for fname, marks in by_file.items()}
+            if isinstance(by_file, dict) else by_file
+            for side, by_file in line_marks.items()
+        }
+    return out
+
+
 def _assemble_diff_marks(
     token_matching: str,
     teacher_files: dict,
@@ -219,7 +252,7 @@ def _build_occ_from_diff_marks(
         timestamps = (removal_ts_by_token or {}).get(tok)
         if timestamps:
             return timestamps.pop(0)
-        return '00:00:00'
+        return UNTIMED_TS
 
     ghosts_for_lookup = teacher_ghosts
     if ghosts_for_lookup is None:
@@ -285,23 +318,23 @@ def _build_occ_from_diff_marks(
     if has_timestamps:
         for (tok, ts), count in missing_remaining_by_tok_ts.items():
             for _ in range(count):
-                all_occurrences.append((ts or '00:00:00', tok, {'MISSING'}))
+                all_occurrences.append((ts or UNTIMED_TS, tok, {'MISSING'}))
     else:
         for tok, count in missing_remaining_by_tok.items():
             for _ in range(count):
-                all_occurrences.append(('00:00:00', tok, {'MISSING'}))
+                all_occurrences.append((UNTIMED_TS, tok, {'MISSING'}))
 
     for tok, total_student_comments in student_comment_by_tok.items():
         extra_count = total_student_comments - student_comment_consumed.get(tok, 0)
         for _ in range(max(0, extra_count)):
-            all_occurrences.append(('00:00:00', tok, {'COMMENT', 'EXTRA'}))
+            all_occurrences.append((UNTIMED_TS, tok, {'COMMENT', 'EXTRA'}))
 
     for marks in diff_marks.get('student_files', {}).values():
         for mark in marks:
             label = mark.get('label')
             tok = mark['token']
             if label == 'extra':
-                all_occurrences.append(('00:00:00', tok, {'EXTRA'}))
+                all_occurrences.append((UNTIMED_TS, tok, {'EXTRA'}))
             elif label == 'ghost_extra':
                 removal_ts = (
                     _ghost_pair_ts(mark)
@@ -310,16 +343,12 @@ def _build_occ_from_diff_marks(
                 )
                 all_occurrences.append((removal_ts, tok, {'EXTRA*'}))
 
+    origin_ms = local_ts_ms(teacher_entries[0][1]) if teacher_entries else None
+
     def _sort_key(entry: tuple) -> tuple:
         ts, _, flags = entry
-        is_tail = ts == '00:00:00' and 'EXTRA' in flags and 'EXTRA*' not in flags
-        try:
-            hh, mm, rest = ts.split(':')
-            ss, _, ms_str = rest.partition('.')
-            ms = int(ms_str) if ms_str else 0
-            return (is_tail, int(hh), int(mm), int(ss), ms)
-        except Exception:
-            return (is_tail, 99, 99, 99, 0)
+        is_tail = ts == UNTIMED_TS and 'EXTRA' in flags and 'EXTRA*' not in flags
+        return (is_tail, clock_sort_key(ts, origin_ms))
 
     all_occurrences.sort(key=_sort_key)
 
@@ -1,5 +1,3 @@
-import copy
-import json
 import shutil
 from collections import Counter
 from pathlib import Path
@@ -15,21 +13,23 @@ from .token_log import (
     _apply_star_post_pass,
     _apply_insert_at_to_unpaired_missings,
     _assemble_diff_marks,
-    _build_file_ordered_ts_map,
     _build_git_diff_marks,
     _build_leo_diff_marks,
     _build_lcs_token_diff_marks,
     _build_occ_from_diff_marks,
-    _build_teacher_token_timestamps,
-    _parse_teacher_tokens,
+    _load_teacher_entries,
+    _overlay_diff_marks,
     _refresh_missing_timestamps,
     _remap_marks_to_utf16,
     _strip_internal_fields,
     _ttt_pos_index,
     _write_teacher_tokens_file,
     leo_plus_config,
+    teacher_cache_for,
 )
+from .diff_marks_io import load_diff_marks, write_diff_marks
 from .folder_utils import CODE_EXTS
+from .similarity_measures import UNTIMED_TS, clock_sort_key, local_ts_ms
 from .token_log_lang_stats import (
     _LANG_EXT_LABEL,
     _effective_ext_at,
@@ -45,8 +45,7 @@ DISABLED_DIFF_MARK_VARIANTS = frozenset({'lcs_star', 'git_star'})
 def _emit_diff_marks(path: Path, marks: dict, basis: str) -> bool:
     if basis in DISABLED_DIFF_MARK_VARIANTS:
         return False
-    with open(path, 'w', encoding='utf-8') as fh:
-        json.dump(marks, fh, ensure_ascii=False, indent=2)
+    write_diff_marks(path, marks)
     return True
 
 
@@ -68,14 +67,26 @@ def _stats_from_occurrences(all_occ, score_e, score_c, n_found, n_missing, n_ext
     extra_comment_ctr       = Counter(tok for _, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA'})
     ghost_extra_comment_ctr = Counter(tok for _, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA*'})
 
-    _miss_e   = sorted((ts, f'-{tok}')  for ts, tok, fl in all_occ if fl == {'MISSING'})
-    _miss_c   = sorted((ts, f'-{tok}')  for ts, tok, fl in all_occ if fl == {'MISSING', 'COMMENT'})
-    _extra    = sorted((ts, f'+{tok}')  for ts, tok, fl in all_occ if fl == {'EXTRA'})
-    _extra_s  = sorted((ts, f'+{tok}*') for ts, tok, fl in all_occ if fl == {'EXTRA*'})
-    _extra_c  = sorted((ts, f'+{tok}')  for ts, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA'})
-    _extra_sc = sorted((ts, f'+{tok}*') for ts, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA*'})
-    _comb_e   = sorted(_miss_e + _extra + _extra_s)
-    _comb_c   = sorted(_miss_c + _extra_c + _extra_sc)
+    # all_occ is already in lesson order, so its first timed entry anchors
+    # the midnight roll-over for the re-sorts below.
+    origin_ms = None
+    for ts, _, _ in all_occ:
+        if ts != UNTIMED_TS:
+            origin_ms = local_ts_ms(ts)
+            if origin_ms is not None:
+                break
+
+    def _by_clock(item: tuple) -> tuple:
+        return (clock_sort_key(item[0], origin_ms), item)
+
+    _miss_e   = [(ts, f'-{tok}')  for ts, tok, fl in all_occ if fl == {'MISSING'}]
+    _miss_c   = [(ts, f'-{tok}')  for ts, tok, fl in all_occ if fl == {'MISSING', 'COMMENT'}]
+    _extra    = [(ts, f'+{tok}')  for ts, tok, fl in all_occ if fl == {'EXTRA'}]
+    _extra_s  = [(ts, f'+{tok}*') for ts, tok, fl in all_occ if fl == {'EXTRA*'}]
+    _extra_c  = [(ts, f'+{tok}')  for ts, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA'}]
+    _extra_sc = [(ts, f'+{tok}*') for ts, tok, fl in all_occ if fl == {'COMMENT', 'EXTRA*'}]
+    _comb_e   = sorted(_miss_e + _extra + _extra_s, key=_by_clock)
+    _comb_c   = sorted(_miss_c + _extra_c + _extra_sc, key=_by_clock)
 
     return {
         'found':                 n_found,
@@ -180,18 +191,18 @@ class TokenLogMixin:
             print('  Student token files skipped \u2014 tokens.txt not found.')
             return
 
-        teacher_entries = _parse_teacher_tokens(teacher_tokens_path)
+        teacher_entries = _load_teacher_entries(teacher_tokens_path)
         removal_ts_by_token: Dict[str, List[str]] = {}
         for tok, _, _, is_rem, removal_ts in teacher_entries:
             if is_rem and removal_ts:
                 removal_ts_by_token.setdefault(tok, []).append(removal_ts)
 
         all_events = getattr(self, '_lesson_all_events', None)
-        ts_map_cached: Dict[str, List[str]] = {}
+        ts_map_cached: Dict[str, List[int]] = {}
         teacher_token_ts: Dict[str, list] = {}
         if all_events:
-            ts_map_cached = _build_file_ordered_ts_map(all_events)
-            teacher_token_ts = _build_teacher_token_timestamps(all_events)
+            ts_map_cached = teacher_cache_for(all_events).file_ordered_ts_map()
+            teacher_token_ts = teacher_cache_for(all_events).teacher_token_timestamps()
 
         teacher_code_files = self._get_teacher_code_files()
 
@@ -243,8 +254,7 @@ class TokenLogMixin:
             if curated_dir is not None:
                 ideal_src = curated_dir / sid / 'diff_marks_ideal.json'
                 if ideal_src.is_file():
-                    with open(ideal_src, encoding='utf-8') as _fh:
-                        ideal_marks = json.load(_fh)
+                    ideal_marks = load_diff_marks(ideal_src)
                     if all_events:
                         _refresh_missing_timestamps(
                             ideal_marks, all_events, _ts_map=ts_map_cached or None,
@@ -309,9 +319,9 @@ class TokenLogMixin:
 
         all_events = getattr(self, '_lesson_all_events', None)
         write_star = star_token_matching is not None and bool(all_events)
-        _tm: Dict[str, List[str]] = {}
+        _tm: Dict[str, List[int]] = {}
         if write_star:
-            _tm = _build_file_ordered_ts_map(all_events)
+            _tm = teacher_cache_for(all_events).file_ordered_ts_map()
 
         written = 0
         written_star = 0
@@ -362,7 +372,7 @@ class TokenLogMixin:
             )
 
             if write_star:
-                non_star = copy.deepcopy(diff_marks)
+                non_star = _overlay_diff_marks(diff_marks)
                 _strip_internal_fields(non_star)
                 if needs_utf16_remap:
                     _remap_marks_to_utf16(non_star, teacher_code_files, stu_files)
@@ -423,12 +433,12 @@ class TokenLogMixin:
         if not teacher_code_files:
             return
 
-        ts_map_cached = _build_file_ordered_ts_map(all_events)
-        teacher_token_ts = _build_teacher_token_timestamps(all_events)
+        ts_map_cached = teacher_cache_for(all_events).file_ordered_ts_map()
+        teacher_token_ts = teacher_cache_for(all_events).teacher_token_timestamps()
 
         teacher_tokens_path = self.reference_dir / 'tokens.txt'
         teacher_entries = (
-            _parse_teacher_tokens(teacher_tokens_path)
+            _load_teacher_entries(teacher_tokens_path)
             if teacher_tokens_path.exists() else []
         )
         removal_ts_by_token: Dict[str, List[str]] = {}
@@ -568,11 +578,11 @@ class TokenLogMixin:
         if not teacher_tokens_path.exists():
             return {}
 
-        teacher_entries = _parse_teacher_tokens(teacher_tokens_path)
+        teacher_entries = _load_teacher_entries(teacher_tokens_path)
 
         all_events = getattr(self, '_lesson_all_events', None)
-        ts_map_cached: Dict[str, List[str]] = (
-            _build_file_ordered_ts_map(all_events) if all_events else {}
+        ts_map_cached: Dict[str, List[int]] = (
+            teacher_cache_for(all_events).file_ordered_ts_map() if all_events else {}
         )
 
         out: Dict[str, dict] = {}
@@ -588,8 +598,7 @@ class TokenLogMixin:
             if not marks_path.is_file():
                 continue
             try:
-                with open(marks_path, encoding='utf-8') as fh:
-                    diff_marks = json.load(fh)
+                diff_marks = load_diff_marks(marks_path)
             except Exception:
                 continue
 
@@ -604,14 +613,16 @@ class TokenLogMixin:
                 leo_star_path = anon_dir / 'diff_marks_leo_star.json'
                 if leo_star_path.is_file():
                     try:
-                        with open(leo_star_path, encoding='utf-8') as fh:
-                            ls = json.load(fh)
-                            if teacher_ghosts is None:
-                                teacher_ghosts = ls.get('teacher_ghosts')
-                            if teacher_token_timestamps is None:
-                                teacher_token_timestamps = ls.get(
-                                    'teacher_token_timestamps'
-                                )
+                        ls = load_diff_marks(
+                            leo_star_path,
+                            fields=('teacher_ghosts', 'teacher_token_timestamps'),
+                        )
+                        if teacher_ghosts is None:
+                            teacher_ghosts = ls.get('teacher_ghosts')
+                        if teacher_token_timestamps is None:
+                            teacher_token_timestamps = ls.get(
+                                'teacher_token_timestamps'
+                            )
                     except Exception:
                         pass
 
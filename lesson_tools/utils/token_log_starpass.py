@@ -1,9 +1,17 @@
+import bisect
+from collections import OrderedDict
 from difflib import SequenceMatcher
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 from . import similarity_measures as _sm
-from .similarity_measures import reconstruct_tokens_from_keylog_full, ts_to_local
+from .similarity_measures import (
+    local_day_ms,
+    local_ts_ms,
+    reconstruct_tokens_from_keylog_full,
+    ts_to_local,
+)
 from .lv_editor import replay_with_timestamps_all
 
 from .token_log_leo import (
@@ -13,6 +21,8 @@ from .token_log_leo import (
     _build_teacher_seq_aug,
     _collect_occurrences,
     _collect_teacher_ghosts,
+    _combined_context_score,
+    _context_vector_pack,
     _hungarian_max,
     _pairwise_context_sim,
 )
@@ -22,7 +32,7 @@ from .token_log_marks import (
     _split_tokens_by_comment,
 )
 
-def _build_file_ordered_ts_map(all_events: list) -> Dict[str, List[str]]:
+def _build_file_ordered_ts_map(all_events: list) -> Dict[str, List[int]]:
     surviving_chars_with_ts, _ = replay_with_timestamps_all(all_events)
     if not surviving_chars_with_ts:
         return {}
@@ -32,12 +42,12 @@ def _build_file_ordered_ts_map(all_events: list) -> Dict[str, List[str]]:
         text_parts.append(ch)
         char_timestamps.extend([ts] * len(ch))
     surviving_text = ''.join(text_parts)
-    ts_by_token: Dict[str, List[str]] = {}
+    ts_by_token: Dict[str, List[int]] = {}
     for tok_match in _sm._CHAR_TOKEN_RE.finditer(surviving_text):
         last_char_idx = tok_match.end() - 1
         if last_char_idx < len(char_timestamps):
             ts_by_token.setdefault(tok_match.group(), []).append(
-                ts_to_local(char_timestamps[last_char_idx]),
+                char_timestamps[last_char_idx],
             )
     return ts_by_token
 
@@ -83,46 +93,45 @@ def _ttt_pos_index(teacher_token_ts) -> Dict[Tuple[str, int, int], str]:
 
 
 def _build_token_secprefix_map(
-    ts_map: Dict[str, List[str]],
-) -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+    ts_map: Dict[str, List[int]],
+) -> Dict[str, Dict[int, List[int]]]:
+    """Index epoch-ms timestamps by token and local second of day.
+
+    A timestamp at .500 or later is also filed under the next second, since
+    second-resolution strings may have been rounded up.
+    """
+    out: Dict[str, Dict[int, List[int]]] = {}
     for tok, ts_list in ts_map.items():
-        tok_map: Dict[str, List[str]] = {}
+        tok_map: Dict[int, List[int]] = {}
         for ts in ts_list:
-            secprefix, _, ms_str = ts.partition('.')
-            ms = int(ms_str) if ms_str else 0
-            tok_map.setdefault(secprefix, []).append(ts)
-            if ms >= 500:
-                rounded = _add_seconds_to_hms(secprefix, 1)
-                if rounded:
-                    tok_map.setdefault(rounded, []).append(ts)
+            sec, ms = divmod(local_day_ms(ts), 1000)
+            tok_map.setdefault(sec, []).append(ts)
+            if ms >= 500 and sec + 1 < 24 * 3600:
+                tok_map.setdefault(sec + 1, []).append(ts)
         out[tok] = tok_map
     return out
 
 
-def _add_seconds_to_hms(hms: str, delta: int) -> Optional[str]:
-    try:
-        h, m, s = hms.split(':')
-        total = int(h) * 3600 + int(m) * 60 + int(s) + delta
-        if total < 0 or total >= 24 * 3600:
-            return None
-        return f'{total // 3600:02d}:{(total // 60) % 60:02d}:{total % 60:02d}'
-    except Exception:
-        return None
+def _secprefix_candidates(secprefix_map: Dict[str, Dict[int, List[int]]],
+                          tok: str, hms: str) -> List[int]:
+    ms = local_ts_ms(hms)
+    if ms is None:
+        return []
+    return secprefix_map.get(tok, {}).get(ms // 1000, [])
 
 
-def _build_removal_ts_map(events: list, lesson_file: str | None = None) -> Dict[str, List[str]]:
+def _build_removal_ts_map(events: list, lesson_file: str | None = None) -> Dict[str, List[int]]:
     _, _, removed_kw_ts, _, _ = reconstruct_tokens_from_keylog_full(
         events, lesson_file=lesson_file,
     )
-    out: Dict[str, List[str]] = {}
+    out: Dict[str, List[int]] = {}
     for tok, pairs in removed_kw_ts.items():
         for _ins_ts, del_ts in pairs:
-            out.setdefault(tok, []).append(ts_to_local(del_ts))
+            out.setdefault(tok, []).append(del_ts)
     return out
 
 
-def _upgrade_secprefix(candidates: List[str],
+def _upgrade_secprefix(candidates: List[int],
                         consumed: Dict[Tuple[str, str], int],
                         key: Tuple[str, str]) -> Optional[str]:
     if not candidates:
@@ -131,7 +140,63 @@ def _upgrade_secprefix(candidates: List[str],
     if idx >= len(candidates):
         return None
     consumed[key] = idx + 1
-    return candidates[idx]
+    return ts_to_local(candidates[idx])
+
+
+class StarPassTeacherCache:
+    """Teacher-side replay products for one events list, built on first use.
+
+    Shared by every student and star variant of a run, so the returned maps
+    must be treated as read-only.
+    """
+
+    __slots__ = ('events', 'n_events', '_memo')
+
+    def __init__(self, events: list):
+        self.events = events
+        self.n_events = len(events)
+        self._memo: dict = {}
+
+    def _get(self, name: str, build):
+        if name not in self._memo:
+            self._memo[name] = build()
+        return self._memo[name]
+
+    def file_ordered_ts_map(self) -> Dict[str, List[int]]:
+        return self._get('ts_map', lambda: _build_file_ordered_ts_map(self.events))
+
+    def teacher_token_timestamps(self) -> Dict[str, list]:
+        return self._get('token_ts', lambda: _build_teacher_token_timestamps(self.events))
+
+    def removal_ts_map(self) -> Dict[str, List[int]]:
+        return self._get('removal_ts', lambda: _build_removal_ts_map(self.events))
+
+    def removal_secprefix_map(self) -> Dict[str, Dict[int, List[int]]]:
+        return self._get('removal_secprefix',
+                         lambda: _build_token_secprefix_map(self.removal_ts_map()))
+
+    def teacher_ghosts(self) -> Dict[str, list]:
+        return self._get('ghosts', lambda: _collect_teacher_ghosts(self.events))
+
+
+_TEACHER_CACHE_SIZE = 4
+_teacher_caches: 'OrderedDict[int, StarPassTeacherCache]' = OrderedDict()
+
+
+def teacher_cache_for(events: list) -> StarPassTeacherCache:
+    """Memoised by list identity; a list that has grown since gets a fresh
+    cache. Cached entries hold their list, so its id cannot be reused."""
+    key = id(events)
+    hit = _teacher_caches.get(key)
+    if hit is not None and hit.events is events and hit.n_events == len(events):
+        _teacher_caches.move_to_end(key)
+        return hit
+    cache = StarPassTeacherCache(events)
+    _teacher_caches[key] = cache
+    _teacher_caches.move_to_end(key)
+    if len(_teacher_caches) > _TEACHER_CACHE_SIZE:
+        _teacher_caches.popitem(last=False)
+    return cache
 
 
 def _refresh_missing_timestamps(diff_marks: dict, events: list,
@@ -139,10 +204,11 @@ def _refresh_missing_timestamps(diff_marks: dict, events: list,
                                  _teacher_token_ts: dict = None) -> None:
     if not events:
         return
-    ts_map = _ts_map if _ts_map is not None else _build_file_ordered_ts_map(events)
+    cache = teacher_cache_for(events)
+    ts_map = _ts_map if _ts_map is not None else cache.file_ordered_ts_map()
     teacher_token_ts = (
         _teacher_token_ts if _teacher_token_ts is not None
-        else _build_teacher_token_timestamps(events)
+        else cache.teacher_token_timestamps()
     )
     pos_ts = _ttt_pos_index(teacher_token_ts)
 
@@ -166,7 +232,9 @@ def _refresh_missing_timestamps(diff_marks: dict, events: list,
             if existing_ts and '.' in existing_ts:
                 continue
             if existing_ts:
-                candidates = insert_ts_by_tok_secprefix.get(tok, {}).get(existing_ts, [])
+                candidates = _secprefix_candidates(
+                    insert_ts_by_tok_secprefix, tok, existing_ts,
+                )
                 upgraded = _upgrade_secprefix(
                     candidates, insert_consumed, (tok, existing_ts),
                 )
@@ -175,10 +243,9 @@ def _refresh_missing_timestamps(diff_marks: dict, events: list,
             elif stored_idx is not None:
                 ts_list = ts_map.get(tok, [])
                 if stored_idx < len(ts_list):
-                    mark['timestamp'] = ts_list[stored_idx]
+                    mark['timestamp'] = ts_to_local(ts_list[stored_idx])
 
-    removal_ts_map = _build_removal_ts_map(events)
-    removal_ts_by_tok_secprefix = _build_token_secprefix_map(removal_ts_map)
+    removal_ts_by_tok_secprefix = cache.removal_secprefix_map()
     removal_consumed: Dict[Tuple[str, str], int] = {}
     for fname in sorted(diff_marks.get('student_files', {})):
         for mark in diff_marks['student_files'][fname]:
@@ -188,13 +255,93 @@ def _refresh_missing_timestamps(diff_marks: dict, events: list,
             if not existing_ts or '.' in existing_ts:
                 continue
             tok = mark.get('token', '')
-            candidates = removal_ts_by_tok_secprefix.get(tok, {}).get(existing_ts, [])
+            candidates = _secprefix_candidates(
+                removal_ts_by_tok_secprefix, tok, existing_ts,
+            )
             upgraded = _upgrade_secprefix(
                 candidates, removal_consumed, (tok, existing_ts),
             )
             if upgraded:
                 mark['removal_ts'] = upgraded
 
+class _FilePairView:
+    """Tokenised view of one matched teacher/student file pair, loaded on
+    first use."""
+
+    __slots__ = ('teacher_fname', 'student_fname', 'ext', '_index',
+                 '_teacher_path', '_student_path', '_loaded',
+                 'teacher_toks', 'student_toks', 'teacher_seq', 'student_seq',
+                 'teacher_pos_to_idx', 'student_pos_to_idx')
+
+    def __init__(self, index: 'StarPassIndex', teacher_filepath: str,
+                 teacher_path: Path, student_path: Path):
+        self._index = index
+        self.teacher_fname = Path(teacher_filepath).name
+        self.student_fname = student_path.name
+        self.ext = Path(teacher_filepath).suffix.lower()
+        self._teacher_path = teacher_path
+        self._student_path = student_path
+        self._loaded = False
+
+    def load(self) -> '_FilePairView':
+        if not self._loaded:
+            self.teacher_toks, _ = _split_tokens_by_comment(
+                self._index.text(self._teacher_path), self.ext)
+            self.student_toks, _ = _split_tokens_by_comment(
+                self._index.text(self._student_path), self.ext)
+            self.teacher_seq = [tok for _, tok in self.teacher_toks]
+            self.student_seq = [tok for _, tok in self.student_toks]
+            self.teacher_pos_to_idx = {pos: i for i, (pos, _) in enumerate(self.teacher_toks)}
+            self.student_pos_to_idx = {pos: j for j, (pos, _) in enumerate(self.student_toks)}
+            self._loaded = True
+        return self
+
+    @property
+    def student_text(self) -> str:
+        return self._index.text(self._student_path)
+
+
+class StarPassIndex:
+    """File pairing, texts and token sequences shared by the swap-pairing and
+    insert_at passes, so each file is read and split once per student."""
+
+    def __init__(self, teacher_files: Dict[str, Path], student_files: Dict[str, Path]):
+        self._texts: Dict[Path, str] = {}
+        self.pairs: List[_FilePairView] = [
+            _FilePairView(self, teacher_filepath, teacher_path, student_path)
+            for teacher_filepath, teacher_path, student_path
+            in _match_files_by_name_then_ext(teacher_files, student_files)
+            if student_path is not None
+        ]
+
+    def text(self, path: Path) -> str:
+        text = self._texts.get(path)
+        if text is None:
+            text = self._texts[path] = _read_text_normalized(path)
+        return text
+
+
+def _shared_context_candidates(s_packs: list, t_packs: list) -> List[List[int]]:
+    """For each teacher pack, the student packs sharing at least one left or
+    right context token; every other pair has a context score of 0."""
+    left_index: Dict[str, List[int]] = {}
+    right_index: Dict[str, List[int]] = {}
+    for i, (left, right, _, _) in enumerate(s_packs):
+        for tok in left:
+            left_index.setdefault(tok, []).append(i)
+        for tok in right:
+            right_index.setdefault(tok, []).append(i)
+    out: List[List[int]] = []
+    for left, right, _, _ in t_packs:
+        hits: set = set()
+        for tok in left:
+            hits.update(left_index.get(tok, ()))
+        for tok in right:
+            hits.update(right_index.get(tok, ()))
+        out.append(sorted(hits))
+    return out
+
+
 def _apply_star_post_pass(
     diff_marks: dict,
     events: list,
@@ -205,7 +352,8 @@ def _apply_star_post_pass(
     if not events:
         return
 
-    ts_map = _ts_map if _ts_map is not None else _build_file_ordered_ts_map(events)
+    cache = teacher_cache_for(events)
+    ts_map = _ts_map if _ts_map is not None else cache.file_ordered_ts_map()
     _refresh_missing_timestamps(diff_marks, events, _ts_map=ts_map)
 
     if 'leo_assignments' not in diff_marks and teacher_files:
@@ -217,32 +365,37 @@ def _apply_star_post_pass(
 
     _apply_ghost_extra_promotion(diff_marks, events)
     if teacher_files:
+        index = StarPassIndex(teacher_files, student_files)
         _apply_swap_pairing_to_marks(
             diff_marks.get('teacher_files', {}),
             diff_marks.get('student_files', {}),
-            teacher_files, student_files,
+            teacher_files, student_files, index=index,
         )
         _apply_insert_at_to_unpaired_missings(
             diff_marks.get('teacher_files', {}),
             diff_marks.get('student_files', {}),
-            teacher_files, student_files,
+            teacher_files, student_files, index=index,
         )
-    teacher_ghosts = _collect_teacher_ghosts(events)
+    teacher_ghosts = cache.teacher_ghosts()
     if teacher_ghosts:
         diff_marks['teacher_ghosts'] = teacher_ghosts
 
+@lru_cache(maxsize=65536)
+def _token_pair_ratio(missing_token: str, extra_token: str) -> float:
+    if missing_token == extra_token:
+        return 1.0
+    return SequenceMatcher(None, missing_token, extra_token).ratio()
+
+
 def _swap_pair_score(missing_token: str, extra_token: str, cos: float) -> float:
-    tok_sim = (
-        1.0 if missing_token == extra_token
-        else SequenceMatcher(None, missing_token, extra_token).ratio()
-    )
-    return cos + _SWAP_TOKEN_SIM_WEIGHT * tok_sim
+    return cos + _SWAP_TOKEN_SIM_WEIGHT * _token_pair_ratio(missing_token, extra_token)
 
 def _apply_swap_pairing_to_marks(
     t_marks_by_file: Dict[str, List[dict]],
     s_marks_by_file: Dict[str, List[dict]],
     teacher_files: Dict[str, Path],
     student_files: Dict[str, Path],
+    index: Optional[StarPassIndex] = None,
 ) -> None:
     for marks in t_marks_by_file.values():
         for mark in marks:
@@ -257,11 +410,11 @@ def _apply_swap_pairing_to_marks(
                 continue
             mark.pop('paired_with', None)
 
-    for teacher_filepath, teacher_path, student_path in _match_files_by_name_then_ext(teacher_files, student_files):
-        if student_path is None:
-            continue
-        teacher_fname = Path(teacher_filepath).name
-        student_fname = student_path.name
+    if index is None:
+        index = StarPassIndex(teacher_files, student_files)
+    for view in index.pairs:
+        teacher_fname = view.teacher_fname
+        student_fname = view.student_fname
 
         missing_marks = [
             m for m in t_marks_by_file.get(teacher_fname, [])
@@ -274,15 +427,9 @@ def _apply_swap_pairing_to_marks(
         if not missing_marks or not extra_marks:
             continue
 
-        teacher_text = _read_text_normalized(teacher_path)
-        student_text = _read_text_normalized(student_path)
-        ext = Path(teacher_filepath).suffix.lower()
-        teacher_noncomment_toks, _ = _split_tokens_by_comment(teacher_text, ext)
-        student_noncomment_toks, _ = _split_tokens_by_comment(student_text, ext)
-        teacher_seq = [tok for _, tok in teacher_noncomment_toks]
-        student_seq = [tok for _, tok in student_noncomment_toks]
-        teacher_pos_to_seq_idx = {pos: i for i, (pos, _) in enumerate(teacher_noncomment_toks)}
-        student_pos_to_seq_idx = {pos: j for j, (pos, _) in enumerate(student_noncomment_toks)}
+        view.load()
+        teacher_pos_to_seq_idx = view.teacher_pos_to_idx
+        student_pos_to_seq_idx = view.student_pos_to_idx
 
         missing_entries = [
             (teacher_pos_to_seq_idx[m['start']], m)
@@ -295,19 +442,28 @@ def _apply_swap_pairing_to_marks(
         if not missing_entries or not extra_entries:
             continue
 
-        cos_matrix = _pairwise_context_sim(
-            student_seq, [idx for idx, _ in extra_entries],
-            teacher_seq, [idx for idx, _ in missing_entries],
-            _CONTEXT_K,
-        )
+        extra_packs = [
+            _context_vector_pack(view.student_seq, idx, _CONTEXT_K)
+            for idx, _ in extra_entries
+        ]
+        missing_packs = [
+            _context_vector_pack(view.teacher_seq, idx, _CONTEXT_K)
+            for idx, _ in missing_entries
+        ]
+        # A zero context score caps the pair at _SWAP_TOKEN_SIM_WEIGHT, below
+        # the threshold, so only extras sharing a context token are scored.
+        shared = _shared_context_candidates(extra_packs, missing_packs)
 
         candidates: List[Tuple[float, int, int]] = []
         for missing_idx, (_, missing_mark) in enumerate(missing_entries):
             missing_tok = missing_mark['token']
-            for extra_idx, (_, extra_mark) in enumerate(extra_entries):
-                score = _swap_pair_score(
-                    missing_tok, extra_mark['token'], cos_matrix[extra_idx][missing_idx],
-                )
+            missing_pack = missing_packs[missing_idx]
+            for extra_idx in shared[missing_idx]:
+                cos = _combined_context_score(extra_packs[extra_idx], missing_pack)
+                if cos + _SWAP_TOKEN_SIM_WEIGHT < _CONTEXT_MATCH_THRESHOLD:
+                    continue
+                extra_mark = extra_entries[extra_idx][1]
+                score = _swap_pair_score(missing_tok, extra_mark['token'], cos)
                 if score >= _CONTEXT_MATCH_THRESHOLD:
                     candidates.append((score, missing_idx, extra_idx))
         candidates.sort(reverse=True)
@@ -342,6 +498,7 @@ def _apply_insert_at_to_unpaired_missings(
     s_marks_by_file: Dict[str, List[dict]],
     teacher_files: Dict[str, Path],
     student_files: Dict[str, Path],
+    index: Optional[StarPassIndex] = None,
 ) -> None:
     for marks in t_marks_by_file.values():
         for mark in marks:
@@ -356,13 +513,12 @@ def _apply_insert_at_to_unpaired_missings(
             else:
                 mark.pop('insert_at', None)
 
+    if index is None:
+        index = StarPassIndex(teacher_files, student_files)
     matched_student_for_teacher: dict = {}
-    for teacher_filepath, teacher_path, student_path in _match_files_by_name_then_ext(
-            teacher_files, student_files):
-        if student_path is None:
-            continue
-        teacher_fname = Path(teacher_filepath).name
-        student_fname = student_path.name
+    for view in index.pairs:
+        teacher_fname = view.teacher_fname
+        student_fname = view.student_fname
         matched_student_for_teacher[teacher_fname] = student_fname
 
         unpaired_missings = [
@@ -374,11 +530,9 @@ def _apply_insert_at_to_unpaired_missings(
         if not unpaired_missings:
             continue
 
-        teacher_text = _read_text_normalized(teacher_path)
-        student_text = _read_text_normalized(student_path)
-        ext = Path(teacher_filepath).suffix.lower()
-        teacher_noncomment_toks, _ = _split_tokens_by_comment(teacher_text, ext)
-        student_noncomment_toks, _ = _split_tokens_by_comment(student_text, ext)
+        view.load()
+        teacher_noncomment_toks = view.teacher_toks
+        student_noncomment_toks = view.student_toks
 
         teacher_missing_positions = {
             mark['start'] for mark in t_marks_by_file.get(teacher_fname, [])
@@ -398,27 +552,18 @@ def _apply_insert_at_to_unpaired_missings(
             if pos not in student_skip_positions
         ]
 
-        teacher_pos_to_seq_idx = {
-            pos: i for i, (pos, _) in enumerate(teacher_noncomment_toks)
-        }
-
         for mark in unpaired_missings:
-            teacher_idx = teacher_pos_to_seq_idx.get(mark['start'])
+            teacher_idx = view.teacher_pos_to_idx.get(mark['start'])
             if teacher_idx is None:
                 continue
-            prev_matched_idx = -1
-            for k, matched_t_idx in enumerate(matched_teacher_seq_idxs):
-                if matched_t_idx < teacher_idx:
-                    prev_matched_idx = k
-                else:
-                    break
+            prev_matched_idx = bisect.bisect_left(matched_teacher_seq_idxs, teacher_idx) - 1
             if prev_matched_idx < 0:
                 insert_pos = 0
             elif prev_matched_idx < len(matched_student_toks):
                 anchor_pos, anchor_tok = matched_student_toks[prev_matched_idx]
                 insert_pos = anchor_pos + len(anchor_tok)
             else:
-                insert_pos = len(student_text)
+                insert_pos = len(view.student_text)
             mark['insert_at'] = {'file': student_fname, 'pos': insert_pos}
 
     if student_files:
@@ -428,8 +573,7 @@ def _apply_insert_at_to_unpaired_missings(
         def _eof_of(fname):
             if fname not in eof_cache:
                 try:
-                    eof_cache[fname] = len(
-                        _read_text_normalized(student_files[fname]))
+                    eof_cache[fname] = len(index.text(student_files[fname]))
                 except Exception:
                     eof_cache[fname] = 0
             return eof_cache[fname]
@@ -570,7 +714,7 @@ def _build_assignments_for_post_pass(
     teacher_seq_aug: Optional[list] = None
     seq_idx_to_aug: Optional[Dict[int, int]] = None
     ghost_instances: List[dict] = []
-    teacher_ghosts = _collect_teacher_ghosts(events) if events else {}
+    teacher_ghosts = teacher_cache_for(events).teacher_ghosts() if events else {}
     if teacher_ghosts:
         teacher_seq_aug, seq_idx_to_aug, ghost_instances = _build_teacher_seq_aug(
             teacher_occurrences, teacher_ghosts,
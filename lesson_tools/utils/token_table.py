@@ -0,0 +1,244 @@
+import bisect
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys as _sys
+_sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from languages import lesson_file_extension
+
+from .folder_utils import CODE_EXTS
+from .similarity_measures import reconstruct_token_inventory, ts_to_local
+from .token_cache import tokenize
+
+
+TABLE_SUFFIX = '.bin'
+_MAGIC = b'LEOTT'
+_FORMAT = 3
+_HEADER = struct.Struct('<5sHqqIIB')
+_POOL_HEADER = struct.Struct('<II')
+
+_FLAG_COMMENT = 1
+_FLAG_REMOVED = 2
+
+TeacherEntry = Tuple[str, str, bool, bool, str]
+
+
+def _build_file_timeline(events: list) -> list:
+    timeline = [(0, "MAIN")]
+    for event in events:
+        ts = event.get("timestamp", 0)
+        if "move_to" in event:
+            target = event["move_to"]
+            if target in ("DEV", "dev"):
+                pass
+            elif target in ("MAIN", "main"):
+                timeline.append((ts, "MAIN"))
+            elif any(target.lower().endswith(ext) for ext in CODE_EXTS):
+                timeline.append((ts, target))
+        elif "switch_editor" in event and event["switch_editor"] not in ("dev", "DEV"):
+            timeline.append((ts, "MAIN"))
+    return sorted(timeline)
+
+
+def _file_at_ts(ts: int, timeline: list) -> str:
+    idx = bisect.bisect_right(timeline, (ts, "\xff")) - 1
+    return timeline[max(0, idx)][1]
+
+
+def table_path_for(tokens_path: Path) -> Path:
+    return Path(tokens_path).with_suffix(TABLE_SUFFIX)
+
+
+def _source_stamp(tokens_path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(tokens_path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class TeacherTokenTable:
+    """Column store of the teacher's token inventory, one row per occurrence
+    in insertion order (the row order of `tokens.txt`).
+
+    `offsets` index the surviving reconstructed text (-1 for removed rows),
+    timestamps are epoch ms (`removal_ts` is 0 for surviving rows) and
+    `langs` holds the effective language extension at each occurrence.
+    """
+
+    __slots__ = ('tokens', 'files', 'offsets', 'insert_ts', 'removal_ts',
+                 'flags', 'langs', 'n_unique', 'multi_file')
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.files: List[str] = []
+        self.offsets = array('q')
+        self.insert_ts = array('q')
+        self.removal_ts = array('q')
+        self.flags = bytearray()
+        self.langs: List[str] = []
+        self.n_unique = 0
+        self.multi_file = False
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @classmethod
+    def from_events(cls, events: list, lesson_file: str | None = None) -> 'TeacherTokenTable':
+        (kw_ts, kw_ts_comment, removed_kw_ts, upper_to_display, occ_with_display,
+         final_text, offsets_by_tok) = reconstruct_token_inventory(events, lesson_file=lesson_file)
+
+        rows: List[Tuple[int, int, str, bool, bool, int]] = []
+        for tok in kw_ts:
+            occ_sorted = sorted(
+                zip(occ_with_display.get(tok, []), offsets_by_tok.get(tok, [])),
+                key=lambda pair: pair[0],
+            )
+            comment_ts_set = set(kw_ts_comment.get(tok, []))
+            for (ts, disp), offset in occ_sorted:
+                rows.append((ts, 0, disp, ts in comment_ts_set, False, offset))
+        for tok, ts_list in removed_kw_ts.items():
+            disp = upper_to_display.get(tok, tok)
+            for ins_ts, del_ts in ts_list:
+                rows.append((ins_ts, del_ts, disp, False, True, -1))
+        rows.sort(key=lambda x: x[0])
+
+        timeline = _build_file_timeline(events)
+        main_ext = lesson_file_extension(lesson_file) or '.html'
+        lang_index = (
+            tokenize(final_text, main_ext).lang_index()
+            if final_text and main_ext in ('.html', '.htm') else None
+        )
+
+        table = cls()
+        table.n_unique = len(kw_ts)
+        table.multi_file = bool({f for _, f in timeline} - {"MAIN"})
+        for ins_ts, del_ts, token, is_comment, is_removed, offset in rows:
+            fname = _file_at_ts(ins_ts, timeline)
+            base_ext = main_ext if fname == "MAIN" else Path(fname).suffix.lower()
+            lang = base_ext
+            if fname == "MAIN" and offset >= 0 and lang_index is not None:
+                lang = lang_index.label_at(offset, base_ext)
+            table.tokens.append(token)
+            table.files.append(fname)
+            table.offsets.append(offset)
+            table.insert_ts.append(int(ins_ts))
+            table.removal_ts.append(int(del_ts))
+            table.flags.append((_FLAG_COMMENT if is_comment else 0)
+                               | (_FLAG_REMOVED if is_removed else 0))
+            table.langs.append(lang)
+        return table
+
+    def is_comment(self, i: int) -> bool:
+        return bool(self.flags[i] & _FLAG_COMMENT)
+
+    def is_removed(self, i: int) -> bool:
+        return bool(self.flags[i] & _FLAG_REMOVED)
+
+    def counts(self) -> Tuple[int, int, int]:
+        n_removed = sum(1 for f in self.flags if f & _FLAG_REMOVED)
+        return len(self) - n_removed, n_removed, self.n_unique
+
+    def entries(self) -> List[TeacherEntry]:
+        """Rows in the shape `_parse_teacher_tokens` returns."""
+        out: List[TeacherEntry] = []
+        for i, token in enumerate(self.tokens):
+            removed = self.is_removed(i)
+            out.append((
+                token, ts_to_local(self.insert_ts[i]), self.is_comment(i), removed,
+                ts_to_local(self.removal_ts[i]) if removed else '',
+            ))
+        return out
+
+    def write_text(self, out_path: Path) -> None:
+        n_typed, n_removed, n_unique = self.counts()
+        with open(out_path, 'w', encoding='utf-8') as fh:
+            fh.write(f'# Occurrences: {n_typed}\n')
+            fh.write(f'# Removed    : {n_removed}\n')
+            fh.write(f'# Unique     : {n_unique}\n')
+            for i, token in enumerate(self.tokens):
+                flags: List[str] = []
+                if self.is_comment(i):
+                    flags.append('COMMENT')
+                if self.is_removed(i):
+                    flags.append('REMOVED')
+                file_col    = f'\t{self.files[i]}' if self.multi_file else ''
+                removal_col = f'\t{ts_to_local(self.removal_ts[i])}' if self.is_removed(i) else ''
+                flag_col    = ('\t' + '\t'.join(flags)) if flags else ''
+                fh.write(f'{token}\t{ts_to_local(self.insert_ts[i])}{file_col}{flag_col}{removal_col}\n')
+
+    def save(self, path: Path, source: Path) -> None:
+        """Write the binary table, stamped with the size and mtime of the
+        `source` text file so a hand-edited `tokens.txt` invalidates it.
+        """
+        stamp = _source_stamp(source) or (-1, -1)
+        pool: Dict[str, int] = {}
+        tok_idx = array('I', (pool.setdefault(t, len(pool)) for t in self.tokens))
+        file_idx = array('I', (pool.setdefault(f, len(pool)) for f in self.files))
+        lang_idx = array('I', (pool.setdefault(l, len(pool)) for l in self.langs))
+        blob = '\0'.join(pool).encode('utf-8')
+        columns = [tok_idx, file_idx, lang_idx, self.offsets, self.insert_ts, self.removal_ts]
+        tmp = Path(path).with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as fh:
+            fh.write(_HEADER.pack(_MAGIC, _FORMAT, stamp[0], stamp[1],
+                                  len(self), self.n_unique, int(self.multi_file)))
+            fh.write(_POOL_HEADER.pack(len(pool), len(blob)))
+            fh.write(blob)
+            for col in columns:
+                if _sys.byteorder != 'little':
+                    col = array(col.typecode, col)
+                    col.byteswap()
+                fh.write(col.tobytes())
+            fh.write(bytes(self.flags))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, source: Path) -> Optional['TeacherTokenTable']:
+        """Read a table written by `save`; None if it is missing, corrupt or
+        older than `source`.
+        """
+        try:
+            data = Path(path).read_bytes()
+        except OSError:
+            return None
+        try:
+            magic, fmt, size, mtime_ns, n, n_unique, multi = _HEADER.unpack_from(data, 0)
+            if magic != _MAGIC or fmt != _FORMAT or (size, mtime_ns) != _source_stamp(source):
+                return None
+            pos = _HEADER.size
+            n_pool, blob_len = _POOL_HEADER.unpack_from(data, pos)
+            pos += _POOL_HEADER.size
+            pool = data[pos:pos + blob_len].decode('utf-8').split('\0') if n_pool else []
+            pos += blob_len
+            if len(pool) != n_pool:
+                return None
+            columns = []
+            for typecode in ('I', 'I', 'I', 'q', 'q', 'q'):
+                col = array(typecode)
+                end = pos + n * col.itemsize
+                col.frombytes(data[pos:end])
+                if _sys.byteorder != 'little':
+                    col.byteswap()
+                columns.append(col)
+                pos = end
+            flags = bytearray(data[pos:pos + n])
+            if len(flags) != n or pos + n != len(data):
+                return None
+            tok_idx, file_idx, lang_idx, offsets, insert_ts, removal_ts = columns
+            table = cls()
+            table.tokens = [pool[i] for i in tok_idx]
+            table.files = [pool[i] for i in file_idx]
+            table.langs = [pool[i] for i in lang_idx]
+        except (struct.error, UnicodeDecodeError, ValueError, IndexError):
+            return None
+        table.offsets = offsets
+        table.insert_ts = insert_ts
+        table.removal_ts = removal_ts
+        table.flags = flags
+        table.n_unique = n_unique
+        table.multi_file = bool(multi)
+        return table